@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Adaptive chunking benchmark
+Compares per-stream overhead (chunks, frames, CPU time) and time to first
+audio of adaptive chunk sizing against fixed chunks of the same initial
+size, with a fast loopback client and with a bandwidth-limited client
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import struct
+import time
+from typing import Dict, List, Optional
+
+from optimized_tts_streamer import OptimizedTTSStreamer
+from tts_codecs import CODEC_BITS
+
+DEFAULT_TEXT = (
+    "Streaming speech synthesis trades latency against overhead. Small chunks get the first "
+    "audio to the listener quickly, but every chunk costs an object, a frame and a write. "
+    "Once the listener has a comfortable buffer, larger chunks carry the same audio for a "
+    "fraction of that cost, and the stream can fall back to small chunks if it stalls."
+)
+
+
+def _stall_seconds(arrivals: List[tuple]) -> float:
+    """Playback stall time of a client that starts playing on the first chunk"""
+    stalled = 0.0
+    play_until = None
+    for arrived, duration in arrivals:
+        if play_until is None:
+            play_until = arrived
+        elif arrived > play_until:
+            stalled += arrived - play_until
+            play_until = arrived
+        play_until += duration
+    return stalled
+
+
+async def run_stream(streamer: OptimizedTTSStreamer, text: str, writer: asyncio.StreamWriter,
+                     bandwidth: Optional[float]) -> Dict:
+    """Stream ``text`` as length-prefixed frames over ``writer``; ``bandwidth``
+    (bytes/s) paces the client"""
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    first_chunk = None
+    arrivals = []
+    total_bytes = 0
+    async for chunk in streamer.synthesize_stream(text):
+        now = time.perf_counter()
+        if first_chunk is None:
+            first_chunk = now - started
+        data = chunk.data
+        writer.write(struct.pack('!I', len(data)))
+        writer.write(data)
+        await writer.drain()
+        if bandwidth:
+            await asyncio.sleep(len(data) / bandwidth)
+        total_bytes += len(data)
+        bytes_per_second = CODEC_BITS[chunk.codec] * chunk.sample_rate / 8
+        arrivals.append((time.perf_counter(), len(data) / bytes_per_second))
+    return {
+        'chunks': len(arrivals),
+        'bytes': total_bytes,
+        'cpu_ms': (time.process_time() - cpu_started) * 1000,
+        'time_to_first_audio_ms': first_chunk * 1000,
+        'stall_ms': _stall_seconds(arrivals) * 1000
+    }
+
+
+async def run_mode(name: str, text: str, iterations: int, bandwidth_factor: float, **streamer_kwargs) -> Dict:
+    streamer = OptimizedTTSStreamer(**streamer_kwargs)
+    await streamer.warmup()
+    # Loopback client that reads and discards the frames
+    client_done = asyncio.Event()
+
+    async def discard(reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        while await reader.read(1 << 16):
+            pass
+        client_writer.close()
+        client_done.set()
+
+    server = await asyncio.start_server(discard, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    _, writer = await asyncio.open_connection('127.0.0.1', port)
+
+    try:
+        cold = await run_stream(streamer, text, writer, None)
+        warm = [await run_stream(streamer, text, writer, None) for _ in range(iterations)]
+
+        # A client whose link carries ``bandwidth_factor`` times real time
+        bytes_per_second = CODEC_BITS[streamer.codec] * streamer.sample_rate / 8
+        paced = await run_stream(streamer, text, writer, bytes_per_second * bandwidth_factor)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+        await client_done.wait()
+        server.close()
+        await server.wait_closed()
+        await streamer.shutdown()
+
+    return {
+        'mode': name,
+        'cold_time_to_first_audio_ms': cold['time_to_first_audio_ms'],
+        'warm': {
+            'chunks_per_stream': statistics.median(run['chunks'] for run in warm),
+            'cpu_ms_per_stream': statistics.median(run['cpu_ms'] for run in warm),
+            'time_to_first_audio_ms': statistics.median(run['time_to_first_audio_ms'] for run in warm)
+        },
+        'paced': {
+            'bandwidth_factor': bandwidth_factor,
+            'chunks': paced['chunks'],
+            'stall_ms': paced['stall_ms']
+        },
+        'audio_bytes': cold['bytes']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS adaptive chunking benchmark")
+    parser.add_argument("--text", type=str, default=DEFAULT_TEXT, help="Text to synthesize")
+    parser.add_argument("--iterations", type=int, default=50, help="Warm (cached) streams per mode")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="Fixed chunk size and adaptive initial size")
+    parser.add_argument("--max-chunk-ms", type=int, default=640, help="Largest adaptive chunk")
+    parser.add_argument("--bandwidth-factor", type=float, default=1.5, help="Paced client link speed as a multiple of real time")
+    parser.add_argument("--engines", type=str, default="", help="Comma-separated engines to load")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    common = dict(engines=args.engines.split(',') if args.engines else None, chunk_size_ms=args.chunk_ms)
+
+    async def run() -> List[Dict]:
+        return [
+            await run_mode('fixed', args.text, args.iterations, args.bandwidth_factor,
+                           adaptive_chunking=False, **common),
+            await run_mode('adaptive', args.text, args.iterations, args.bandwidth_factor,
+                           adaptive_chunking=True, max_chunk_ms=args.max_chunk_ms, **common)
+        ]
+
+    fixed, adaptive = asyncio.run(run())
+    print(json.dumps({
+        'chunk_ms': args.chunk_ms,
+        'max_chunk_ms': args.max_chunk_ms,
+        'modes': [fixed, adaptive],
+        'chunk_reduction': fixed['warm']['chunks_per_stream'] / adaptive['warm']['chunks_per_stream'],
+        'cpu_reduction': fixed['warm']['cpu_ms_per_stream'] / max(adaptive['warm']['cpu_ms_per_stream'], 1e-9)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
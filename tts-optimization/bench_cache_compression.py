@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Cache compression benchmark
+Replays a Zipf-distributed prompt workload against the memory cache at a
+fixed memory budget, storing entries raw and losslessly compressed, and
+compares hit ratio against the CPU spent compressing and decompressing
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from optimized_tts_streamer import AudioOptimizer, CachedAudio, CompressedAudio, LRUCache
+from tts_dsp import DEFAULT_SAMPLE_RATE
+
+
+def speechlike(seed: int, duration: float, sample_rate: int = DEFAULT_SAMPLE_RATE) -> bytes:
+    """Synthetic speech stand-in: voiced syllables (harmonics shaped by two
+    formants, drifting pitch, aspiration noise) separated by short pauses.
+    The engine placeholders are pure tones, which compress far better than
+    real speech."""
+    rng = np.random.default_rng(seed)
+    pieces = []
+    total = 0
+    target = int(duration * sample_rate)
+    while total < target:
+        n = int(rng.uniform(0.12, 0.25) * sample_rate)
+        t = np.arange(n) / sample_rate
+        f0 = rng.uniform(100, 180) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 4) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        formants = (rng.uniform(300, 800), rng.uniform(900, 2300))
+        voiced = np.zeros(n)
+        for k in range(1, int(4000 / f0.max())):
+            gain = sum(np.exp(-((k * f0.mean() - f) / 150) ** 2) for f in formants) + 0.05
+            voiced += gain / k * np.sin(k * phase)
+        envelope = np.hanning(n)
+        syllable = envelope * (voiced / np.abs(voiced).max() + 0.03 * rng.standard_normal(n))
+        pause = 0.001 * rng.standard_normal(int(rng.uniform(0.04, 0.15) * sample_rate))
+        pieces.extend((syllable, pause))
+        total += n + len(pause)
+    audio = np.concatenate(pieces)[:target]
+    return (audio * 12000).astype(np.int16).tobytes()
+
+
+def make_workload(prompts: int, requests: int, zipf_s: float, seed: int) -> np.ndarray:
+    """Prompt ids drawn with probability proportional to 1 / rank^s"""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, prompts + 1) ** zipf_s
+    return rng.choice(prompts, size=requests, p=weights / weights.sum())
+
+
+def run_mode(
+    name: str,
+    workload: np.ndarray,
+    audio_for,
+    budget_bytes: int,
+    chunk_ms: int,
+    block_chunks: int,
+    level: int,
+    read_chunks: int
+) -> Dict:
+    cache = LRUCache(max_size=len(workload), ttl_seconds=10 ** 9, max_bytes=budget_bytes)
+    compress = name != 'raw'
+    serve_cpu = 0.0
+    store_cpu = 0.0
+    served_bytes = 0
+
+    for prompt in workload.tolist():
+        text = f"prompt {prompt}"
+        started = time.process_time()
+        entry = cache.get(text, 'default', 1.0, 1.0)
+        if entry is not None:
+            read = entry.reader()
+            for start in range(0, entry.chunk_count, read_chunks):
+                served_bytes += len(read(start, min(start + read_chunks, entry.chunk_count)))
+            serve_cpu += time.process_time() - started
+            continue
+
+        audio = audio_for(prompt, chunk_ms)  # the engine's work; not measured
+        started = time.process_time()
+        stored = CompressedAudio.from_audio(audio, block_chunks, level) if compress else audio
+        cache.put(text, 'default', 1.0, 1.0, stored)
+        store_cpu += time.process_time() - started
+
+    stats = cache.stats()
+    entries = [entry for entry, _ in cache.cache.values()]
+    raw_bytes = sum(getattr(entry, 'raw_nbytes', entry.nbytes) for entry in entries)
+    return {
+        'mode': name,
+        'hit_ratio': stats['hit_rate'],
+        'hits': stats['hits'],
+        'misses': stats['misses'],
+        'resident_entries': len(entries),
+        'resident_audio_mb': raw_bytes / (1024 * 1024),
+        'stored_mb': stats['bytes'] / (1024 * 1024),
+        'compression_ratio': raw_bytes / stats['bytes'] if stats['bytes'] else 1.0,
+        'serve_us_per_hit': serve_cpu / max(stats['hits'], 1) * 1e6,
+        'store_us_per_miss': store_cpu / max(stats['misses'], 1) * 1e6,
+        'cache_cpu_s': serve_cpu + store_cpu,
+        'served_mb': served_bytes / (1024 * 1024)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS cache compression benchmark")
+    parser.add_argument("--prompts", type=int, default=1000, help="Distinct prompts")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests replayed")
+    parser.add_argument("--zipf", type=float, default=1.0, help="Zipf exponent of prompt popularity")
+    parser.add_argument("--mean-seconds", type=float, default=2.5, help="Median prompt duration")
+    parser.add_argument("--memory-mb", type=float, default=16, help="Cache memory budget")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="Chunk grid of cached entries")
+    parser.add_argument("--block-ms", type=int, default=320, help="Compression block size")
+    parser.add_argument("--levels", type=str, default="1,6", help="zlib levels to compare")
+    parser.add_argument("--read-chunks", type=int, default=4, help="Grid chunks per served chunk")
+    parser.add_argument("--miss-cost-ms", type=float, default=300.0, help="Engine time per miss, for the combined estimate")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    durations = np.clip(rng.lognormal(np.log(args.mean_seconds), 0.5, args.prompts), 0.5, 12.0)
+    workload = make_workload(args.prompts, args.requests, args.zipf, args.seed)
+    rendered: Dict[int, CachedAudio] = {}
+
+    def audio_for(prompt: int, chunk_ms: int) -> CachedAudio:
+        # Rendered once and shared by every mode; entries are read-only
+        if prompt not in rendered:
+            buffer, offsets = AudioOptimizer.prepare_stream_buffer(
+                speechlike(prompt, float(durations[prompt])), chunk_ms, DEFAULT_SAMPLE_RATE
+            )
+            rendered[prompt] = CachedAudio(buffer, offsets, DEFAULT_SAMPLE_RATE)
+        return rendered[prompt]
+
+    block_chunks = max(args.block_ms // args.chunk_ms, 1)
+    modes: List[Dict] = [run_mode('raw', workload, audio_for, int(args.memory_mb * 1024 * 1024),
+                                  args.chunk_ms, block_chunks, 0, args.read_chunks)]
+    for level in (int(level) for level in args.levels.split(',')):
+        modes.append(run_mode(f'zlib{level}', workload, audio_for, int(args.memory_mb * 1024 * 1024),
+                              args.chunk_ms, block_chunks, level, args.read_chunks))
+    for mode in modes:
+        mode['estimated_total_s'] = mode['cache_cpu_s'] + mode['misses'] * args.miss_cost_ms / 1000
+
+    print(json.dumps({
+        'prompts': args.prompts,
+        'requests': args.requests,
+        'zipf': args.zipf,
+        'memory_mb': args.memory_mb,
+        'catalog_audio_mb': sum(durations) * DEFAULT_SAMPLE_RATE * 2 / (1024 * 1024),
+        'modes': modes
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
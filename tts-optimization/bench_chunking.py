@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Chunking microbenchmark
+Compares allocations and time per request for the previous chunking path
+(per-chunk copies into dataclass chunks) and the zero-copy memoryview path
+"""
+
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from optimized_tts_streamer import AudioChunk, AudioOptimizer
+
+
+@dataclass
+class LegacyAudioChunk:
+    """The previous dataclass-based chunk"""
+    data: bytes
+    sample_rate: int
+    chunk_id: int
+    total_chunks: int
+    timestamp: float
+    is_final: bool = False
+
+
+def legacy_create_optimized_chunks(audio_data: bytes, chunk_size_ms: int = 100) -> List[bytes]:
+    """The previous implementation, kept verbatim for comparison"""
+    try:
+        sample_rate = 22050
+        chunk_size_samples = int(sample_rate * chunk_size_ms / 1000)
+        audio_array = np.frombuffer(audio_data, dtype=np.int16)
+
+        chunks = []
+        for i in range(0, len(audio_array), chunk_size_samples):
+            chunk = audio_array[i:i + chunk_size_samples]
+            if len(chunk) > 100:
+                fade_samples = min(50, len(chunk) // 4)
+                chunk[:fade_samples] = chunk[:fade_samples] * np.linspace(0, 1, fade_samples)
+                chunk[-fade_samples:] = chunk[-fade_samples:] * np.linspace(1, 0, fade_samples)
+            chunks.append(chunk.tobytes())
+        return chunks
+    except Exception as e:
+        logging.debug(f"Chunk optimization failed: {e}")
+        chunk_size_bytes = chunk_size_ms * 44
+        return [audio_data[i:i + chunk_size_bytes] for i in range(0, len(audio_data), chunk_size_bytes)]
+
+
+def legacy_request(audio_data: bytes, chunk_size_ms: int) -> list:
+    chunk_data_list = legacy_create_optimized_chunks(audio_data, chunk_size_ms)
+    total_chunks = len(chunk_data_list)
+    return [
+        LegacyAudioChunk(data, 22050, i, total_chunks, time.time(), i == total_chunks - 1)
+        for i, data in enumerate(chunk_data_list)
+    ]
+
+
+def optimized_request(audio_data: bytes, chunk_size_ms: int) -> list:
+    chunk_data_list = AudioOptimizer.create_optimized_chunks(audio_data, chunk_size_ms, 22050)
+    total_chunks = len(chunk_data_list)
+    return [
+        AudioChunk(data, 22050, i, total_chunks, time.time(), i == total_chunks - 1)
+        for i, data in enumerate(chunk_data_list)
+    ]
+
+
+def measure(request_fn, audio_data, chunk_size_ms: int, iterations: int) -> dict:
+    """Allocation profile of one request plus mean wall time over ``iterations``"""
+    request_fn(audio_data, chunk_size_ms)  # warm caches (e.g. fade ramps)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    chunks = request_fn(audio_data, chunk_size_ms)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Blocks and bytes still held by the request's chunks
+    diff = after.compare_to(before, 'filename')
+    retained_blocks = sum(stat.count_diff for stat in diff if stat.count_diff > 0)
+    retained_bytes = sum(stat.size_diff for stat in diff if stat.size_diff > 0)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        request_fn(audio_data, chunk_size_ms)
+    elapsed = (time.perf_counter() - start) / iterations
+
+    return {
+        'chunks': len(chunks),
+        'retained_blocks': retained_blocks,
+        'retained_kb': retained_bytes / 1024,
+        'peak_traced_kb': peak / 1024,
+        'time_ms': elapsed * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking allocation microbenchmark")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Audio length per request")
+    parser.add_argument("--chunk-ms", type=int, default=50, help="Chunk size in ms")
+    parser.add_argument("--iterations", type=int, default=200, help="Timing iterations")
+    args = parser.parse_args()
+
+    sample_rate = 22050
+    t = np.arange(int(sample_rate * args.seconds)) / sample_rate
+    audio_data = (np.sin(2 * np.pi * 440 * t) * 16383).astype(np.int16).tobytes()
+
+    results = {
+        'audio_kb': len(audio_data) / 1024,
+        'chunk_size_ms': args.chunk_ms,
+        'before': measure(legacy_request, audio_data, args.chunk_ms, args.iterations),
+        'after': measure(optimized_request, audio_data, args.chunk_ms, args.iterations)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
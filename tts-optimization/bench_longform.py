@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Long-form memory benchmark
+Synthesizes texts of increasing length to a WAV file, each in a fresh
+interpreter, and checks that peak RSS stays flat as the text grows
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from tts_codecs import WAV_FORMAT_TAGS
+
+
+def generate_text(size: int) -> str:
+    """About ``size`` characters of distinct sentences (nothing repeats, so
+    nothing is served from a cache)"""
+    sentences = []
+    length = 0
+    index = 0
+    while length < size:
+        sentence = (
+            f"This is sentence number {index} of the long-form benchmark, "
+            f"which keeps going so that the document grows to the requested size."
+        )
+        sentences.append(sentence)
+        length += len(sentence) + 1
+        index += 1
+    return " ".join(sentences)[:size]
+
+
+def _rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(size: int, engines: str, codec: str, sample_rate: int, lookahead: int, cache_entry_mb: float) -> dict:
+    """Synthesize one document to a temporary WAV file and report peak RSS"""
+    import asyncio
+    import optimized_tts_streamer
+
+    text = generate_text(size)
+    streamer = optimized_tts_streamer.OptimizedTTSStreamer(
+        engines=engines.split(',') if engines else None,
+        codec=codec,
+        sample_rate=sample_rate,
+        lookahead_segments=lookahead,
+        cache_entry_max_mb=cache_entry_mb
+    )
+
+    async def synthesize() -> dict:
+        await streamer.warmup()
+        baseline_mb = _rss_mb()
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        try:
+            result = await streamer.synthesize_to_file(text, path)
+        finally:
+            os.unlink(path)
+        await streamer.shutdown()
+        return {'baseline_rss_mb': baseline_mb, **result}
+
+    result = asyncio.run(synthesize())
+    return {
+        'text_chars': len(text),
+        'baseline_rss_mb': result['baseline_rss_mb'],
+        'peak_rss_mb': _rss_mb(),
+        'elapsed_s': result['elapsed_s'],
+        'audio_seconds': result['audio_seconds'],
+        'output_bytes': result['bytes'],
+        'chunks': result['chunks']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS long-form memory benchmark")
+    parser.add_argument("--sizes", type=str, default="1000,100000,1000000", help="Comma-separated text sizes in characters")
+    parser.add_argument("--engines", type=str, default="", help="Comma-separated engines to load")
+    parser.add_argument("--codec", type=str, default="mulaw", choices=sorted(WAV_FORMAT_TAGS), help="Output WAV codec")
+    parser.add_argument("--sample-rate", type=int, default=8000, help="Output sample rate")
+    parser.add_argument("--lookahead", type=int, default=4, help="Segments rendered ahead of the one streaming")
+    parser.add_argument("--cache-entry-mb", type=float, default=4.0, help="Largest stream kept in the memory cache")
+    parser.add_argument("--tolerance-mb", type=float, default=25.0, help="Allowed peak RSS spread across sizes")
+    parser.add_argument("--child", type=int, metavar="SIZE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_child(args.child, args.engines, args.codec, args.sample_rate, args.lookahead, args.cache_entry_mb)))
+        return
+
+    runs = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        command = [
+            sys.executable, os.path.abspath(__file__), '--child', str(size),
+            '--engines', args.engines, '--codec', args.codec,
+            '--sample-rate', str(args.sample_rate), '--lookahead', str(args.lookahead),
+            '--cache-entry-mb', str(args.cache_entry_mb)
+        ]
+        started = time.perf_counter()
+        output = subprocess.run(command, check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        run['wall_s'] = time.perf_counter() - started
+        runs.append(run)
+
+    peaks = [run['peak_rss_mb'] for run in runs]
+    spread = max(peaks) - min(peaks)
+    print(json.dumps({
+        'codec': args.codec,
+        'sample_rate': args.sample_rate,
+        'lookahead': args.lookahead,
+        'cache_entry_mb': args.cache_entry_mb,
+        'runs': runs,
+        'peak_rss_spread_mb': spread,
+        'tolerance_mb': args.tolerance_mb,
+        'flat': spread <= args.tolerance_mb
+    }, indent=2))
+    if spread > args.tolerance_mb:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
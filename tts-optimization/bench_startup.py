@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark
+Measures module import time, engine initialization, warm-up and time to the
+first synthesized chunk, each in a fresh interpreter
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def run_child(engines: str, warmup: bool, text: str) -> dict:
+    """One cold start, measured inside the child process"""
+    import asyncio
+
+    started = time.perf_counter()
+    import optimized_tts_streamer
+    import_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    streamer = optimized_tts_streamer.OptimizedTTSStreamer(
+        engines=engines.split(',') if engines else None
+    )
+    init_s = time.perf_counter() - started
+
+    async def first_chunk() -> tuple:
+        warmup_s = 0.0
+        if warmup:
+            started = time.perf_counter()
+            await streamer.warmup()
+            warmup_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        stream = streamer.synthesize_stream(text)
+        await stream.__anext__()
+        first_chunk_s = time.perf_counter() - started
+        await stream.aclose()
+        await streamer.shutdown()
+        return warmup_s, first_chunk_s
+
+    warmup_s, first_chunk_s = asyncio.run(first_chunk())
+
+    return {
+        'import_ms': import_s * 1000,
+        'engine_init_ms': init_s * 1000,
+        'engine_init_breakdown_ms': {k: v * 1000 for k, v in streamer.engine_init_times.items()},
+        'warmup_ms': warmup_s * 1000,
+        'time_to_first_chunk_ms': first_chunk_s * 1000,
+        'heavy_modules_loaded': sorted(
+            name for name in ('torch', 'torchaudio', 'TTS', 'librosa', 'scipy', 'memory_profiler', 'pyttsx3')
+            if name in sys.modules
+        )
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS streamer startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts")
+    parser.add_argument("--engines", type=str, default="", help="Comma-separated engines to load")
+    parser.add_argument("--no-warmup", action="store_true", help="Measure first chunk without warm-up")
+    parser.add_argument("--text", type=str, default="Hello, this is a startup test.", help="Text to synthesize")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.engines, not args.no_warmup, args.text)))
+        return
+
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--engines', args.engines, '--text', args.text]
+    if args.no_warmup:
+        command.append('--no-warmup')
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(command, check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    summary = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ('import_ms', 'engine_init_ms', 'warmup_ms', 'time_to_first_chunk_ms')
+    }
+    print(json.dumps({
+        'runs': args.runs,
+        'warmup': not args.no_warmup,
+        'median': summary,
+        'heavy_modules_loaded': runs[-1]['heavy_modules_loaded'],
+        'engine_init_breakdown_ms': runs[-1]['engine_init_breakdown_ms']
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
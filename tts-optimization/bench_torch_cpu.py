@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Torch CPU inference benchmark
+Runs a small stand-in TTS model (character embedding, LSTM encoder, MLP
+frame decoder and a linear vocoder) under the Torch CPU profile and compares
+fp32 against dynamic int8 and process x thread layouts by throughput and
+latency. Each process of a layout is a fresh interpreter, so its thread
+settings take effect.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from tts_dsp import DEFAULT_SAMPLE_RATE
+from tts_torch import TorchCPUProfile, available_cpus
+
+TEXTS = [
+    "Your order has shipped.",
+    "The next train to the airport leaves from platform four in six minutes.",
+    "Please hold while we connect you to the next available agent.",
+    "Streaming speech synthesis trades latency against overhead, and on machines without a "
+    "GPU the model's thread layout decides how many streams each core can carry.",
+    "Thank you for calling.",
+    "Your appointment is confirmed for Tuesday at ten thirty in the morning."
+]
+
+VOCAB = 128
+FRAMES_PER_CHAR = 4
+HOP = 256
+
+
+def build_stand_in(hidden: int = 512, mel: int = 80):
+    """A TTS-shaped model whose cost is in Linear and LSTM layers, the layers
+    dynamic quantization covers; random weights, the audio is noise"""
+    import torch
+    from torch import nn
+
+    class StandInTTS(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.embedding = nn.Embedding(VOCAB, 256)
+            self.encoder = nn.LSTM(256, hidden, num_layers=2, batch_first=True)
+            self.decoder = nn.Sequential(
+                nn.Linear(hidden, 1024), nn.ReLU(),
+                nn.Linear(1024, 1024), nn.ReLU(),
+                nn.Linear(1024, mel * FRAMES_PER_CHAR)
+            )
+            self.vocoder = nn.Linear(mel, HOP)
+            self.mel = mel
+
+        def forward(self, tokens):
+            encoded, _ = self.encoder(self.embedding(tokens))
+            frames = self.decoder(encoded).reshape(tokens.shape[0], -1, self.mel)
+            return torch.tanh(self.vocoder(frames)).reshape(tokens.shape[0], -1)
+
+    torch.manual_seed(0)
+    return StandInTTS()
+
+
+def encode(text: str):
+    import torch
+    return torch.tensor([[min(ord(char), VOCAB - 1) for char in text]])
+
+
+def run_child(threads: int, precision: str, callers: int, duration: float, warmup_runs: int) -> Dict:
+    """Load the model under the profile, report ready, then run ``callers``
+    closed-loop callers for ``duration`` seconds once the parent says go"""
+    from tts_torch import configure, load_model, run_inference, stats
+
+    configure(TorchCPUProfile(
+        intra_op_threads=threads or None,
+        inter_op_threads=1 if threads else None,
+        quantize_int8=precision == 'int8',
+        warmup_runs=warmup_runs
+    ))
+    inputs = [encode(text) for text in TEXTS]
+    model = load_model('stand-in', build_stand_in, warmup=lambda model: model(inputs[0]))
+
+    print('ready', flush=True)
+    sys.stdin.readline()
+
+    latencies: List[float] = []
+    samples = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def caller(offset: int):
+        index = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            audio = run_inference(model, inputs[index % len(inputs)])
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                samples[0] += audio.shape[-1]
+            index += 1
+
+    workers = [threading.Thread(target=caller, args=(offset,)) for offset in range(callers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return {'latencies': latencies, 'audio_seconds': samples[0] / DEFAULT_SAMPLE_RATE, **stats()}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def run_layout(layout: str, precision: str, callers: int, duration: float, warmup_runs: int) -> Dict:
+    """Run ``layout`` (``PROCESSESxTHREADS``, 0 threads for Torch's default)
+    with every process started together"""
+    processes, _, threads = layout.partition('x')
+    processes, threads = int(processes), int(threads)
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', str(threads),
+        '--precisions', precision, '--callers', str(callers),
+        '--duration', str(duration), '--warmup-runs', str(warmup_runs)
+    ]
+    children = [
+        subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        for _ in range(processes)
+    ]
+    for child in children:
+        if child.stdout.readline().strip() != 'ready':
+            raise RuntimeError(f"{layout} {precision}: child failed to load the model")
+    for child in children:
+        child.stdin.write('go\n')
+        child.stdin.flush()
+    runs = []
+    for child in children:
+        output, _ = child.communicate()
+        if child.returncode != 0:
+            raise RuntimeError(f"{layout} {precision}: child exited with {child.returncode}")
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    latencies = [latency for run in runs for latency in run['latencies']]
+    model = runs[0]['models']['stand-in']
+    return {
+        'layout': layout,
+        'precision': precision,
+        'processes': processes,
+        'threads_per_process': runs[0]['threads']['intra_op_threads'],
+        'callers_per_process': callers,
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / duration,
+        'realtime_factor': sum(run['audio_seconds'] for run in runs) / duration,
+        'latency_p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'latency_p95_ms': _percentile(latencies, 0.95) * 1000,
+        'latency_p99_ms': _percentile(latencies, 0.99) * 1000,
+        'model_mb': model['size_mb'],
+        'load_ms': model['load_ms'],
+        'warmup_ms': model['warmup_ms']
+    }
+
+
+def default_layouts(cpus: int) -> List[str]:
+    """One process with every CPU down to one process per CPU, plus several
+    processes each left at Torch's default (oversubscribed)"""
+    layouts = []
+    processes = 1
+    while processes <= cpus:
+        layouts.append(f"{processes}x{cpus // processes}")
+        processes *= 2
+    layouts.append(f"{min(cpus, 4)}x0")
+    return layouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS Torch CPU inference benchmark")
+    parser.add_argument("--layouts", type=str, help="Comma-separated PROCESSESxTHREADS layouts, 0 threads for Torch's default "
+                                                    "(default: powers of two up to the CPU count)")
+    parser.add_argument("--precisions", type=str, default="fp32,int8", help="Comma-separated precisions: fp32, int8")
+    parser.add_argument("--callers", type=int, default=1, help="Concurrent callers per process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per run")
+    parser.add_argument("--warmup-runs", type=int, default=2, help="Warm-up calls at model load")
+    parser.add_argument("--child", type=int, metavar="THREADS", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('torch') is None:
+        sys.exit("bench_torch_cpu: torch is not installed")
+
+    if args.child is not None:
+        print(json.dumps(run_child(args.child, args.precisions, args.callers, args.duration, args.warmup_runs)))
+        return
+
+    cpus = available_cpus()
+    layouts = args.layouts.split(',') if args.layouts else default_layouts(cpus)
+    runs = [
+        run_layout(layout, precision, args.callers, args.duration, args.warmup_runs)
+        for precision in args.precisions.split(',')
+        for layout in layouts
+    ]
+
+    best = {}
+    for run in runs:
+        if run['throughput_rps'] > best.get(run['precision'], {}).get('throughput_rps', 0.0):
+            best[run['precision']] = run
+    print(json.dumps({
+        'cpus': cpus,
+        'duration_s': args.duration,
+        'callers_per_process': args.callers,
+        'runs': runs,
+        'best_layout': {precision: run['layout'] for precision, run in best.items()},
+        'int8_speedup': (
+            best['int8']['throughput_rps'] / best['fp32']['throughput_rps']
+            if 'int8' in best and 'fp32' in best and best['fp32']['throughput_rps'] else None
+        )
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,38 +8,55 @@ import asyncio
 import time
 import logging
 import hashlib
+import re
 import json
 import threading
-from typing import AsyncGenerator, Dict, List, Optional, Tuple, Any
+import importlib.util
+from functools import lru_cache, partial
+from typing import AsyncGenerator, Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
-from collections import defaultdict
+from collections import Counter, defaultdict, deque, OrderedDict
 from queue import Queue, Empty
 import os
 import io
+import shutil
+import tempfile
 import wave
 import struct
-import psutil
-import memory_profiler
 
 # Audio processing
 import numpy as np
-from scipy import signal
-import librosa
+
+from tts_disk_cache import DiskAudioCache
+from tts_engines import (
+    AdmissionController, EngineExecutor, MicroBatcher, RequestQoS, RequestRejected, SharedQoS, current_qos
+)
+from tts_benchmark import BenchmarkConfig, add_benchmark_arguments, run_benchmark, run_from_args
+from tts_prewarm import Phrase, add_prewarm_arguments, load_phrases, run_prewarm
+from tts_batch import BatchResult, add_batch_arguments, run_jobs, synthesize_many
+from tts_metrics import JsonLinesSink, LogSink, ResourceSampler, SketchFamily, Trace, Tracer, current_trace
+from tts_codecs import (
+    CODEC_BITS, CODEC_IDS, CODEC_NAMES, WAV_FORMAT_TAGS, StreamEncoder, WavStreamWriter, codec_for_bitrate,
+    create_encoder, pack_block, unpack_block
+)
+from tts_dsp import DEFAULT_SAMPLE_RATE, Compressor, DSPChain, resample
+from tts_routing import AUTO_ENGINE, EngineRouter, FaultInjector, parse_fault_spec
+from tts_torch import (
+    TorchCPUProfile, add_torch_arguments, configure as configure_torch, load_model, profile_from_args,
+    run_inference, stats as torch_stats
+)
 
 # TTS Engines (examples - adjust based on actual engines used)
-try:
-    import torch
-    import torchaudio
-    from TTS.api import TTS
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
+# Engine packages are only located here; they are imported when an engine is
+# initialized so that importing this module stays fast.
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
 
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
-except ImportError:
-    PYTTSX3_AVAILABLE = False
+TORCH_AVAILABLE = _module_available('torch') and _module_available('TTS')
+PYTTSX3_AVAILABLE = _module_available('pyttsx3')
 
 @dataclass
 class TTSMetrics:
@@ -50,114 +67,417 @@ class TTSMetrics:
     audio_duration: float
     chunk_count: int
     cache_hit: bool
-    memory_usage: float
-    cpu_usage: float
+    memory_usage: float  # process RSS in MB, from the resource sampler
+    cpu_usage: float  # process CPU percent, from the resource sampler
     latency_ms: float
     throughput_chars_per_sec: float
+    time_to_first_chunk_ms: float = 0.0
+    engine: str = ''
+    fragment_count: int = 0  # sentence fragments looked up in the fragment cache
+    fragment_hits: int = 0
     
     def to_dict(self) -> Dict:
         return asdict(self)
 
-@dataclass
 class AudioChunk:
-    """Optimized audio chunk for streaming"""
-    data: bytes
-    sample_rate: int
-    chunk_id: int
-    total_chunks: int
-    timestamp: float
-    is_final: bool = False
+    """Optimized audio chunk for streaming
+
+    ``data`` is usually a ``memoryview`` into the stream's audio buffer
+    rather than a copy, encoded with ``codec`` (see ``tts_codecs``).
+    ``total_chunks`` is None when the stream length is not known up front,
+    e.g. in incremental mode where later segments are still being rendered.
+    Uses ``__slots__``: streams create one of these per chunk.
+    """
+    
+    __slots__ = ('data', 'sample_rate', 'chunk_id', 'total_chunks', 'timestamp', 'is_final', 'codec')
+    
+    def __init__(
+        self,
+        data: bytes,
+        sample_rate: int,
+        chunk_id: int,
+        total_chunks: Optional[int],
+        timestamp: float,
+        is_final: bool = False,
+        codec: str = 'pcm16'
+    ):
+        self.data = data
+        self.sample_rate = sample_rate
+        self.chunk_id = chunk_id
+        self.total_chunks = total_chunks
+        self.timestamp = timestamp
+        self.is_final = is_final
+        self.codec = codec
+    
+    def __repr__(self) -> str:
+        return (
+            f"AudioChunk(chunk_id={self.chunk_id}, total_chunks={self.total_chunks}, "
+            f"bytes={len(self.data)}, sample_rate={self.sample_rate}, codec={self.codec}, "
+            f"is_final={self.is_final})"
+        )
+
+class CachedAudio:
+    """Streaming-ready audio: fully post-processed samples plus chunk offsets
+    
+    ``offsets`` holds the byte offsets of the chunk boundaries, starting at 0
+    and ending at ``len(data)``, so chunk ``i`` is
+    ``data[offsets[i]:offsets[i + 1]]``. Serving an entry is pure slicing.
+    ``data`` is stored in its ``codec``'s encoded form.
+    """
+    
+    __slots__ = ('data', 'offsets', 'sample_rate', 'codec')
+    
+    # Serialized form: sample rate, codec id, number of offsets, offsets, audio
+    HEADER = struct.Struct('<III')
+    
+    def __init__(self, data: bytes, offsets: np.ndarray, sample_rate: int, codec: str = 'pcm16'):
+        self.data = data
+        self.offsets = offsets
+        self.sample_rate = sample_rate
+        self.codec = codec
+    
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.nbytes
+    
+    @property
+    def duration(self) -> float:
+        """Audio duration in seconds"""
+        return len(self.data) * 8 / CODEC_BITS[self.codec] / self.sample_rate
+    
+    @property
+    def chunk_count(self) -> int:
+        return len(self.offsets) - 1
+    
+    def chunks(self) -> List[memoryview]:
+        """Chunk payloads as zero-copy views"""
+        view = memoryview(self.data)
+        offsets = self.offsets.tolist()
+        return [view[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    
+    def reader(self):
+        """``read(start, end)``: payload of chunks ``start`` to ``end``, as a zero-copy view"""
+        view = memoryview(self.data)
+        offsets = self.offsets.tolist()
+        return lambda start, end: view[offsets[start]:offsets[end]]
+    
+    def to_bytes(self) -> bytes:
+        """Serialize for the disk cache"""
+        return b"".join((
+            self.HEADER.pack(self.sample_rate, CODEC_IDS[self.codec], len(self.offsets)),
+            self.offsets.astype('<i8').tobytes(),
+            self.data
+        ))
+    
+    @classmethod
+    def from_buffer(cls, buffer) -> 'CachedAudio':
+        """Deserialize without copying; arrays and data view into ``buffer``"""
+        view = memoryview(buffer)
+        sample_rate, codec_id, count = cls.HEADER.unpack_from(view)
+        offsets = np.frombuffer(view, dtype='<i8', count=count, offset=cls.HEADER.size)
+        return cls(view[cls.HEADER.size + offsets.nbytes:], offsets, sample_rate, CODEC_NAMES[codec_id])
+    
+    @classmethod
+    def concat(cls, parts: List['CachedAudio']) -> 'CachedAudio':
+        """Join consecutive stream segments, keeping each segment's chunk boundaries"""
+        data = bytearray(b"".join(part.data for part in parts))
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for part in parts:
+            offsets.append(part.offsets[1:] + base)
+            base += len(part.data)
+        return cls(data, np.concatenate(offsets), parts[0].sample_rate, parts[0].codec)
+
+class CompressedAudio:
+    """A ``CachedAudio`` held losslessly compressed, for the memory cache
+    
+    The audio is split into blocks of ``block_chunks`` chunks, each packed
+    on its own with ``tts_codecs.pack_block``, so a hit only decompresses
+    the blocks it streams, as it streams them. ``nbytes`` is the compressed
+    size, which is what the cache's memory budget is charged.
+    """
+    
+    __slots__ = ('blocks', 'offsets', 'block_chunks', 'raw_length', 'sample_rate', 'codec')
+    
+    def __init__(self, blocks: List[bytes], offsets: np.ndarray, block_chunks: int, sample_rate: int, codec: str):
+        self.blocks = blocks
+        self.offsets = offsets
+        self.block_chunks = block_chunks
+        self.raw_length = int(offsets[-1])
+        self.sample_rate = sample_rate
+        self.codec = codec
+    
+    @classmethod
+    def from_audio(cls, audio: CachedAudio, block_chunks: int = 16, level: int = 1) -> 'CompressedAudio':
+        view = memoryview(audio.data)
+        bounds = audio.offsets[::block_chunks].tolist()
+        if bounds[-1] != len(audio.data):
+            bounds.append(len(audio.data))
+        blocks = [pack_block(view[bounds[i]:bounds[i + 1]], audio.codec, level) for i in range(len(bounds) - 1)]
+        return cls(blocks, audio.offsets, block_chunks, audio.sample_rate, audio.codec)
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(len(block) for block in self.blocks) + self.offsets.nbytes
+    
+    @property
+    def raw_nbytes(self) -> int:
+        """Size the entry would have uncompressed"""
+        return self.raw_length + self.offsets.nbytes
+    
+    @property
+    def duration(self) -> float:
+        """Audio duration in seconds"""
+        return self.raw_length * 8 / CODEC_BITS[self.codec] / self.sample_rate
+    
+    @property
+    def chunk_count(self) -> int:
+        return len(self.offsets) - 1
+    
+    def reader(self):
+        """``read(start, end)``: payload of chunks ``start`` to ``end``
+        
+        Each reader keeps its most recent block decompressed, so reading a
+        block chunk by chunk decompresses it once.
+        """
+        offsets = self.offsets.tolist()
+        block_chunks = self.block_chunks
+        current = [-1, b""]
+        
+        def block(index: int) -> bytes:
+            if current[0] != index:
+                current[0], current[1] = index, unpack_block(self.blocks[index])
+            return current[1]
+        
+        def read(start: int, end: int) -> bytes:
+            parts = []
+            for index in range(start // block_chunks, (end - 1) // block_chunks + 1):
+                base = offsets[index * block_chunks]
+                data = block(index)
+                lo = max(offsets[start], base) - base
+                hi = min(offsets[end], base + len(data)) - base
+                parts.append(data[lo:hi])
+            return parts[0] if len(parts) == 1 else b"".join(parts)
+        
+        return read
+    
+    def decompress(self) -> CachedAudio:
+        data = bytearray(b"".join(unpack_block(block) for block in self.blocks))
+        return CachedAudio(data, self.offsets, self.sample_rate, self.codec)
+
+class AdaptiveChunker:
+    """Per-stream chunk size policy driven by how far the client is buffered ahead
+    
+    A stream starts at ``min_chunk_ms`` for the fastest first audio. The
+    client is assumed to start playing when the first chunk is delivered and
+    to play in real time, so the audio it has buffered ahead of its playback
+    position is the audio delivered so far minus the time since then. Once
+    that covers ``target_chunks`` chunks of the next size up, the chunk size
+    grows by ``growth`` (up to ``max_chunk_ms``); when less than one chunk is
+    buffered the consumer is falling behind and the size shrinks again. A
+    delivery after the buffer ran dry counts as an underrun and playback is
+    assumed to resume from it.
+    
+    Chunk sizes are whole multiples of ``grain_ms``, the chunk grid of the
+    prepared audio, so larger chunks are still zero-copy slices.
+    """
+    
+    __slots__ = ('grain_ms', 'min_chunk_ms', 'max_chunk_ms', 'target_chunks', 'growth',
+                 'chunk_ms', 'delivered_s', 'playback_start', 'underruns', 'clock')
+    
+    def __init__(
+        self,
+        grain_ms: float,
+        min_chunk_ms: float,
+        max_chunk_ms: float,
+        target_chunks: int = 3,
+        growth: float = 2.0,
+        clock=time.monotonic
+    ):
+        self.grain_ms = grain_ms
+        self.min_chunk_ms = max(min_chunk_ms, grain_ms)
+        self.max_chunk_ms = max(max_chunk_ms, self.min_chunk_ms)
+        self.target_chunks = target_chunks
+        self.growth = growth
+        self.chunk_ms = self.min_chunk_ms
+        self.delivered_s = 0.0
+        self.playback_start: Optional[float] = None
+        self.underruns = 0
+        self.clock = clock
+    
+    @property
+    def grains(self) -> int:
+        """Size of the next chunk in grid chunks"""
+        return max(int(round(self.chunk_ms / self.grain_ms)), 1)
+    
+    def buffered_ahead(self) -> float:
+        """Seconds of audio the client holds beyond its playback position"""
+        if self.playback_start is None:
+            return 0.0
+        return self.delivered_s - (self.clock() - self.playback_start)
+    
+    def delivered(self, duration: float):
+        """Record a chunk taken by the consumer and adapt the next chunk size"""
+        now = self.clock()
+        if self.playback_start is None:
+            self.playback_start = now
+        elif self.delivered_s < now - self.playback_start:
+            # Ran dry before this chunk arrived; playback resumes with it
+            self.underruns += 1
+            self.playback_start = now - self.delivered_s
+        self.delivered_s += duration
+        
+        ahead = self.delivered_s - (now - self.playback_start)
+        larger = min(self.chunk_ms * self.growth, self.max_chunk_ms)
+        if larger > self.chunk_ms and ahead >= self.target_chunks * larger / 1000:
+            self.chunk_ms = larger
+        elif ahead < self.chunk_ms / 1000:
+            self.chunk_ms = max(self.chunk_ms / self.growth, self.min_chunk_ms)
 
 class LRUCache:
-    """High-performance LRU cache for TTS responses"""
+    """High-performance LRU cache for TTS responses
+
+    Entries live in an ``OrderedDict`` ordered from least to most recently
+    used, so lookups, promotions and evictions are all O(1). The cache is
+    bounded both by entry count (``max_size``) and by total payload size
+    (``max_bytes``); TTL expiry is applied lazily when an entry is touched
+    or reaches the eviction end of the order.
+    """
     
-    def __init__(self, max_size: int = 100, ttl_seconds: int = 3600):
+    def __init__(self, max_size: int = 100, ttl_seconds: int = 3600, max_bytes: Optional[int] = None):
         self.max_size = max_size
         self.ttl_seconds = ttl_seconds
-        self.cache = {}
-        self.access_order = {}
-        self.timestamps = {}
+        self.max_bytes = max_bytes
+        # key -> (audio_data, inserted_at), least recently used first
+        self.cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.current_bytes = 0
         self.lock = threading.RLock()
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
     
-    def _generate_key(self, text: str, voice: str, rate: float, pitch: float) -> str:
-        """Generate cache key from TTS parameters"""
-        content = f"{text}|{voice}|{rate}|{pitch}"
+    def _generate_key(self, text: str, voice: str, rate: float, pitch: float, variant: str = '') -> str:
+        """Generate cache key from TTS parameters
+        
+        ``variant`` describes every other setting that changes the cached
+        output (engine, post-processing, chunking, sample rate).
+        """
+        content = f"{text}|{voice}|{rate}|{pitch}|{variant}"
         return hashlib.md5(content.encode()).hexdigest()
     
-    def get(self, text: str, voice: str, rate: float, pitch: float) -> Optional[bytes]:
+    @staticmethod
+    def _entry_size(value) -> int:
+        """Payload size in bytes of a cached value"""
+        nbytes = getattr(value, 'nbytes', None)
+        return nbytes if nbytes is not None else len(value)
+    
+    def _is_expired(self, inserted_at: float, now: float) -> bool:
+        return now - inserted_at >= self.ttl_seconds
+    
+    def get(self, text: str, voice: str, rate: float, pitch: float, variant: str = '') -> Optional[Any]:
         """Get cached audio data"""
+        key = self._generate_key(text, voice, rate, pitch, variant)
+        
         with self.lock:
-            key = self._generate_key(text, voice, rate, pitch)
-            
-            # Check if key exists and is not expired
-            if key in self.cache:
-                if time.time() - self.timestamps[key] < self.ttl_seconds:
-                    # Update access order
-                    self.access_order[key] = time.time()
-                    return self.cache[key]
-                else:
-                    # Remove expired entry
-                    self._remove_key(key)
+            entry = self.cache.get(key)
+            
+            if entry is not None:
+                audio_data, inserted_at = entry
+                if not self._is_expired(inserted_at, time.time()):
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    return audio_data
+                
+                # Remove expired entry
+                self._remove_key(key)
+                self.expirations += 1
             
+            self.misses += 1
             return None
     
-    def put(self, text: str, voice: str, rate: float, pitch: float, audio_data: bytes):
-        """Cache audio data"""
+    def put(self, text: str, voice: str, rate: float, pitch: float, audio_data: Any, variant: str = ''):
+        """Cache audio data (raw bytes or a ``CachedAudio`` entry)"""
+        key = self._generate_key(text, voice, rate, pitch, variant)
+        size = self._entry_size(audio_data)
+        
         with self.lock:
-            key = self._generate_key(text, voice, rate, pitch)
+            # Replacing an entry must not count against the budget twice
+            self._remove_key(key)
+            
+            # A single entry larger than the whole budget would flush everything
+            if self.max_bytes is not None and size > self.max_bytes:
+                self.rejected += 1
+                return
             
-            # Remove oldest entries if cache is full
-            while len(self.cache) >= self.max_size:
-                oldest_key = min(self.access_order, key=self.access_order.get)
+            now = time.time()
+            while self.cache and (
+                len(self.cache) >= self.max_size
+                or (self.max_bytes is not None and self.current_bytes + size > self.max_bytes)
+            ):
+                oldest_key, (_, inserted_at) = next(iter(self.cache.items()))
                 self._remove_key(oldest_key)
+                if self._is_expired(inserted_at, now):
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
             
             # Add new entry
-            self.cache[key] = audio_data
-            self.access_order[key] = time.time()
-            self.timestamps[key] = time.time()
+            self.cache[key] = (audio_data, now)
+            self.current_bytes += size
     
     def _remove_key(self, key: str):
         """Remove key from all data structures"""
-        if key in self.cache:
-            del self.cache[key]
-        if key in self.access_order:
-            del self.access_order[key]
-        if key in self.timestamps:
-            del self.timestamps[key]
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= self._entry_size(entry[0])
     
     def clear(self):
         """Clear all cached entries"""
         with self.lock:
             self.cache.clear()
-            self.access_order.clear()
-            self.timestamps.clear()
+            self.current_bytes = 0
     
     def stats(self) -> Dict:
         """Get cache statistics"""
         with self.lock:
+            total_requests = self.hits + self.misses
             return {
                 'size': len(self.cache),
                 'max_size': self.max_size,
-                'hit_rate': getattr(self, '_hit_count', 0) / max(getattr(self, '_total_requests', 1), 1),
-                'memory_mb': sum(len(data) for data in self.cache.values()) / (1024 * 1024)
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'memory_mb': self.current_bytes / (1024 * 1024),
+                'requests': total_requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total_requests if total_requests else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejected': self.rejected
             }
 
 class AudioOptimizer:
     """Optimize audio for streaming"""
     
     @staticmethod
-    def compress_audio(audio_data: bytes, target_bitrate: int = 64000) -> bytes:
-        """Compress audio for faster streaming"""
+    def compress_audio(audio_data: bytes, sample_rate: int = DEFAULT_SAMPLE_RATE) -> bytes:
+        """Apply dynamic range compression to a whole clip
+        
+        This only shapes levels; bitrate is reduced by the output codec
+        (see ``select_codec`` and ``create_encoder``). Streams compress
+        through their ``tts_dsp.DSPChain`` instead, which carries the
+        compressor state across segments.
+        """
         try:
             # Convert to numpy array
             audio_array = np.frombuffer(audio_data, dtype=np.int16)
             
             # Apply dynamic range compression
-            compressed = AudioOptimizer._dynamic_range_compression(audio_array)
-            
-            # Reduce bit depth if needed
-            if target_bitrate < 128000:
-                compressed = AudioOptimizer._reduce_bit_depth(compressed)
+            compressed = AudioOptimizer._dynamic_range_compression(audio_array, sample_rate=sample_rate)
             
             return compressed.tobytes()
         except Exception as e:
@@ -165,142 +485,745 @@ class AudioOptimizer:
             return audio_data
     
     @staticmethod
-    def _dynamic_range_compression(audio: np.ndarray, ratio: float = 4.0, threshold: float = 0.1) -> np.ndarray:
-        """Apply dynamic range compression"""
-        # Simple compressor implementation
-        audio_float = audio.astype(np.float32) / 32767.0
+    def _dynamic_range_compression(
+        audio: np.ndarray,
+        ratio: float = 4.0,
+        threshold: float = 0.1,
+        sample_rate: int = DEFAULT_SAMPLE_RATE
+    ) -> np.ndarray:
+        """Apply dynamic range compression (``threshold`` relative to full scale)
+        
+        Gain is reduced symmetrically for both polarities, with attack and
+        release smoothing (see ``tts_dsp.Compressor``).
+        """
+        compressor = Compressor(sample_rate, threshold_db=20 * np.log10(threshold), ratio=ratio)
+        compressed = np.concatenate((compressor.process(audio.astype(np.float32)), compressor.flush()))
+        return np.clip(np.round(compressed), -32768, 32767).astype(np.int16)
+    
+    @staticmethod
+    def select_codec(target_bitrate: int, sample_rate: int = DEFAULT_SAMPLE_RATE) -> str:
+        """Highest-fidelity streaming codec that fits ``target_bitrate``
+        
+        At 22050 Hz: pcm16 is 352.8 kbps, mu-law/A-law 176.4 kbps and
+        IMA-ADPCM 88.2 kbps.
+        """
+        return codec_for_bitrate(target_bitrate, sample_rate)
+    
+    @staticmethod
+    def create_encoder(codec: str) -> StreamEncoder:
+        """Stateful encoder for one output stream"""
+        return create_encoder(codec)
+    
+    @staticmethod
+    def wav_to_pcm16(source, target_sample_rate: int = DEFAULT_SAMPLE_RATE) -> bytes:
+        """Decode a WAV file (path or file object) to mono 16-bit PCM at the target rate"""
+        with wave.open(source, 'rb') as wav:
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            sample_rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+        
+        if sample_width == 1:
+            audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+        elif sample_width == 2:
+            audio = np.frombuffer(frames, dtype='<i2')
+        elif sample_width == 3:
+            # Keep the two most significant bytes of each little-endian sample
+            audio = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)[:, 1:].copy().view('<i2').ravel()
+        elif sample_width == 4:
+            audio = (np.frombuffer(frames, dtype='<i4') >> 16).astype(np.int16)
+        else:
+            raise ValueError(f"Unsupported WAV sample width: {sample_width}")
         
-        # Find samples above threshold
-        mask = np.abs(audio_float) > threshold
+        audio = audio.astype(np.float32)
+        if channels > 1:
+            audio = audio.reshape(-1, channels).mean(axis=1)
         
-        # Apply compression
-        audio_float[mask] = threshold + (audio_float[mask] - threshold) / ratio
+        if sample_rate != target_sample_rate and len(audio):
+            audio = resample(audio, sample_rate, target_sample_rate)
         
-        return (audio_float * 32767.0).astype(np.int16)
+        return np.clip(np.round(audio), -32768, 32767).astype('<i2').tobytes()
     
     @staticmethod
-    def _reduce_bit_depth(audio: np.ndarray) -> np.ndarray:
-        """Reduce bit depth for smaller file size"""
-        # Simple bit depth reduction
-        return (audio // 2).astype(np.int16)
+    @lru_cache(maxsize=32)
+    def _fade_ramps(fade_samples: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Precomputed, read-only fade-in and fade-out gain ramps"""
+        fade_in = np.linspace(0, 1, fade_samples, dtype=np.float32)
+        fade_out = fade_in[::-1].copy()
+        fade_in.flags.writeable = False
+        fade_out.flags.writeable = False
+        return fade_in, fade_out
     
     @staticmethod
-    def create_optimized_chunks(audio_data: bytes, chunk_size_ms: int = 100) -> List[bytes]:
-        """Create optimized audio chunks for streaming"""
-        try:
-            # Ensure chunk boundaries align with audio frames
-            sample_rate = 22050  # Common TTS sample rate
-            chunk_size_samples = int(sample_rate * chunk_size_ms / 1000)
-            
-            # Convert to numpy array
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            
-            chunks = []
-            for i in range(0, len(audio_array), chunk_size_samples):
-                chunk = audio_array[i:i + chunk_size_samples]
-                
-                # Apply fade in/out to prevent clicks
-                if len(chunk) > 100:  # Only if chunk is large enough
-                    fade_samples = min(50, len(chunk) // 4)
-                    chunk[:fade_samples] = chunk[:fade_samples] * np.linspace(0, 1, fade_samples)
-                    chunk[-fade_samples:] = chunk[-fade_samples:] * np.linspace(1, 0, fade_samples)
-                
-                chunks.append(chunk.tobytes())
-            
-            return chunks
+    def apply_fades(samples: np.ndarray, fade_samples: int = 50, fade_in: bool = True, fade_out: bool = True):
+        """Fade the edges of a writable int16 sample array in place to prevent clicks
+        
+        ``fade_in`` and ``fade_out`` select the start and end edges.
+        """
+        fade_samples = min(fade_samples, len(samples) // 4)
+        if fade_samples <= 0:
+            return
+        
+        ramp_in, ramp_out = AudioOptimizer._fade_ramps(fade_samples)
+        if fade_in:
+            np.multiply(samples[:fade_samples], ramp_in, out=samples[:fade_samples], casting='unsafe')
+        if fade_out:
+            np.multiply(samples[-fade_samples:], ramp_out, out=samples[-fade_samples:], casting='unsafe')
+    
+    @staticmethod
+    def crossfade_join(parts: List[bytes], fade_samples: int = 220) -> bytearray:
+        """Join PCM16 fragments, overlapping each join by a linear crossfade
+        
+        Each join overlaps up to ``fade_samples`` samples (capped at a
+        quarter of the shorter side), using the same ramps as ``apply_fades``,
+        so the result is shorter than the parts by the overlaps.
+        """
+        arrays = [np.frombuffer(part, dtype='<i2', count=len(part) // 2) for part in parts if len(part) >= 2]
+        if not arrays:
+            return bytearray()
+        
+        buffer = bytearray(sum(len(a) for a in arrays) * 2)
+        out = np.frombuffer(buffer, dtype='<i2')
+        out[:len(arrays[0])] = arrays[0]
+        position = len(arrays[0])
+        
+        for samples in arrays[1:]:
+            overlap = min(fade_samples, position // 4, len(samples) // 4)
+            if overlap > 0:
+                fade_in, fade_out = AudioOptimizer._fade_ramps(overlap)
+                mixed = out[position - overlap:position] * fade_out + samples[:overlap] * fade_in
+                out[position - overlap:position] = np.clip(mixed, -32768, 32767)
+            out[position:position + len(samples) - overlap] = samples[overlap:]
+            position += len(samples) - overlap
+        
+        del out  # release the export so the buffer can be trimmed
+        del buffer[position * 2:]
+        return buffer
+    
+    @staticmethod
+    def prepare_stream_buffer(
+        audio_data: bytes,
+        chunk_size_ms: int = 100,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        channels: int = 1,
+        fade_samples: int = 50,
+        fade_in: bool = True,
+        fade_out: bool = True
+    ) -> Tuple[bytearray, np.ndarray]:
+        """Build a streaming-ready buffer and its chunk offset table
+        
+        The audio is copied once into a new writable buffer, which is
+        trimmed to whole sample frames and has its edges faded in place; the
+        caller's data is never modified, even when it is a ``bytearray``.
+        A segment in the middle of a stream clears ``fade_in`` or
+        ``fade_out`` so its joins keep their level. The returned offsets are
+        chunk boundaries in bytes, aligned to sample frames, from 0 to the
+        buffer length.
+        """
+        frame_bytes = 2 * channels  # 16-bit PCM
+        buffer = bytearray(audio_data)
+        usable_bytes = len(buffer) - len(buffer) % frame_bytes
+        if usable_bytes < len(buffer):
+            del buffer[usable_bytes:]
+        
+        if fade_samples and usable_bytes and (fade_in or fade_out):
+            samples = np.frombuffer(buffer, dtype='<i2')
+            AudioOptimizer.apply_fades(samples, fade_samples * channels, fade_in, fade_out)
+            del samples  # release the export so the buffer stays resizable
+        
+        chunk_size_bytes = max(int(sample_rate * chunk_size_ms / 1000), 1) * frame_bytes
+        offsets = np.append(np.arange(0, usable_bytes, chunk_size_bytes, dtype=np.int64), usable_bytes)
+        return buffer, offsets
+    
+    @staticmethod
+    def create_optimized_chunks(
+        audio_data: bytes,
+        chunk_size_ms: int = 100,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        channels: int = 1,
+        fade_samples: int = 50
+    ) -> List[memoryview]:
+        """Create optimized audio chunks for streaming
+        
+        Chunks are ``memoryview`` slices of the buffer built by
+        ``prepare_stream_buffer``, aligned to whole sample frames.
+        """
+        buffer, offsets = AudioOptimizer.prepare_stream_buffer(
+            audio_data, chunk_size_ms, sample_rate, channels, fade_samples
+        )
+        return CachedAudio(buffer, offsets, sample_rate).chunks()
+
+class TextSegmenter:
+    """Split text into sentence/clause segments for incremental synthesis"""
+    
+    SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+    CLAUSE_RE = re.compile(r'(?<=[,;:])\s+')
+    
+    @staticmethod
+    def normalize(segment: str) -> str:
+        """Canonical form of a segment for fragment caching (whitespace collapsed)"""
+        return ' '.join(segment.split())
+    
+    @staticmethod
+    def split(text: str, max_chars: int = 200) -> List[str]:
+        """Split text into sentences, breaking overlong ones at clauses and then words"""
+        return list(TextSegmenter.iter_split(text, max_chars))
+    
+    @staticmethod
+    def _sentences(text: str) -> Iterator[str]:
+        start = 0
+        for match in TextSegmenter.SENTENCE_RE.finditer(text):
+            yield text[start:match.start()]
+            start = match.end()
+        yield text[start:]
+    
+    @staticmethod
+    def iter_split(text: str, max_chars: int = 200) -> Iterator[str]:
+        """Lazy ``split``: segments are produced as they are consumed"""
+        for sentence in TextSegmenter._sentences(text.strip()):
+            if not sentence:
+                continue
+            if len(sentence) <= max_chars:
+                yield sentence
+                continue
             
-        except Exception as e:
-            logging.warning(f"Chunk optimization failed: {e}")
-            # Fallback to simple chunking
-            chunk_size_bytes = chunk_size_ms * 44  # Approximate for 22kHz 16-bit
-            return [audio_data[i:i + chunk_size_bytes] for i in range(0, len(audio_data), chunk_size_bytes)]
+            for clause in TextSegmenter.CLAUSE_RE.split(sentence):
+                while len(clause) > max_chars:
+                    cut = clause.rfind(' ', 0, max_chars)
+                    if cut <= 0:
+                        cut = max_chars
+                    yield clause[:cut]
+                    clause = clause[cut:].lstrip()
+                if clause:
+                    yield clause
 
 class MetricsCollector:
-    """Collect and analyze TTS performance metrics"""
+    """Collect and analyze TTS performance metrics
     
-    def __init__(self):
-        self.metrics: List[TTSMetrics] = []
+    Raw per-request values go into a fixed-size columnar ring buffer (a
+    NumPy structured array), so recording is O(1) and windowed averages
+    are a vectorized mask over the timestamp column. Latency and
+    time-to-first-chunk quantiles come from windowed quantile sketches
+    labelled by engine and cache outcome, so they cover the whole window
+    even when it holds more requests than the ring buffer.
+    """
+    
+    RECORD_DTYPE = np.dtype([
+        ('timestamp', 'f8'),
+        ('engine', 'i2'),
+        ('cache_hit', '?'),
+        ('text_length', 'i4'),
+        ('audio_duration', 'f4'),
+        ('chunk_count', 'i4'),
+        ('latency_ms', 'f4'),
+        ('time_to_first_chunk_ms', 'f4'),
+        ('throughput_chars_per_sec', 'f4'),
+        ('memory_usage', 'f4'),
+        ('cpu_usage', 'f4'),
+        ('fragment_count', 'i4'),
+        ('fragment_hits', 'i4')
+    ])
+    
+    QUANTILES = (0.5, 0.95, 0.99)
+    
+    def __init__(self, capacity: int = 10000, max_window_minutes: int = 60):
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=self.RECORD_DTYPE)
+        self.count = 0  # total records ever added
+        self.engine_ids: Dict[str, int] = {}
         self.lock = threading.Lock()
         
+        # One-minute slices covering the longest supported window
+        sketch_config = dict(slice_seconds=60.0, num_slices=max_window_minutes + 1)
+        self.latency_sketches = SketchFamily(**sketch_config)
+        self.ttfc_sketches = SketchFamily(**sketch_config)
+        
     def add_metric(self, metric: TTSMetrics):
         """Add a metric to the collection"""
+        now = time.time()
         with self.lock:
-            self.metrics.append(metric)
+            engine_id = self.engine_ids.setdefault(metric.engine, len(self.engine_ids))
+            self.records[self.count % self.capacity] = (
+                now,
+                engine_id,
+                metric.cache_hit,
+                metric.text_length,
+                metric.audio_duration,
+                metric.chunk_count,
+                metric.latency_ms,
+                metric.time_to_first_chunk_ms,
+                metric.throughput_chars_per_sec,
+                metric.memory_usage,
+                metric.cpu_usage,
+                metric.fragment_count,
+                metric.fragment_hits
+            )
+            self.count += 1
             
-            # Keep only recent metrics (last 1000)
-            if len(self.metrics) > 1000:
-                self.metrics = self.metrics[-1000:]
+            labels = (metric.engine, metric.cache_hit)
+            self.latency_sketches.add(labels, metric.latency_ms, now)
+            self.ttfc_sketches.add(labels, metric.time_to_first_chunk_ms, now)
+    
+    def _quantile_stats(self, window_seconds: float, now: float, match=None) -> Dict:
+        latency_counts = self.latency_sketches.window_counts(window_seconds, now, match)
+        ttfc_counts = self.ttfc_sketches.window_counts(window_seconds, now, match)
+        latency_q = self.latency_sketches.quantiles_from_counts(latency_counts, self.QUANTILES)
+        ttfc_q = self.ttfc_sketches.quantiles_from_counts(ttfc_counts, self.QUANTILES)
+        return {
+            'requests': int(latency_counts.sum()),
+            'p50_latency_ms': latency_q[0],
+            'p95_latency_ms': latency_q[1],
+            'p99_latency_ms': latency_q[2],
+            'p50_time_to_first_chunk_ms': ttfc_q[0],
+            'p95_time_to_first_chunk_ms': ttfc_q[1],
+            'p99_time_to_first_chunk_ms': ttfc_q[2]
+        }
+    
+    @staticmethod
+    def _averages(records: np.ndarray) -> Dict:
+        fragments = int(records['fragment_count'].sum())
+        return {
+            'cache_hit_rate': float(records['cache_hit'].mean()),
+            'fragment_hit_rate': float(records['fragment_hits'].sum()) / fragments if fragments else 0.0,
+            'avg_latency_ms': float(records['latency_ms'].mean()),
+            'avg_time_to_first_chunk_ms': float(records['time_to_first_chunk_ms'].mean())
+        }
     
     def get_performance_stats(self, window_minutes: int = 10) -> Dict:
-        """Get performance statistics for the specified time window"""
+        """Get performance statistics for the specified time window
+        
+        Averages cover the requests of the window still held in the ring
+        buffer; counts and quantiles cover the whole window.
+        """
+        now = time.time()
+        window_seconds = window_minutes * 60
+        
         with self.lock:
-            cutoff_time = time.time() - (window_minutes * 60)
-            recent_metrics = [m for m in self.metrics if time.time() - cutoff_time < window_minutes * 60]
+            filled = self.records[:min(self.count, self.capacity)]
+            recent = filled[filled['timestamp'] >= now - window_seconds]
             
-            if not recent_metrics:
+            if not len(recent):
                 return {}
             
-            latencies = [m.latency_ms for m in recent_metrics]
-            throughputs = [m.throughput_chars_per_sec for m in recent_metrics]
-            cache_hits = sum(1 for m in recent_metrics if m.cache_hit)
-            
-            return {
-                'total_requests': len(recent_metrics),
-                'cache_hit_rate': cache_hits / len(recent_metrics),
-                'avg_latency_ms': np.mean(latencies),
-                'p95_latency_ms': np.percentile(latencies, 95),
-                'p99_latency_ms': np.percentile(latencies, 99),
-                'avg_throughput_chars_per_sec': np.mean(throughputs),
-                'avg_memory_usage_mb': np.mean([m.memory_usage for m in recent_metrics]),
-                'avg_cpu_usage_percent': np.mean([m.cpu_usage for m in recent_metrics])
+            overall = self._quantile_stats(window_seconds, now)
+            stats = {
+                'total_requests': overall.pop('requests'),
+                **self._averages(recent),
+                **overall,
+                'avg_throughput_chars_per_sec': float(recent['throughput_chars_per_sec'].mean()),
+                'avg_memory_usage_mb': float(recent['memory_usage'].mean()),
+                'avg_cpu_usage_percent': float(recent['cpu_usage'].mean()),
+                'by_engine': {},
+                'by_cache': {}
             }
+            
+            for engine, engine_id in self.engine_ids.items():
+                engine_records = recent[recent['engine'] == engine_id]
+                if not len(engine_records):
+                    continue
+                stats['by_engine'][engine or 'unknown'] = {
+                    **self._quantile_stats(window_seconds, now, lambda labels: labels[0] == engine),
+                    **self._averages(engine_records)
+                }
+            
+            for name, hit in (('hit', True), ('miss', False)):
+                outcome_records = recent[recent['cache_hit'] == hit]
+                if not len(outcome_records):
+                    continue
+                outcome = self._quantile_stats(window_seconds, now, lambda labels: labels[1] == hit)
+                outcome.update(self._averages(outcome_records))
+                del outcome['cache_hit_rate']
+                stats['by_cache'][name] = outcome
+            
+            return stats
+
+def render_kokoro_placeholder(text: str, pitch: float) -> bytes:
+    """Blocking Kokoro stand-in: a sine tone of ~50ms per character"""
+    time.sleep(0.1)  # Simulate processing time
+    
+    # Generate sine wave as placeholder
+    duration = len(text) * 0.05  # ~50ms per character
+    sample_rate = DEFAULT_SAMPLE_RATE
+    t = np.linspace(0, duration, int(sample_rate * duration))
+    frequency = 440 * pitch  # A4 note modified by pitch
+    audio = (np.sin(2 * np.pi * frequency * t) * 16383).astype(np.int16)
+    
+    return audio.tobytes()
+
+def render_coqui_batch_placeholder(items: List[Tuple[str, float]]) -> List[bytes]:
+    """Blocking batched Coqui stand-in: a two-partial tone of ~40ms per character
+    
+    Models a neural forward pass: a fixed per-call cost plus a smaller
+    per-utterance cost, so batching amortizes the fixed part.
+    """
+    time.sleep(0.04 + 0.01 * len(items))  # Faster than other engines
+    return [_coqui_tone(text, pitch) for text, pitch in items]
+
+def _coqui_tone(text: str, pitch: float) -> bytes:
+    duration = len(text) * 0.04
+    sample_rate = DEFAULT_SAMPLE_RATE
+    t = np.linspace(0, duration, int(sample_rate * duration))
+    
+    # More complex waveform for Coqui
+    frequency = 200 * pitch
+    audio = np.sin(2 * np.pi * frequency * t) + 0.3 * np.sin(2 * np.pi * frequency * 2 * t)
+    audio = (audio * 16383).astype(np.int16)
+    
+    return audio.tobytes()
+
+def load_coqui_model():
+    """This process's Coqui model, loaded and warmed up once under the Torch CPU profile
+    
+    The model stands in as the batched placeholder renderer, which
+    ``load_model`` treats like a real one (eval mode, int8 quantization
+    where it has layers to quantize, warm-up calls).
+    """
+    return load_model(
+        'coqui',
+        lambda: render_coqui_batch_placeholder,
+        warmup=lambda model: model([("Warming up the model.", 1.0)])
+    )
+
+def init_coqui_worker(profile: TorchCPUProfile):
+    """Coqui executor initializer: apply the CPU profile and load the model
+    in the pool worker (each process of a process pool loads its own)"""
+    configure_torch(profile)
+    load_coqui_model()
+
+def render_coqui(text: str, pitch: float) -> bytes:
+    """Blocking Coqui call with this process's model"""
+    return load_coqui_model()([(text, pitch)])[0]
+
+def render_coqui_batch(items: List[Tuple[str, float]]) -> List[bytes]:
+    """Blocking batched Coqui call with this process's model"""
+    return load_coqui_model()(items)
+
+class _Flight:
+    """A shared in-flight call, its QoS and the number of callers waiting on it"""
+    
+    def __init__(self, task: asyncio.Future, qos: Optional[SharedQoS]):
+        self.task = task
+        self.qos = qos
+        self.waiters = 0
+
+class SingleFlight:
+    """Coalesce identical concurrent calls onto a single in-flight task
+    
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task. The task is shielded from individual
+    cancellations and is only cancelled once every waiter has gone away.
+    Exceptions propagate to every waiter.
+    
+    Callers pass their ``RequestQoS``; the task runs under a ``SharedQoS``
+    that every joining caller raises, so a live request that joins a
+    background render (e.g. a pre-warm) is not queued at background priority.
+    """
+    
+    def __init__(self):
+        self._flights: Dict[Any, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.promoted = 0
+    
+    def _forget(self, key: Any, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+    
+    @staticmethod
+    async def _run(factory, qos: Optional[SharedQoS]) -> Any:
+        # The task runs in a copy of the leader's context; the shared QoS
+        # replaces the leader's own
+        if qos is not None:
+            current_qos.set(qos)
+        return await factory()
+    
+    async def do(self, key: Any, factory, qos: Optional[RequestQoS] = None) -> Any:
+        """Run ``factory()`` for ``key`` unless an identical call is in flight"""
+        flight = self._flights.get(key)
+        if flight is None:
+            shared = SharedQoS(qos) if qos is not None else None
+            flight = _Flight(asyncio.ensure_future(self._run(factory, shared)), shared)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            if flight.qos is not None and qos is not None and flight.qos.join(qos):
+                self.promoted += 1
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is interested any more; later callers start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+    
+    def stats(self) -> Dict:
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'coalesced_requests': self.coalesced,
+            'promoted_flights': self.promoted
+        }
 
 class OptimizedTTSStreamer:
     """High-performance TTS streaming service"""
     
-    def __init__(self, cache_size: int = 500, enable_compression: bool = True):
-        self.cache = LRUCache(max_size=cache_size)
+    # Default worker pool size per engine; pyttsx3 drivers are not thread-safe
+    DEFAULT_ENGINE_CONCURRENCY = {'kokoro': 4, 'pyttsx3': 1, 'coqui': 2}
+    
+    # Faster engine to switch to when a request's deadline is at risk
+    DEFAULT_ENGINE_FALLBACKS = {'kokoro': 'coqui'}
+    
+    # Relative output quality, for requests with a minimum quality
+    ENGINE_QUALITY = {'kokoro': 3, 'coqui': 2, 'pyttsx3': 1}
+    
+    # Engines that run Torch models, under ``torch_profile``, and their
+    # executor initializers, which load the model in each pool worker
+    TORCH_ENGINES = {'coqui': init_coqui_worker}
+    
+    # Native sample rate of each engine's renders
+    ENGINE_SAMPLE_RATES = {'kokoro': DEFAULT_SAMPLE_RATE, 'pyttsx3': DEFAULT_SAMPLE_RATE, 'coqui': DEFAULT_SAMPLE_RATE}
+    
+    def __init__(
+        self,
+        cache_size: int = 500,
+        enable_compression: bool = True,
+        cache_max_mb: Optional[float] = 256,
+        disk_cache_dir: Optional[str] = None,
+        disk_cache_max_mb: float = 1024,
+        incremental: bool = False,
+        lookahead_segments: int = 1,
+        engine_concurrency: Optional[Dict[str, int]] = None,
+        engine_executor_kinds: Optional[Dict[str, str]] = None,
+        enable_batching: bool = True,
+        batch_max_size: int = 8,
+        batch_max_wait_ms: float = 10.0,
+        engines: Optional[List[str]] = None,
+        codec: str = 'pcm16',
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        chunk_size_ms: int = 20,
+        adaptive_chunking: bool = True,
+        max_chunk_ms: int = 640,
+        buffer_size: int = 3,
+        compressor_settings: Optional[Dict] = None,
+        render_cache_size: int = 64,
+        render_cache_max_mb: float = 32,
+        cache_entry_max_mb: float = 16,
+        cache_compression: bool = False,
+        cache_block_ms: int = 320,
+        long_form_threshold: int = 20000,
+        fragment_cache_size: int = 0,
+        fragment_cache_max_mb: float = 128,
+        crossfade_ms: float = 10.0,
+        admission_queue_size: Optional[int] = 256,
+        engine_fallbacks: Optional[Dict[str, str]] = None,
+        breaker_failure_threshold: int = 5,
+        breaker_cooldown_s: float = 10.0,
+        engine_faults: Optional[Dict] = None,
+        torch_profile: Optional[TorchCPUProfile] = None,
+        process_workers: int = 1,
+        trace_sinks: Optional[List] = None,
+        resource_sample_interval: float = 1.0,
+        profile_memory: bool = False
+    ):
+        self.cache = LRUCache(
+            max_size=cache_size,
+            max_bytes=int(cache_max_mb * 1024 * 1024) if cache_max_mb else None
+        )
+        self.disk_cache = (
+            DiskAudioCache(disk_cache_dir, max_bytes=int(disk_cache_max_mb * 1024 * 1024))
+            if disk_cache_dir else None
+        )
         self.metrics_collector = MetricsCollector()
         self.enable_compression = enable_compression
         self.audio_optimizer = AudioOptimizer()
+        self.single_flight = SingleFlight()
+        
+        # Recent neutral engine renders, so another rate, pitch, codec or
+        # output rate of a text only re-runs the DSP chain
+        self.render_cache = (
+            LRUCache(max_size=render_cache_size, max_bytes=int(render_cache_max_mb * 1024 * 1024))
+            if render_cache_size > 0 else None
+        )
+        
+        # Optional sentence-level cache of raw engine audio, so texts that
+        # share sentences with earlier ones only synthesize the new parts
+        self.fragment_cache = (
+            LRUCache(max_size=fragment_cache_size, max_bytes=int(fragment_cache_max_mb * 1024 * 1024))
+            if fragment_cache_size > 0 else None
+        )
+        self.crossfade_ms = crossfade_ms
+        
+        # CPU inference profile of Torch-backed engines. Unset thread counts
+        # split the CPUs across worker processes and the calls each one
+        # runs at once, so concurrent streams do not oversubscribe cores.
+        concurrency = {**self.DEFAULT_ENGINE_CONCURRENCY, **(engine_concurrency or {})}
+        self.torch_profile = (torch_profile or TorchCPUProfile()).for_workers(
+            process_workers, concurrency.get('coqui', 1)
+        )
         
-        # Initialize TTS engines
-        self.engines = self._initialize_engines()
-        self.default_engine = 'kokoro'  # Based on task description
+        # Initialize TTS engines (all available ones unless a subset is selected)
+        self.engine_init_times: Dict[str, float] = {}
+        self.engines = self._initialize_engines(engines)
+        # Kokoro when loaded, otherwise the best loaded engine
+        self.default_engine = 'kokoro' if 'kokoro' in self.engines else max(
+            self.engines, key=lambda name: self.ENGINE_QUALITY.get(name, 0)
+        )
+        
+        # Blocking engine calls run in per-engine worker pools; Torch engine
+        # pools apply the CPU profile and load the model in their workers
+        kinds = engine_executor_kinds or {}
+        self.executors: Dict[str, EngineExecutor] = {}
+        for name in self.engines:
+            initializer = self.TORCH_ENGINES.get(name)
+            self.executors[name] = EngineExecutor(
+                name, concurrency.get(name, 1), kinds.get(name, 'thread'),
+                initializer=initializer,
+                initargs=(self.torch_profile,) if initializer is not None else ()
+            )
+        
+        # Model-backed engines get a micro-batching scheduler in front of their pool
+        self.batchers: Dict[str, MicroBatcher] = {}
+        if enable_batching and 'coqui' in self.engines:
+            self.batchers['coqui'] = MicroBatcher(
+                'coqui',
+                partial(run_inference, render_coqui_batch),
+                self.executors['coqui'],
+                max_batch_size=batch_max_size,
+                max_wait_ms=batch_max_wait_ms
+            )
+        
+        # Admission control in front of every engine: priority queueing
+        # and load shedding once the engine's slots are taken. Batched
+        # engines admit enough requests to fill their batches.
+        self.admission: Dict[str, AdmissionController] = {}
+        if admission_queue_size is not None:
+            for name, executor in self.executors.items():
+                capacity = executor.max_concurrency
+                if name in self.batchers:
+                    capacity *= self.batchers[name].max_batch_size
+                self.admission[name] = AdmissionController(name, capacity, admission_queue_size)
+        self.engine_fallbacks = {**self.DEFAULT_ENGINE_FALLBACKS, **(engine_fallbacks or {})}
+        self.downgrades: Counter = Counter()
         
-        # Performance monitoring
-        self.process = psutil.Process()
+        # Routing over the loaded engines: latency/error tracking, circuit
+        # breakers, and optional injected faults for exercising both
+        self.router = EngineRouter(
+            self.engines,
+            self.ENGINE_QUALITY,
+            self.admission,
+            failure_threshold=breaker_failure_threshold,
+            cooldown_s=breaker_cooldown_s
+        )
+        self.fault_injector = FaultInjector(engine_faults)
+        
+        # Private scratch directory for engines that can only render to a file,
+        # on tmpfs where available
+        self.temp_dir = None
+        if 'pyttsx3' in self.engines:
+            self.temp_dir = tempfile.mkdtemp(
+                prefix='tts-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None
+            )
+        
+        # Performance monitoring: per-stage traces, and process CPU/RSS
+        # sampled off the request path
+        self.tracer = Tracer(trace_sinks)
+        self.resource_sampler = ResourceSampler(resource_sample_interval)
+        self.resource_sampler.start()
+        
+        # Line-by-line memory profiling is a debugging aid; it slows every
+        # request considerably, so it is only applied on request
+        if profile_memory or os.environ.get('TTS_PROFILE_MEMORY') == '1':
+            import memory_profiler
+            self.synthesize_stream = memory_profiler.profile(self.synthesize_stream)
+            logging.info("Memory profiling enabled for synthesize_stream")
         
         # Streaming settings
-        self.chunk_size_ms = 50  # Smaller chunks for lower latency
-        self.buffer_size = 3  # Buffer ahead for smooth playback
+        # Chunks start at ``chunk_size_ms``; with adaptive chunking they grow
+        # up to ``max_chunk_ms`` once the client is ``buffer_size`` chunks
+        # ahead of playback (see AdaptiveChunker)
+        self.chunk_size_ms = chunk_size_ms
+        self.adaptive_chunking = adaptive_chunking
+        self.max_chunk_ms = max_chunk_ms
+        self.buffer_size = buffer_size
+        self.sample_rate = sample_rate  # Default output rate; streams may request another
+        
+        # Engines render at neutral rate and pitch at their native sample
+        # rate; each stream's DSP chain applies rate, pitch, compression and
+        # output rate conversion, so one engine render serves every variant
+        self.compressor_settings = compressor_settings or {}
+        
+        # Default output codec; clients can negotiate another per stream
+        if codec not in CODEC_BITS:
+            raise ValueError(f"Unknown codec: {codec}")
+        self.codec = codec
+        
+        # Incremental synthesis: stream sentence by sentence, rendering
+        # ``lookahead_segments`` segments ahead of the one being streamed
+        self.incremental = incremental
+        self.lookahead_segments = lookahead_segments
+        
+        # Long-form: texts over ``long_form_threshold`` characters are
+        # segmented lazily and streamed in bounded memory; streams whose
+        # audio outgrows ``cache_entry_max_mb`` are not cached
+        self.long_form_threshold = long_form_threshold
+        self.cache_entry_max_bytes = int(cache_entry_max_mb * 1024 * 1024)
+        
+        # Memory cache entries can be kept losslessly compressed in blocks
+        # of ``cache_block_ms``, decompressed block by block on a hit
+        self.cache_compression = cache_compression
+        self.cache_block_chunks = max(int(round(cache_block_ms / chunk_size_ms)), 1)
         
         logging.info(f"TTS Streamer initialized with {len(self.engines)} engines")
     
-    def _initialize_engines(self) -> Dict[str, Any]:
-        """Initialize available TTS engines"""
+    def _initialize_engines(self, selected: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Initialize available TTS engines
+        
+        Engine packages are imported here, and only for selected engines.
+        """
         engines = {}
         
+        def wanted(name: str) -> bool:
+            return selected is None or name in selected
+        
         # Kokoro TTS (high-quality, fast)
-        try:
-            # This would be the actual Kokoro initialization
-            # engines['kokoro'] = KokoroTTS()
-            engines['kokoro'] = 'kokoro_placeholder'
-            logging.info("Kokoro TTS engine loaded")
-        except Exception as e:
-            logging.warning(f"Failed to load Kokoro TTS: {e}")
+        if wanted('kokoro'):
+            started = time.perf_counter()
+            try:
+                # This would be the actual Kokoro initialization
+                # engines['kokoro'] = KokoroTTS()
+                engines['kokoro'] = 'kokoro_placeholder'
+                self.engine_init_times['kokoro'] = time.perf_counter() - started
+                logging.info("Kokoro TTS engine loaded")
+            except Exception as e:
+                logging.warning(f"Failed to load Kokoro TTS: {e}")
         
         # PyTTSx3 as fallback
-        if PYTTSX3_AVAILABLE:
-            engines['pyttsx3'] = pyttsx3.init()
-            engines['pyttsx3'].setProperty('rate', 180)
-            logging.info("PyTTSx3 engine loaded")
+        if PYTTSX3_AVAILABLE and wanted('pyttsx3'):
+            started = time.perf_counter()
+            try:
+                import pyttsx3
+                engines['pyttsx3'] = pyttsx3.init()
+                engines['pyttsx3'].setProperty('rate', 180)
+                self.engine_init_times['pyttsx3'] = time.perf_counter() - started
+                logging.info("PyTTSx3 engine loaded")
+            except Exception as e:
+                logging.warning(f"Failed to load PyTTSx3: {e}")
         
         # Torch-based TTS
-        if TORCH_AVAILABLE:
+        if TORCH_AVAILABLE and wanted('coqui'):
+            started = time.perf_counter()
             try:
-                # engines['coqui'] = TTS("tts_models/en/ljspeech/tacotron2-DDC")
+                configure_torch(self.torch_profile)
+                import TTS.api  # noqa: F401 - fail here, not on the first request
+                # The model itself is loaded in the engine's executor (see
+                # ``init_coqui_worker``); warm-up forces it
                 engines['coqui'] = 'coqui_placeholder'
+                self.engine_init_times['coqui'] = time.perf_counter() - started
                 logging.info("Coqui TTS engine loaded")
             except Exception as e:
                 logging.warning(f"Failed to load Coqui TTS: {e}")
@@ -310,14 +1233,20 @@ class OptimizedTTSStreamer:
         
         return engines
     
-    @memory_profiler.profile
     async def synthesize_stream(
         self,
         text: str,
         voice: str = 'default',
         rate: float = 1.0,
         pitch: float = 1.0,
-        engine: Optional[str] = None
+        engine: Optional[str] = None,
+        incremental: Optional[bool] = None,
+        codec: Optional[str] = None,
+        priority: int = 0,
+        deadline_ms: Optional[float] = None,
+        sample_rate: Optional[int] = None,
+        long_form: Optional[bool] = None,
+        min_quality: Optional[int] = None
     ) -> AsyncGenerator[AudioChunk, None]:
         """
         Synthesize text to speech with optimized streaming
@@ -327,92 +1256,581 @@ class OptimizedTTSStreamer:
             voice: Voice ID
             rate: Speech rate multiplier
             pitch: Pitch multiplier
-            engine: TTS engine to use
+            engine: TTS engine to use; ``'auto'`` for the fastest healthy
+                one. A requested engine that is not loaded, below
+                ``min_quality`` or behind an open circuit breaker is
+                replaced by the router's pick
+            incremental: Stream sentence by sentence instead of waiting for
+                the whole text to render (defaults to ``self.incremental``)
+            codec: Output codec negotiated by the client, one of
+                ``tts_codecs.CODEC_BITS`` (defaults to ``self.codec``)
+            priority: Admission priority; higher is served first when the
+                engine is saturated
+            deadline_ms: Budget for the first audio, from now. Requests
+                predicted to miss it are switched to a faster engine if one
+                fits, and rejected otherwise
+            sample_rate: Output sample rate (defaults to ``self.sample_rate``)
+            long_form: Stream in memory independent of text length: the
+                text is segmented lazily and synthesized in order (implies
+                ``incremental``), renders bypass the render and fragment
+                caches, and only results within ``cache_entry_max_mb`` are
+                cached. Defaults to on for texts over ``long_form_threshold``
+                characters
+            min_quality: Lowest acceptable ``ENGINE_QUALITY`` when routing
             
         Yields:
             AudioChunk: Optimized audio chunks for streaming
+            
+        Raises:
+            RequestRejected: The request was shed by admission control, or
+                no engine is available
         """
         request_id = hashlib.md5(f"{text}{voice}{rate}{pitch}{time.time()}".encode()).hexdigest()[:8]
         start_time = time.time()
-        start_cpu = self.process.cpu_percent()
-        start_memory = self.process.memory_info().rss / 1024 / 1024
+        requested_engine = engine or self.default_engine
+        if long_form is None:
+            long_form = len(text) > self.long_form_threshold
+        if incremental is None or long_form:
+            incremental = long_form or self.incremental
+        codec = codec or self.codec
+        if codec not in CODEC_BITS:
+            raise ValueError(f"Unknown codec: {codec}")
+        sample_rate = int(sample_rate or self.sample_rate)
+        if sample_rate <= 0:
+            raise ValueError(f"Invalid sample rate: {sample_rate}")
+        trace = self.tracer.start(request_id, engine=requested_engine, text_length=len(text), codec=codec)
+        qos = RequestQoS(priority, time.monotonic() + deadline_ms / 1000 if deadline_ms is not None else None)
+        routing = None
         
         try:
-            # Check cache first
-            cached_audio = self.cache.get(text, voice, rate, pitch)
+            engine, routing = self.router.select(requested_engine, len(text), min_quality, priority)
+            # A reserved half-open probe is released below if this stream
+            # never calls the engine (a cache hit or a downgrade)
+            routed_engine = engine
+            if engine != requested_engine:
+                logging.info(f"Request {request_id}: routed to {engine} ({routing}, requested {requested_engine})")
+                trace.attributes['engine'] = engine
+                trace.attributes['routing'] = routing
+            
+            # Check cache first; entries are already processed and chunked
+            variant = self._output_variant(engine, incremental, codec, sample_rate)
+            with trace.stage('cache_lookup'):
+                cached_audio = self._cache_lookup(text, voice, rate, pitch, variant)
+            
+            if cached_audio is None and qos.deadline is not None:
+                fallback = self._downgrade_engine(engine, qos)
+                if fallback is not None:
+                    logging.info(f"Request {request_id}: {engine} would miss its deadline, using {fallback}")
+                    trace.attributes['downgraded_from'] = engine
+                    trace.attributes['engine'] = engine = fallback
+                    variant = self._output_variant(engine, incremental, codec, sample_rate)
+                    with trace.stage('cache_lookup'):
+                        cached_audio = self._cache_lookup(text, voice, rate, pitch, variant)
             cache_hit = cached_audio is not None
             
+            # Only a single-segment stream knows its chunk count up front
+            single_segment = True
             if cache_hit:
-                audio_data = cached_audio
                 logging.debug(f"Cache hit for request {request_id}")
+                audio_segments = self._single_segment(cached_audio)
+            elif long_form:
+                single_segment = False
+                audio_segments = self._synthesize_segments(
+                    TextSegmenter.iter_split(text), voice, engine, trace, qos, cache_renders=False
+                )
+            elif incremental:
+                segments = TextSegmenter.split(text)
+                single_segment = len(segments) == 1
+                audio_segments = self._synthesize_segments(segments, voice, engine, trace, qos)
+            elif self.fragment_cache is not None:
+                # Assembled from cached and fresh sentences, streamed as one
+                audio_segments = self._synthesize_stitched(TextSegmenter.split(text), voice, engine, trace, qos)
             else:
-                # Synthesize audio
-                audio_data = await self._synthesize_audio(text, voice, rate, pitch, engine or self.default_engine)
-                
-                # Cache the result
-                self.cache.put(text, voice, rate, pitch, audio_data)
-                logging.debug(f"Synthesized and cached audio for request {request_id}")
+                audio_segments = self._synthesize_segments([text], voice, engine, trace, qos)
             
-            # Optimize audio if compression is enabled
-            if self.enable_compression and not cache_hit:
-                audio_data = self.audio_optimizer.compress_audio(audio_data)
+            # Segments kept for caching the whole stream; dropped once they
+            # outgrow the cache entry limit
+            prepared = []
+            prepared_bytes = 0
+            chunk_id = 0
+            audio_duration = 0.0
+            first_chunk_time = None
+            # One DSP chain and encoder per stream so their state carries
+            # across segments
+            encoder = None if cache_hit else create_encoder(codec)
+            dsp = None if cache_hit else self._create_dsp(engine, sample_rate, rate, pitch)
+            chunker = self._create_chunker()
+            first_segment = True
             
-            # Create optimized chunks
-            chunk_data_list = self.audio_optimizer.create_optimized_chunks(
-                audio_data, self.chunk_size_ms
-            )
-            
-            # Calculate audio duration
-            audio_duration = len(audio_data) / (22050 * 2)  # Assuming 22kHz 16-bit
-            
-            # Stream chunks
-            total_chunks = len(chunk_data_list)
-            for i, chunk_data in enumerate(chunk_data_list):
-                chunk = AudioChunk(
-                    data=chunk_data,
-                    sample_rate=22050,
-                    chunk_id=i,
-                    total_chunks=total_chunks,
-                    timestamp=time.time(),
-                    is_final=(i == total_chunks - 1)
-                )
+            async for audio, is_last_segment in audio_segments:
+                if not cache_hit:
+                    # Post-process once into the streaming-ready form
+                    audio = self._prepare_audio(
+                        audio, encoder, is_last_segment, trace, dsp, sample_rate, first=first_segment
+                    )
+                    first_segment = False
+                    if single_segment:
+                        # Cache before streaming so later identical requests
+                        # hit instead of re-synthesizing while this one drains
+                        if audio.nbytes <= self.cache_entry_max_bytes:
+                            self._cache_store(text, voice, rate, pitch, variant, audio, trace)
+                    elif prepared is not None:
+                        prepared_bytes += audio.nbytes
+                        if prepared_bytes <= self.cache_entry_max_bytes:
+                            prepared.append(audio)
+                        else:
+                            logging.debug(f"Request {request_id} is too large to cache")
+                            prepared = None
                 
-                yield chunk
+                audio_duration += audio.duration
+                read = audio.reader()
+                grid_chunks = audio.chunk_count
+                # Adaptive chunk counts depend on the consumer, so are never known up front
+                total_chunks = grid_chunks if single_segment and chunker is None else None
+                bytes_per_second = CODEC_BITS[audio.codec] * audio.sample_rate / 8
                 
-                # Small delay to prevent overwhelming the client
-                await asyncio.sleep(0.001)
+                # Stream chunks; each spans one or more grid chunks
+                start = 0
+                while start < grid_chunks:
+                    end = min(start + (chunker.grains if chunker is not None else 1), grid_chunks)
+                    chunk = AudioChunk(
+                        data=read(start, end),
+                        sample_rate=audio.sample_rate,
+                        chunk_id=chunk_id,
+                        total_chunks=total_chunks,
+                        timestamp=time.time(),
+                        is_final=is_last_segment and end == grid_chunks,
+                        codec=audio.codec
+                    )
+                    chunk_id += 1
+                    start = end
+                    
+                    if first_chunk_time is None:
+                        first_chunk_time = time.time()
+                    
+                    # Flow control is left to the consumer (e.g. the
+                    # server awaits its transport's drain()); resuming
+                    # here means the chunk was taken
+                    yield chunk
+                    if chunker is not None:
+                        chunker.delivered(len(chunk.data) / bytes_per_second)
+            
+            if not cache_hit and not single_segment and prepared:
+                # Cache the result
+                self._cache_store(text, voice, rate, pitch, variant, CachedAudio.concat(prepared), trace)
+                logging.debug(f"Synthesized and cached audio for request {request_id}")
             
             # Collect metrics
             end_time = time.time()
             processing_time = end_time - start_time
             latency_ms = processing_time * 1000
             throughput = len(text) / processing_time if processing_time > 0 else 0
+            time_to_first_chunk_ms = ((first_chunk_time or end_time) - start_time) * 1000
             
-            end_cpu = self.process.cpu_percent()
-            end_memory = self.process.memory_info().rss / 1024 / 1024
+            trace.add('time_to_first_chunk', time_to_first_chunk_ms / 1000)
+            trace.add('total_stream', processing_time)
+            trace.attributes['cache_hit'] = cache_hit
+            if chunker is not None and chunker.underruns:
+                trace.incr('underruns', chunker.underruns)
+            self.tracer.finish(trace)
             
             metric = TTSMetrics(
                 request_id=request_id,
                 text_length=len(text),
                 processing_time=processing_time,
                 audio_duration=audio_duration,
-                chunk_count=total_chunks,
+                chunk_count=chunk_id,
                 cache_hit=cache_hit,
-                memory_usage=end_memory - start_memory,
-                cpu_usage=(end_cpu + start_cpu) / 2,
+                memory_usage=self.resource_sampler.rss_mb,
+                cpu_usage=self.resource_sampler.cpu_percent,
                 latency_ms=latency_ms,
-                throughput_chars_per_sec=throughput
+                throughput_chars_per_sec=throughput,
+                time_to_first_chunk_ms=time_to_first_chunk_ms,
+                engine=engine,
+                fragment_count=trace.counters.get('fragments', 0),
+                fragment_hits=trace.counters.get('fragment_hits', 0)
             )
             
             self.metrics_collector.add_metric(metric)
             
-            logging.info(f"Request {request_id}: {latency_ms:.1f}ms, {throughput:.1f} chars/sec, cache_hit={cache_hit}")
+            logging.info(
+                f"Request {request_id}: {latency_ms:.1f}ms, first chunk {time_to_first_chunk_ms:.1f}ms, "
+                f"{throughput:.1f} chars/sec, cache_hit={cache_hit}"
+            )
             
+        except RequestRejected as e:
+            logging.warning(f"Request {request_id} rejected ({e.reason}): {e}")
+            raise
         except Exception as e:
             logging.error(f"TTS synthesis failed for request {request_id}: {e}")
             raise
+        finally:
+            if routing == 'probe':
+                self.router.release_probe(routed_engine)
+    
+    def _create_chunker(self) -> Optional[AdaptiveChunker]:
+        """Chunk size policy for one stream; None streams fixed ``chunk_size_ms`` chunks"""
+        if not self.adaptive_chunking:
+            return None
+        return AdaptiveChunker(self.chunk_size_ms, self.chunk_size_ms, self.max_chunk_ms, self.buffer_size)
+    
+    @staticmethod
+    async def _single_segment(audio: 'CachedAudio') -> AsyncGenerator[Tuple['CachedAudio', bool], None]:
+        yield audio, True
+    
+    def _output_variant(self, engine: str, incremental: bool, codec: str, sample_rate: int) -> str:
+        """Every setting besides the request parameters that shapes the output
+        
+        Incremental streams fade and chunk each segment separately, and
+        stitched streams join per-sentence renders, so both are cached apart
+        from whole-text renders.
+        """
+        if incremental:
+            assembly = 'segmented'
+        elif self.fragment_cache is not None:
+            assembly = f"stitched{self.crossfade_ms:g}"
+        else:
+            assembly = 'whole'
+        return (
+            f"{engine}|compress={int(self.enable_compression)}|{self.chunk_size_ms}ms"
+            f"|{sample_rate}Hz|{assembly}|{codec}"
+        )
+    
+    def _prepare_audio(
+        self,
+        audio_data: bytes,
+        encoder: Optional[StreamEncoder] = None,
+        final: bool = True,
+        trace: Optional[Trace] = None,
+        dsp: Optional[DSPChain] = None,
+        sample_rate: Optional[int] = None,
+        first: bool = True
+    ) -> CachedAudio:
+        """Apply all post-processing, encode, and build the chunk offset table
+        
+        ``dsp`` and ``encoder`` carry their state from earlier segments of
+        the same stream; ``final`` flushes both. Only the stream's ``first``
+        segment is faded in and its ``final`` one faded out. ``sample_rate``
+        is the rate of the processed audio.
+        """
+        trace = trace or Trace('untraced')
+        sample_rate = sample_rate or self.sample_rate
+        if dsp is not None:
+            with trace.stage('dsp'):
+                audio_data = dsp.process(audio_data, final)
+        with trace.stage('chunking'):
+            buffer, offsets = self.audio_optimizer.prepare_stream_buffer(
+                audio_data, self.chunk_size_ms, sample_rate, fade_in=first, fade_out=final
+            )
+        if encoder is None or encoder.codec == 'pcm16':
+            return CachedAudio(buffer, offsets, sample_rate)
+        
+        with trace.stage('encoding'):
+            encoded, offsets = encoder.encode_segment(buffer, offsets, final)
+        return CachedAudio(encoded, offsets, sample_rate, encoder.codec)
+    
+    def _create_dsp(self, engine: str, sample_rate: int, rate: float, pitch: float) -> Optional[DSPChain]:
+        """DSP chain from an engine's neutral render to a stream's settings"""
+        return DSPChain.build(
+            self.ENGINE_SAMPLE_RATES.get(engine, DEFAULT_SAMPLE_RATE),
+            sample_rate,
+            rate,
+            pitch,
+            self.compressor_settings if self.enable_compression else None
+        )
+    
+    async def _synthesize_segments(
+        self,
+        segments: Iterable[str],
+        voice: str,
+        engine: str,
+        trace: Optional[Trace] = None,
+        qos: RequestQoS = RequestQoS(),
+        cache_renders: bool = True
+    ) -> AsyncGenerator[Tuple[bytes, bool], None]:
+        """Synthesize segments in order, rendering ahead while earlier ones stream
+
+        Yields ``(audio, is_last)``. Up to ``lookahead_segments`` segments
+        are rendered concurrently with the one currently being consumed;
+        outstanding renders are cancelled if the consumer stops early.
+        ``segments`` is consumed lazily. Engine timings of each render are
+        added to ``trace``. The deadline in ``qos`` applies to the first
+        segment; later ones only need to keep ahead of playback.
+        """
+        segments = iter(segments)
+        pending = deque()
+        next_index = 0
+        
+        def schedule(limit: int):
+            nonlocal next_index
+            while len(pending) < limit:
+                segment = next(segments, None)
+                if segment is None:
+                    return
+                segment_qos = qos if next_index == 0 else RequestQoS(qos.priority)
+                pending.append(asyncio.ensure_future(
+                    self._render_segment(trace, segment_qos, segment, voice, engine, cache_renders)
+                ))
+                next_index += 1
+        
+        try:
+            while True:
+                schedule(self.lookahead_segments + 1)
+                if not pending:
+                    return
+                audio = await pending.popleft()
+                schedule(1)  # learn whether this was the last segment
+                yield audio, not pending
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _render_segment(
+        self,
+        trace: Optional[Trace],
+        qos: RequestQoS,
+        text: str,
+        voice: str,
+        engine: str,
+        cache_renders: bool = True
+    ) -> bytes:
+        """Render one segment (neutral rate and pitch) in its own task,
+        attributing engine timings to ``trace``"""
+        # Each task runs in a copy of the context, so these do not leak to
+        # the stream's consumer
+        current_trace.set(trace)
+        current_qos.set(qos)
+        if not cache_renders:
+            return await self._synthesize_coalesced(text, voice, engine)
+        if self.fragment_cache is not None:
+            return await self._synthesize_fragment(trace, text, voice, engine)
+        return await self._synthesize_rendered(text, voice, engine)
+    
+    def _render_variant(self, engine: str) -> str:
+        """Cache variant of an engine's neutral renders"""
+        return f"{engine}|{self.ENGINE_SAMPLE_RATES.get(engine, DEFAULT_SAMPLE_RATE)}Hz"
+    
+    async def _synthesize_rendered(self, text: str, voice: str, engine: str) -> bytes:
+        """Neutral engine render of a segment, from the render cache when possible"""
+        if self.render_cache is None:
+            return await self._synthesize_coalesced(text, voice, engine)
+        
+        variant = self._render_variant(engine)
+        audio = self.render_cache.get(text, voice, 1.0, 1.0, variant)
+        if audio is None:
+            audio = await self._synthesize_coalesced(text, voice, engine)
+            self.render_cache.put(text, voice, 1.0, 1.0, audio, variant)
+        return audio
+    
+    async def _synthesize_fragment(
+        self,
+        trace: Optional[Trace],
+        text: str,
+        voice: str,
+        engine: str
+    ) -> bytes:
+        """Raw engine audio of one sentence, from the fragment cache when possible
+        
+        Fragments are neutral renders, shared by every rate, pitch and
+        output rate.
+        """
+        text = TextSegmenter.normalize(text)
+        variant = self._render_variant(engine)
+        if trace is not None:
+            trace.incr('fragments')
+        
+        audio = self.fragment_cache.get(text, voice, 1.0, 1.0, variant)
+        if audio is not None:
+            if trace is not None:
+                trace.incr('fragment_hits')
+            return audio
+        
+        audio = await self._synthesize_coalesced(text, voice, engine)
+        self.fragment_cache.put(text, voice, 1.0, 1.0, audio, variant)
+        return audio
+    
+    async def _synthesize_stitched(
+        self,
+        segments: List[str],
+        voice: str,
+        engine: str,
+        trace: Optional[Trace] = None,
+        qos: RequestQoS = RequestQoS()
+    ) -> AsyncGenerator[Tuple[bytearray, bool], None]:
+        """Render every sentence (cached ones are free) and crossfade them into one buffer"""
+        tasks = [
+            asyncio.ensure_future(self._render_segment(trace, qos, segment, voice, engine))
+            for segment in segments
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        engine_rate = self.ENGINE_SAMPLE_RATES.get(engine, DEFAULT_SAMPLE_RATE)
+        fade_samples = int(engine_rate * self.crossfade_ms / 1000)
+        with (trace or Trace('untraced')).stage('stitching'):
+            audio = self.audio_optimizer.crossfade_join(parts, fade_samples)
+        yield audio, True
+    
+    async def _synthesize_coalesced(self, text: str, voice: str, engine: str) -> bytes:
+        """Synthesize audio, sharing the work with identical in-flight requests
+        
+        Renders are neutral, so requests differing only in rate, pitch,
+        codec or output rate share one engine call.
+        """
+        return await self.single_flight.do(
+            (text, voice, engine),
+            lambda: self._synthesize_audio(text, voice, engine),
+            current_qos.get()
+        )
+    
+    def _cache_lookup(
+        self,
+        text: str,
+        voice: str,
+        rate: float,
+        pitch: float,
+        variant: str
+    ) -> Optional[CachedAudio]:
+        """Look up audio in the memory cache, then the disk cache
+
+        Disk hits view straight into the segment mapping; they are promoted
+        into the memory cache as-is, without copying the audio.
+        """
+        audio = self.cache.get(text, voice, rate, pitch, variant)
+        if audio is not None or self.disk_cache is None:
+            return audio
+        
+        payload = self.disk_cache.get(self.cache._generate_key(text, voice, rate, pitch, variant))
+        if payload is None:
+            return None
+        
+        audio = CachedAudio.from_buffer(payload)
+        self.cache.put(text, voice, rate, pitch, audio, variant)
+        return audio
+    
+    def is_cached(
+        self,
+        text: str,
+        voice: str = 'default',
+        rate: float = 1.0,
+        pitch: float = 1.0,
+        engine: Optional[str] = None,
+        incremental: Optional[bool] = None,
+        codec: Optional[str] = None,
+        sample_rate: Optional[int] = None,
+        long_form: Optional[bool] = None
+    ) -> bool:
+        """Whether a request with these settings would be a cache hit
+        
+        Modes default as in ``synthesize_stream``, so a text over
+        ``long_form_threshold`` is looked up as the incremental render it
+        would stream as. A disk hit is promoted into the memory cache.
+        """
+        if long_form is None:
+            long_form = len(text) > self.long_form_threshold
+        if incremental is None or long_form:
+            incremental = long_form or self.incremental
+        variant = self._output_variant(
+            engine if engine not in (None, AUTO_ENGINE) else self.default_engine,
+            incremental,
+            codec or self.codec,
+            int(sample_rate or self.sample_rate)
+        )
+        return self._cache_lookup(text, voice, rate, pitch, variant) is not None
+    
+    def _cache_store(
+        self,
+        text: str,
+        voice: str,
+        rate: float,
+        pitch: float,
+        variant: str,
+        audio: CachedAudio,
+        trace: Optional[Trace] = None
+    ):
+        """Store streaming-ready audio in every cache tier
+        
+        With ``cache_compression`` the memory tier holds a compressed copy;
+        disk entries stay uncompressed so hits can be served straight from
+        the mapping.
+        """
+        if self.cache_compression:
+            with (trace or Trace('untraced')).stage('cache_compress'):
+                stored = CompressedAudio.from_audio(audio, self.cache_block_chunks)
+        else:
+            stored = audio
+        self.cache.put(text, voice, rate, pitch, stored, variant)
+        if self.disk_cache is not None:
+            self.disk_cache.put(self.cache._generate_key(text, voice, rate, pitch, variant), audio.to_bytes())
+    
+    def _downgrade_engine(self, engine: str, qos: RequestQoS) -> Optional[str]:
+        """A faster engine to use when ``engine`` is predicted to miss the deadline"""
+        fallback = self.engine_fallbacks.get(engine)
+        controller = self.admission.get(engine)
+        if fallback not in self.engines or controller is None or not self.router.is_available(fallback):
+            return None
+        
+        now = time.monotonic()
+        if now + controller.predicted_latency(qos.priority) <= qos.deadline:
+            return None
+        fallback_controller = self.admission.get(fallback)
+        if fallback_controller is not None and now + fallback_controller.predicted_latency(qos.priority) > qos.deadline:
+            return None  # no better; let admission decide on the original
+        
+        self.downgrades[f"{engine}->{fallback}"] += 1
+        return fallback
+    
+    async def _synthesize_audio(self, text: str, voice: str, engine: str) -> bytes:
+        """Synthesize audio using the specified engine, through its admission queue
+        
+        The engine renders at neutral rate and pitch; streams apply both in
+        their DSP chain. Priority and deadline come from the calling task's
+        ``current_qos``. The outcome feeds the engine's routing health.
+        """
+        probe = self.router.begin(engine)
+        outcome = None
+        try:
+            controller = self.admission.get(engine)
+            if controller is None:
+                audio, elapsed = await self._timed_engine_call(text, voice, engine)
+            else:
+                qos = current_qos.get()
+                wait = await controller.acquire(qos.priority, qos.deadline, qos if isinstance(qos, SharedQoS) else None)
+                trace = current_trace.get()
+                if trace is not None:
+                    trace.add('admission_wait', wait)
+                
+                service_time = None
+                try:
+                    audio, elapsed = await self._timed_engine_call(text, voice, engine)
+                    service_time = elapsed
+                finally:
+                    controller.release(service_time)
+            
+            audio_seconds = len(audio) / 2 / self.ENGINE_SAMPLE_RATES.get(engine, DEFAULT_SAMPLE_RATE)
+            self.router.succeeded(engine, elapsed, audio_seconds, len(text), probe)
+            outcome = 'success'
+            return audio
+        except (asyncio.CancelledError, RequestRejected):
+            raise
+        except Exception:
+            self.router.failed(engine, probe)
+            outcome = 'failure'
+            raise
+        finally:
+            if outcome is None:
+                self.router.abandoned(engine, probe)
     
-    async def _synthesize_audio(
+    async def _timed_engine_call(self, text: str, voice: str, engine: str) -> Tuple[bytes, float]:
+        """Run the engine (with any injected faults); returns audio and seconds taken"""
+        started = time.monotonic()
+        audio = await self.fault_injector.run(engine, lambda: self._run_engine(text, voice, 1.0, 1.0, engine))
+        return audio, time.monotonic() - started
+    
+    async def _run_engine(
         self,
         text: str,
         voice: str,
@@ -420,7 +1838,7 @@ class OptimizedTTSStreamer:
         pitch: float,
         engine: str
     ) -> bytes:
-        """Synthesize audio using the specified engine"""
+        """Dispatch to the engine's synthesis call"""
         
         if engine == 'kokoro':
             return await self._synthesize_kokoro(text, voice, rate, pitch)
@@ -434,60 +1852,113 @@ class OptimizedTTSStreamer:
     async def _synthesize_kokoro(self, text: str, voice: str, rate: float, pitch: float) -> bytes:
         """Synthesize using Kokoro TTS (placeholder implementation)"""
         # This would be the actual Kokoro TTS call
-        # For now, generate some dummy audio data
-        await asyncio.sleep(0.1)  # Simulate processing time
-        
-        # Generate sine wave as placeholder
-        duration = len(text) * 0.05  # ~50ms per character
-        sample_rate = 22050
-        t = np.linspace(0, duration, int(sample_rate * duration))
-        frequency = 440 * pitch  # A4 note modified by pitch
-        audio = (np.sin(2 * np.pi * frequency * t) * 16383).astype(np.int16)
-        
-        return audio.tobytes()
+        return await self.executors['kokoro'].run(render_kokoro_placeholder, text, pitch)
     
     async def _synthesize_pyttsx3(self, text: str, voice: str, rate: float, pitch: float) -> bytes:
         """Synthesize using PyTTSx3"""
+        return await self.executors['pyttsx3'].run(self._render_pyttsx3, text, rate)
+    
+    def _render_pyttsx3(self, text: str, rate: float) -> bytes:
+        """Blocking PyTTSx3 render; runs on the engine's worker thread"""
         engine = self.engines['pyttsx3']
         
         # Configure engine
         engine.setProperty('rate', int(180 * rate))
         
         # Create temporary file for audio
-        temp_file = f"temp_audio_{int(time.time() * 1000)}.wav"
+        fd, temp_file = tempfile.mkstemp(suffix='.wav', dir=self.temp_dir)
+        os.close(fd)
         
         try:
             engine.save_to_file(text, temp_file)
             engine.runAndWait()
             
-            # Read audio data
-            with open(temp_file, 'rb') as f:
-                # Skip WAV header (44 bytes)
-                f.seek(44)
-                audio_data = f.read()
-            
-            return audio_data
+            return self.audio_optimizer.wav_to_pcm16(temp_file, self.ENGINE_SAMPLE_RATES['pyttsx3'])
         finally:
             # Clean up
             if os.path.exists(temp_file):
                 os.remove(temp_file)
     
     async def _synthesize_coqui(self, text: str, voice: str, rate: float, pitch: float) -> bytes:
-        """Synthesize using Coqui TTS (placeholder)"""
-        # This would be the actual Coqui TTS call
-        await asyncio.sleep(0.05)  # Faster than other engines
+        """Synthesize using Coqui TTS (placeholder model)"""
+        if 'coqui' in self.batchers:
+            return await self.batchers['coqui'].submit(text, pitch)
+        return await self.executors['coqui'].run(run_inference, render_coqui, text, pitch)
+    
+    async def warmup(self, text: str = "Warm up.") -> Dict[str, float]:
+        """Run a short synthesis on every engine before serving traffic
+        
+        Forces lazy model loading, worker pool start-up and first-call
+        allocations so the first real request does not pay for them. The
+        results bypass the cache. Returns the warm-up time per engine in ms.
+        """
+        timings = {}
+        for name in self.engines:
+            started = time.perf_counter()
+            try:
+                audio_data = await self._synthesize_audio(text, 'default', name)
+                self._prepare_audio(audio_data, dsp=self._create_dsp(name, self.sample_rate, 1.0, 1.0)).chunks()
+            except Exception as e:
+                logging.warning(f"Warm-up failed for engine {name}: {e}")
+                continue
+            timings[name] = (time.perf_counter() - started) * 1000
+        
+        logging.info(f"Engines warmed up: {', '.join(f'{k}={v:.1f}ms' for k, v in timings.items())}")
+        return timings
+    
+    async def prewarm(self, phrases: List[Phrase], **kwargs) -> Dict:
+        """Fill the cache tiers from a phrase corpus at low priority (see ``tts_prewarm``)"""
+        return await run_prewarm(self, phrases, **kwargs)
+    
+    def synthesize_many(self, requests: Iterable, **kwargs) -> AsyncGenerator[BatchResult, None]:
+        """Synthesize many requests concurrently, deduplicated (see ``tts_batch``)"""
+        return synthesize_many(self, requests, **kwargs)
+    
+    async def synthesize_to_file(
+        self,
+        text: str,
+        path: str,
+        voice: str = 'default',
+        rate: float = 1.0,
+        pitch: float = 1.0,
+        engine: Optional[str] = None,
+        codec: Optional[str] = None,
+        sample_rate: Optional[int] = None
+    ) -> Dict:
+        """Synthesize text of any length into a WAV file in bounded memory
+
+        Runs the long-form stream and writes each chunk as it arrives; the
+        WAV header sizes are filled in once the stream ends.
         
-        # Placeholder implementation
-        duration = len(text) * 0.04
-        sample_rate = 22050
-        t = np.linspace(0, duration, int(sample_rate * duration))
+        Raises:
+            ValueError: ``codec`` has no WAV format (see ``WAV_FORMAT_TAGS``)
+        """
+        codec = codec or self.codec
+        if codec not in WAV_FORMAT_TAGS:
+            raise ValueError(
+                f"Codec {codec} cannot be written to a WAV file; use one of {', '.join(sorted(WAV_FORMAT_TAGS))}"
+            )
+        sample_rate = sample_rate or self.sample_rate
+        started = time.perf_counter()
+        chunks = 0
         
-        # More complex waveform for Coqui
-        frequency = 200 * pitch
-        audio = np.sin(2 * np.pi * frequency * t) + 0.3 * np.sin(2 * np.pi * frequency * 2 * t)
-        audio = (audio * 16383).astype(np.int16)
+        with WavStreamWriter(path, sample_rate, codec) as writer:
+            async for chunk in self.synthesize_stream(
+                text, voice, rate, pitch, engine,
+                codec=codec, sample_rate=sample_rate, long_form=True
+            ):
+                writer.write(chunk.data)
+                chunks += 1
         
-        return audio.tobytes()
+        return {
+            'path': path,
+            'bytes': writer.bytes_written,
+            'chunks': chunks,
+            'audio_seconds': writer.bytes_written * 8 / (CODEC_BITS[codec] * sample_rate),
+            'elapsed_s': time.perf_counter() - started,
+            'codec': codec,
+            'sample_rate': sample_rate
+        }
     
     def get_performance_metrics(self, window_minutes: int = 10) -> Dict:
         """Get current performance metrics"""
@@ -496,81 +1967,128 @@ class OptimizedTTSStreamer:
         
         return {
             'performance': stats,
+            'stages': self.tracer.stage_stats(window_minutes),
+            'resources': self.resource_sampler.stats(window_minutes),
             'cache': cache_stats,
+            'cache_compression': self._cache_compression_stats() if self.cache_compression else None,
+            'render_cache': self.render_cache.stats() if self.render_cache is not None else None,
+            'fragment_cache': self.fragment_cache.stats() if self.fragment_cache is not None else None,
+            'disk_cache': self.disk_cache.stats() if self.disk_cache is not None else None,
+            'single_flight': self.single_flight.stats(),
+            'admission': {name: controller.stats() for name, controller in self.admission.items()},
+            'downgrades': dict(self.downgrades),
+            'routing': self.router.stats(),
+            'fault_injection': self.fault_injector.stats() if self.fault_injector.faults else None,
+            'executors': {name: executor.stats() for name, executor in self.executors.items()},
+            'batchers': {name: batcher.stats() for name, batcher in self.batchers.items()},
+            'torch': torch_stats() if any(name in self.engines for name in self.TORCH_ENGINES) else None,
             'engines': list(self.engines.keys()),
             'default_engine': self.default_engine,
             'chunk_size_ms': self.chunk_size_ms,
-            'compression_enabled': self.enable_compression
+            'chunking': {
+                'adaptive': self.adaptive_chunking,
+                'max_chunk_ms': self.max_chunk_ms,
+                'target_buffer_chunks': self.buffer_size
+            },
+            'compression_enabled': self.enable_compression,
+            'codec': self.codec,
+            'sample_rate': self.sample_rate,
+            'engine_sample_rates': {name: self.ENGINE_SAMPLE_RATES.get(name, DEFAULT_SAMPLE_RATE) for name in self.engines}
         }
     
-    def benchmark(self, test_texts: List[str], iterations: int = 5) -> Dict:
-        """Run performance benchmark"""
-        async def run_benchmark():
-            results = []
-            
-            for text in test_texts:
-                text_results = []
-                
-                for i in range(iterations):
-                    start_time = time.time()
-                    chunk_count = 0
-                    
-                    async for chunk in self.synthesize_stream(text):
-                        chunk_count += 1
-                    
-                    end_time = time.time()
-                    
-                    text_results.append({
-                        'iteration': i + 1,
-                        'duration': end_time - start_time,
-                        'chunk_count': chunk_count,
-                        'text_length': len(text)
-                    })
-                
-                results.append({
-                    'text': text[:50] + '...' if len(text) > 50 else text,
-                    'results': text_results
-                })
-            
-            return results
-        
-        # Run benchmark
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        benchmark_results = loop.run_until_complete(run_benchmark())
-        loop.close()
-        
+    def _cache_compression_stats(self) -> Dict:
+        with self.cache.lock:
+            entries = [entry for entry, _ in self.cache.cache.values() if isinstance(entry, CompressedAudio)]
+        raw = sum(entry.raw_nbytes for entry in entries)
+        stored = sum(entry.nbytes for entry in entries)
         return {
-            'benchmark_results': benchmark_results,
-            'test_config': {
-                'iterations': iterations,
-                'chunk_size_ms': self.chunk_size_ms,
-                'compression_enabled': self.enable_compression
-            }
+            'entries': len(entries),
+            'raw_mb': raw / (1024 * 1024),
+            'stored_mb': stored / (1024 * 1024),
+            'ratio': raw / stored if stored else 1.0
         }
     
-    def clear_cache(self):
-        """Clear the TTS cache"""
+    async def benchmark(self, config: Optional[BenchmarkConfig] = None) -> Dict:
+        """Run a closed/open-loop, cold/warm-cache load benchmark (see ``tts_benchmark``)"""
+        return await run_benchmark(self, config)
+    
+    def clear_cache(self, disk: bool = True):
+        """Clear the TTS cache; ``disk`` False keeps the persistent disk tier"""
         self.cache.clear()
-        logging.info("TTS cache cleared")
+        if self.render_cache is not None:
+            self.render_cache.clear()
+        if self.fragment_cache is not None:
+            self.fragment_cache.clear()
+        if self.disk_cache is not None and disk:
+            self.disk_cache.clear()
+        logging.info("TTS cache cleared" if disk or self.disk_cache is None else "TTS memory caches cleared")
     
     async def shutdown(self):
         """Graceful shutdown"""
         logging.info("Shutting down TTS streamer")
-        self.clear_cache()
+        self.cache.clear()
+        if self.disk_cache is not None:
+            # Keep the persistent tier for the next start
+            self.disk_cache.close()
+        for executor in self.executors.values():
+            executor.shutdown()
+        self.resource_sampler.stop()
+        self.tracer.close()
+        if self.temp_dir is not None:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
 
 # CLI and testing
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Optimized TTS Streamer")
-    parser.add_argument("--benchmark", action="store_true", help="Run performance benchmark")
+    parser.add_argument("--benchmark", action="store_true", help="Run the load benchmark (see --bench-* options)")
     parser.add_argument("--text", type=str, default="Hello, this is a test of the optimized TTS streaming system.", help="Text to synthesize")
-    parser.add_argument("--engine", type=str, default="kokoro", help="TTS engine to use")
+    parser.add_argument("--text-file", type=str, metavar="FILE", help="Synthesize the contents of FILE instead of --text")
+    parser.add_argument("--long-form", action="store_true", help="Bounded-memory long-form streaming (automatic for long texts)")
+    parser.add_argument("--output", type=str, metavar="FILE", help="Write the audio to a WAV file (always long-form)")
+    parser.add_argument("--engine", type=str, default="kokoro", help="TTS engine to use ('auto' for the fastest healthy one)")
+    parser.add_argument("--min-quality", type=int, help="Lowest engine quality the router may pick")
+    parser.add_argument("--engines", type=str, help="Comma-separated engines to load (default: all available)")
+    parser.add_argument("--skip-warmup", action="store_true", help="Do not warm up engines before serving")
     parser.add_argument("--cache-size", type=int, default=500, help="Cache size")
+    parser.add_argument("--cache-max-mb", type=float, default=256, help="Cache memory budget in MB (0 to disable)")
+    parser.add_argument("--cache-compression", action="store_true", help="Keep memory cache entries losslessly compressed")
+    parser.add_argument("--disk-cache", type=str, metavar="DIR", help="Enable the persistent disk cache in DIR")
+    parser.add_argument("--disk-cache-mb", type=float, default=1024, help="Disk cache size budget in MB")
+    parser.add_argument("--incremental", action="store_true", help="Stream sentence by sentence")
+    parser.add_argument("--batch-max-size", type=int, default=8, help="Max utterances per model batch")
+    parser.add_argument("--batch-max-wait-ms", type=float, default=10.0, help="Max time a request waits for a batch")
+    parser.add_argument("--codec", type=str, default="pcm16", choices=sorted(CODEC_BITS), help="Output codec")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE, help="Output sample rate")
+    parser.add_argument("--rate", type=float, default=1.0, help="Speech rate multiplier")
+    parser.add_argument("--pitch", type=float, default=1.0, help="Pitch multiplier")
     parser.add_argument("--no-compression", action="store_true", help="Disable audio compression")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="Initial (adaptive) or fixed chunk duration")
+    parser.add_argument("--max-chunk-ms", type=int, default=640, help="Largest adaptive chunk")
+    parser.add_argument("--fixed-chunks", action="store_true", help="Disable adaptive chunk sizing")
+    parser.add_argument("--render-cache-size", type=int, default=64, help="Neutral engine renders kept for re-processing (0 to disable)")
+    parser.add_argument("--fragment-cache-size", type=int, default=0, help="Sentence fragment cache entries (0 to disable)")
+    parser.add_argument("--crossfade-ms", type=float, default=10.0, help="Crossfade at fragment joins")
+    parser.add_argument("--breaker-threshold", type=int, default=5, help="Consecutive engine failures that open its circuit breaker")
+    parser.add_argument("--breaker-cooldown", type=float, default=10.0, help="Seconds before a tripped engine gets a probe")
+    parser.add_argument("--inject-fault", type=str, action="append", default=[], metavar="ENGINE:fail=P,delay_ms=MS,slowdown=X",
+                        help="Simulate engine failures or slowdowns (repeatable)")
+    parser.add_argument("--admission-queue", type=int, default=256, help="Per-engine admission queue bound (0 disables admission control)")
+    parser.add_argument("--trace-log", action="store_true", help="Log per-stage timings of every request")
+    parser.add_argument("--trace-jsonl", type=str, metavar="FILE", help="Append per-stage timings to a JSON lines file")
+    parser.add_argument("--profile-memory", action="store_true", help="Line-by-line memory profiling (slow, debug only)")
+    add_prewarm_arguments(parser)
+    add_batch_arguments(parser)
+    add_torch_arguments(parser)
+    add_benchmark_arguments(parser)
     
     args = parser.parse_args()
+    if args.output and args.codec not in WAV_FORMAT_TAGS:
+        parser.error(
+            f"--output writes a WAV file, which cannot hold --codec {args.codec}; "
+            f"use one of {', '.join(sorted(WAV_FORMAT_TAGS))}"
+        )
     
     # Configure logging
     logging.basicConfig(
@@ -579,42 +2097,98 @@ if __name__ == "__main__":
     )
     
     async def main():
+        trace_sinks = []
+        if args.trace_log:
+            trace_sinks.append(LogSink())
+        if args.trace_jsonl:
+            trace_sinks.append(JsonLinesSink(args.trace_jsonl))
+        
         # Create TTS streamer
         streamer = OptimizedTTSStreamer(
             cache_size=args.cache_size,
-            enable_compression=not args.no_compression
+            enable_compression=not args.no_compression,
+            cache_max_mb=args.cache_max_mb,
+            cache_compression=args.cache_compression,
+            disk_cache_dir=args.disk_cache,
+            disk_cache_max_mb=args.disk_cache_mb,
+            incremental=args.incremental,
+            batch_max_size=args.batch_max_size,
+            batch_max_wait_ms=args.batch_max_wait_ms,
+            engines=args.engines.split(',') if args.engines else None,
+            codec=args.codec,
+            sample_rate=args.sample_rate,
+            chunk_size_ms=args.chunk_ms,
+            adaptive_chunking=not args.fixed_chunks,
+            max_chunk_ms=args.max_chunk_ms,
+            trace_sinks=trace_sinks,
+            render_cache_size=args.render_cache_size,
+            fragment_cache_size=args.fragment_cache_size,
+            crossfade_ms=args.crossfade_ms,
+            admission_queue_size=args.admission_queue or None,
+            breaker_failure_threshold=args.breaker_threshold,
+            breaker_cooldown_s=args.breaker_cooldown,
+            engine_faults=dict(parse_fault_spec(spec) for spec in args.inject_fault),
+            torch_profile=profile_from_args(args),
+            profile_memory=args.profile_memory
         )
         
+        if not args.skip_warmup:
+            await streamer.warmup()
+        if args.prewarm:
+            report = await streamer.prewarm(
+                load_phrases(args.prewarm),
+                concurrency=args.prewarm_concurrency,
+                cpu_budget=args.prewarm_cpu_budget or None,
+                incremental=args.incremental
+            )
+            print(json.dumps(report, indent=2))
+        logging.info("TTS streamer ready")
+        
+        text = args.text
+        if args.text_file:
+            with open(args.text_file, encoding='utf-8') as f:
+                text = f.read()
+        
+        exit_code = 0
         if args.benchmark:
-            # Run benchmark
-            test_texts = [
-                "Short test.",
-                "This is a medium length test sentence for TTS performance evaluation.",
-                "This is a much longer test sentence that will help us evaluate the performance of the TTS system when processing larger amounts of text, including various punctuation marks, and different sentence structures to ensure comprehensive testing coverage.",
-            ]
-            
-            print("Running benchmark...")
-            results = streamer.benchmark(test_texts, iterations=3)
-            print(json.dumps(results, indent=2))
+            # Per-request log lines would dominate the run
+            logging.getLogger().setLevel(logging.WARNING)
+            exit_code = await run_from_args(streamer, args)
+        elif args.jobs:
+            logging.getLogger().setLevel(logging.WARNING)
+            report = await run_jobs(streamer, args.jobs, args.output_dir, args.jobs_concurrency)
+            print(json.dumps(report, indent=2))
+            exit_code = 1 if report['failed'] else 0
+        elif args.output:
+            result = await streamer.synthesize_to_file(
+                text, args.output, rate=args.rate, pitch=args.pitch, engine=args.engine
+            )
+            print(json.dumps(result, indent=2))
         else:
             # Single synthesis test
-            print(f"Synthesizing: {args.text}")
+            long_form = args.long_form or None
+            print(f"Synthesizing: {text if len(text) <= 200 else f'{len(text)} characters'}")
             
             start_time = time.time()
             chunk_count = 0
-            total_audio_data = b""
+            total_bytes = 0
             
-            async for chunk in streamer.synthesize_stream(args.text, engine=args.engine):
+            async for chunk in streamer.synthesize_stream(
+                text, rate=args.rate, pitch=args.pitch, engine=args.engine, long_form=long_form,
+                min_quality=args.min_quality
+            ):
                 chunk_count += 1
-                total_audio_data += chunk.data
-                print(f"Received chunk {chunk.chunk_id + 1}/{chunk.total_chunks} ({len(chunk.data)} bytes)")
+                total_bytes += len(chunk.data)
+                if chunk_count <= 100:
+                    total = chunk.total_chunks if chunk.total_chunks is not None else '?'
+                    print(f"Received chunk {chunk.chunk_id + 1}/{total} ({len(chunk.data)} bytes)")
             
             end_time = time.time()
             
             print(f"\nSynthesis completed:")
             print(f"  Duration: {(end_time - start_time) * 1000:.1f} ms")
             print(f"  Chunks: {chunk_count}")
-            print(f"  Audio data: {len(total_audio_data)} bytes")
+            print(f"  Audio data: {total_bytes} bytes")
             
             # Show performance metrics
             metrics = streamer.get_performance_metrics()
@@ -622,6 +2196,7 @@ if __name__ == "__main__":
             print(json.dumps(metrics, indent=2))
         
         await streamer.shutdown()
+        return exit_code
     
     # Run the main function
-    asyncio.run(main())
\ No newline at end of file
+    raise SystemExit(asyncio.run(main()))
\ No newline at end of file
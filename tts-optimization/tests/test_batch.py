@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from optimized_tts_streamer import AudioChunk
+from tts_batch import synthesize_many
+
+
+class FakeStreamer:
+    """Streams ``chunks`` chunks per request, ``delay`` seconds apart"""
+
+    default_engine = 'edge'
+    admission = {}
+
+    def __init__(self, chunks=3, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def synthesize_stream(self, text, voice, rate, pitch, engine, **kwargs):
+        for chunk_id in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            yield AudioChunk(text.encode(), 16000, chunk_id, self.chunks, 0.0, chunk_id == self.chunks - 1)
+
+
+def test_identical_requests_are_synthesized_once():
+    async def run():
+        return [result async for result in synthesize_many(FakeStreamer(), ['a', 'b', 'a'])]
+
+    results = asyncio.run(run())
+    assert [result.indices for result in results] == [[0, 2], [1]]
+    assert [result.audio for result in results] == [b'aaa', b'bbb']
+
+
+def test_yielded_stream_ends_when_the_batch_is_closed_early():
+    received = []
+
+    async def drain(result):
+        async for chunk in result.chunks:
+            received.append(chunk)
+
+    async def run():
+        results = synthesize_many(FakeStreamer(chunks=50, delay=0.01), ['a', 'b'], stream=True)
+        async for result in results:
+            break
+        await results.aclose()
+
+        # Not wait_for: its timeout would cancel the drain, which is what it should end with
+        reader = asyncio.ensure_future(drain(result))
+        done, _ = await asyncio.wait({reader}, timeout=5)
+        if not done:
+            reader.cancel()
+            pytest.fail("stream kept waiting after the batch was closed")
+        with pytest.raises(asyncio.CancelledError):
+            reader.result()
+
+    asyncio.run(run())
+    assert 0 < len(received) < 50
+
+
+def test_auto_requests_share_the_largest_engine_limit():
+    class Controller:
+        def __init__(self, max_concurrency):
+            self.max_concurrency = max_concurrency
+
+    class CountingStreamer(FakeStreamer):
+        default_engine = 'auto'
+        admission = {'edge': Controller(2), 'gtts': Controller(1)}
+        running = peak = 0
+
+        async def synthesize_stream(self, *args, **kwargs):
+            CountingStreamer.running += 1
+            CountingStreamer.peak = max(CountingStreamer.peak, CountingStreamer.running)
+            try:
+                async for chunk in super().synthesize_stream(*args, **kwargs):
+                    yield chunk
+            finally:
+                CountingStreamer.running -= 1
+
+    async def run():
+        texts = [f"text {index}" for index in range(10)]
+        return [result async for result in synthesize_many(CountingStreamer(delay=0.01), texts)]
+
+    assert all(result.ok for result in asyncio.run(run()))
+    assert CountingStreamer.peak == 2
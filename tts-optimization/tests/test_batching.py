@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from optimized_tts_streamer import render_coqui_batch_placeholder
+from tts_engines import EngineExecutor, MicroBatcher
+
+
+def upper_batch(items):
+    return [text.upper() for text, in items]
+
+
+def run_batcher(batch_fn, submissions, **kwargs):
+    executor = EngineExecutor('test', max_concurrency=1)
+    batcher = MicroBatcher('test', batch_fn, executor, **kwargs)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(text) for text in submissions), return_exceptions=True)
+
+    try:
+        return asyncio.run(run()), batcher
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_stand_in_returns_one_render_per_item_in_order():
+    short, long = render_coqui_batch_placeholder([("Hi.", 1.0), ("A longer sentence.", 1.0)])
+    assert len(short) < len(long)
+    assert render_coqui_batch_placeholder([("Hi.", 1.0)]) == [short]
+
+
+def test_stand_in_batch_is_cheaper_than_separate_calls():
+    items = [(f"Utterance {index}.", 1.0) for index in range(4)]
+    started = time.perf_counter()
+    render_coqui_batch_placeholder(items)
+    batched = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for item in items:
+        render_coqui_batch_placeholder([item])
+    separate = time.perf_counter() - started
+    assert batched < separate * 0.75
+
+
+def test_full_batches_dispatch_at_once_and_fan_results_out():
+    results, batcher = run_batcher(upper_batch, ['a', 'b', 'c', 'd', 'e'], max_batch_size=4, max_wait_ms=5)
+    assert results == ['A', 'B', 'C', 'D', 'E']
+    assert batcher.stats()['batch_size_histogram'] == {'1': 1, '4': 1}
+
+
+def test_lone_request_waits_at_most_max_wait():
+    started = time.perf_counter()
+    results, batcher = run_batcher(upper_batch, ['a'], max_batch_size=8, max_wait_ms=20)
+    assert results == ['A']
+    assert 0.015 <= time.perf_counter() - started < 1.0
+    assert batcher.stats()['max_queue_wait_ms'] >= 15
+
+
+def test_batch_errors_reach_every_caller():
+    def failing_batch(items):
+        raise RuntimeError("model failed")
+
+    results, _ = run_batcher(failing_batch, ['a', 'b'], max_batch_size=2)
+    assert [str(result) for result in results] == ['model failed', 'model failed']
+
+
+def test_cancelled_callers_are_dropped_before_their_batch_runs():
+    seen = []
+
+    def recording_batch(items):
+        seen.extend(text for text, in items)
+        return upper_batch(items)
+
+    executor = EngineExecutor('test', max_concurrency=1)
+    batcher = MicroBatcher('test', recording_batch, executor, max_batch_size=8, max_wait_ms=20)
+
+    async def run():
+        kept = asyncio.ensure_future(batcher.submit('kept'))
+        dropped = asyncio.ensure_future(batcher.submit('dropped'))
+        await asyncio.sleep(0)
+        dropped.cancel()
+        return await kept
+
+    try:
+        assert asyncio.run(run()) == 'KEPT'
+    finally:
+        executor.shutdown(wait=True)
+    assert seen == ['kept']
@@ -0,0 +1,65 @@
+import os
+
+from tts_disk_cache import RECORD_HEADER, DiskAudioCache
+
+FIRST = 'ab' * 16
+SECOND = 'cd' * 16
+
+
+def fill(directory):
+    cache = DiskAudioCache(str(directory))
+    cache.put(FIRST, b'first' * 100)
+    cache.put(SECOND, b'second' * 100)
+    cache.close()
+    return os.path.join(str(directory), 'segment-00000000.seg')
+
+
+def test_clean_reopen_loads_the_index(tmp_path):
+    fill(tmp_path)
+    cache = DiskAudioCache(str(tmp_path))
+    assert bytes(cache.get(SECOND)) == b'second' * 100
+    assert cache.stats()['index_rebuilds'] == 0
+    cache.close()
+
+
+def test_torn_header_at_the_tail_is_truncated(tmp_path):
+    segment = fill(tmp_path)
+    size = os.path.getsize(segment)
+    with open(segment, 'ab') as f:
+        f.write(b'TTSA' + b'\0' * (RECORD_HEADER.size // 2))
+
+    cache = DiskAudioCache(str(tmp_path))
+    assert cache.stats()['index_rebuilds'] == 1
+    assert os.path.getsize(segment) == size
+    assert bytes(cache.get(FIRST)) == b'first' * 100
+    assert bytes(cache.get(SECOND)) == b'second' * 100
+    cache.close()
+
+
+def test_torn_payload_drops_only_the_last_record(tmp_path):
+    segment = fill(tmp_path)
+    with open(segment, 'r+b') as f:
+        f.truncate(os.path.getsize(segment) - 10)
+
+    cache = DiskAudioCache(str(tmp_path))
+    assert cache.stats()['index_rebuilds'] == 1
+    assert bytes(cache.get(FIRST)) == b'first' * 100
+    assert cache.get(SECOND) is None
+
+    # Appends continue after the last valid record and survive a clean reopen
+    cache.put(SECOND, b'again' * 100)
+    cache.close()
+    cache = DiskAudioCache(str(tmp_path))
+    assert cache.stats()['index_rebuilds'] == 0
+    assert bytes(cache.get(SECOND)) == b'again' * 100
+    cache.close()
+
+
+def test_missing_index_is_rebuilt(tmp_path):
+    fill(tmp_path)
+    os.remove(os.path.join(str(tmp_path), 'index.json'))
+
+    cache = DiskAudioCache(str(tmp_path))
+    assert cache.stats()['index_rebuilds'] == 1
+    assert cache.stats()['entries'] == 2
+    cache.close()
@@ -0,0 +1,41 @@
+import asyncio
+
+from optimized_tts_streamer import OptimizedTTSStreamer
+from tts_prewarm import Phrase, _Throttle, run_prewarm
+
+
+def test_long_form_phrases_are_skipped_once_cached():
+    async def run():
+        streamer = OptimizedTTSStreamer(long_form_threshold=20)
+        phrases = [Phrase("Hello."), Phrase("This phrase is longer than the long-form threshold.")]
+        try:
+            first = await run_prewarm(streamer, phrases, cpu_budget=None)
+            second = await run_prewarm(streamer, phrases, cpu_budget=None)
+        finally:
+            await streamer.shutdown()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first['synthesized'] == 2
+    assert (second['synthesized'], second['skipped']) == (0, 2)
+
+
+def test_throttle_polls_a_pool_for_its_load():
+    class FakePool:
+        def __init__(self):
+            self.loads = [{'cpu_percent': 0.0, 'queued': {'edge': 2}}, {'cpu_percent': 0.0, 'queued': {}}]
+            self.polls = 0
+
+        async def get_load(self):
+            self.polls += 1
+            return self.loads[min(self.polls, len(self.loads)) - 1]
+
+    async def run():
+        pool = FakePool()
+        throttle = _Throttle(pool, cpu_budget=None, poll_interval=0.01)
+        await throttle.wait('edge')
+        return pool, throttle
+
+    pool, throttle = asyncio.run(run())
+    assert pool.polls == 2
+    assert throttle.throttled_time > 0
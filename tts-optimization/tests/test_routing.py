@@ -0,0 +1,181 @@
+import asyncio
+
+import pytest
+
+from optimized_tts_streamer import OptimizedTTSStreamer
+from tts_engines import RequestRejected
+from tts_routing import (
+    AUTO_ENGINE, CLOSED, HALF_OPEN, OPEN, EngineFault, EngineRouter, FaultInjector, FaultSpec, parse_fault_spec
+)
+
+QUALITY = {'kokoro': 3, 'coqui': 2, 'pyttsx3': 1}
+
+
+def make_router(**kwargs):
+    kwargs.setdefault('failure_threshold', 2)
+    kwargs.setdefault('cooldown_s', 10.0)
+    return EngineRouter(QUALITY, QUALITY, **kwargs)
+
+
+def trip(router, engine):
+    for _ in range(router.failure_threshold):
+        router.failed(engine, router.begin(engine))
+    assert router.health[engine].state == OPEN
+
+
+def end_cooldown(router, engine):
+    router.health[engine].opened_at -= router.cooldown_s
+
+
+def run_faulty(injector, engine):
+    async def call():
+        return 'audio'
+    return asyncio.run(injector.run(engine, call))
+
+
+def test_fault_injector_fails_only_faulted_engines():
+    injector = FaultInjector({'kokoro': FaultSpec(failure_rate=1.0)}, seed=1)
+    with pytest.raises(EngineFault):
+        run_faulty(injector, 'kokoro')
+    assert run_faulty(injector, 'coqui') == 'audio'
+    assert injector.stats()['injected_failures'] == {'kokoro': 1}
+
+    injector.clear('kokoro')
+    assert run_faulty(injector, 'kokoro') == 'audio'
+
+
+def test_fault_injector_failure_rate_is_seeded():
+    def failures(seed):
+        injector = FaultInjector(seed=seed)
+        injector.set('kokoro', failure_rate=0.5)
+        outcomes = []
+        for _ in range(20):
+            try:
+                run_faulty(injector, 'kokoro')
+                outcomes.append(False)
+            except EngineFault:
+                outcomes.append(True)
+        return outcomes
+
+    assert failures(7) == failures(7)
+    assert 0 < sum(failures(7)) < 20
+
+
+def test_parse_fault_spec():
+    assert parse_fault_spec('coqui:fail=0.5,delay_ms=200,slowdown=2') == ('coqui', FaultSpec(0.5, 200.0, 2.0))
+    assert parse_fault_spec('coqui') == ('coqui', FaultSpec())
+    with pytest.raises(ValueError):
+        parse_fault_spec('coqui:latency=5')
+
+
+def test_breaker_opens_after_consecutive_failures():
+    router = make_router()
+    router.failed('kokoro')
+    router.succeeded('kokoro', 0.1, 1.0, 10)
+    router.failed('kokoro')
+    assert router.health['kokoro'].state == CLOSED
+
+    router.failed('kokoro')
+    assert router.health['kokoro'].state == OPEN
+    assert router.select('kokoro') == ('coqui', 'circuit_open')
+    with pytest.raises(RequestRejected):
+        router.begin('kokoro')
+
+
+def test_half_open_probe_is_reserved_for_one_request():
+    router = make_router()
+    trip(router, 'kokoro')
+    end_cooldown(router, 'kokoro')
+
+    assert router.select('kokoro') == ('kokoro', 'probe')
+    assert router.health['kokoro'].state == HALF_OPEN
+    # Concurrent requests pass over the engine instead of being rejected
+    assert router.select('kokoro') == ('coqui', 'circuit_open')
+
+    # The probing request's first call decides, its other calls run alongside
+    assert router.begin('kokoro') is True
+    assert router.begin('kokoro') is False
+    router.succeeded('kokoro', 0.1, 1.0, 10, probe=True)
+    assert router.health['kokoro'].state == CLOSED
+    assert router.select('kokoro') == ('kokoro', 'requested')
+
+
+def test_failed_probe_reopens_the_breaker():
+    router = make_router()
+    trip(router, 'kokoro')
+    end_cooldown(router, 'kokoro')
+
+    router.select('kokoro')
+    router.failed('kokoro', router.begin('kokoro'))
+    health = router.health['kokoro']
+    assert (health.state, health.trips, health.probing) == (OPEN, 2, False)
+    assert router.select('kokoro') == ('coqui', 'circuit_open')
+
+
+def test_unused_probe_reservation_is_released():
+    router = make_router()
+    trip(router, 'kokoro')
+    end_cooldown(router, 'kokoro')
+
+    # A cache hit never calls the engine and gives the probe back
+    assert router.select('kokoro') == ('kokoro', 'probe')
+    router.release_probe('kokoro')
+    assert router.select('kokoro') == ('kokoro', 'probe')
+
+    # An abandoned probe call gives it back too
+    probe = router.begin('kokoro')
+    router.release_probe('kokoro')
+    assert router.health['kokoro'].probing
+    router.abandoned('kokoro', probe)
+    assert router.select('kokoro') == ('kokoro', 'probe')
+
+
+def test_failover_prefers_the_fastest_then_the_highest_quality_engine():
+    router = make_router()
+    # Nothing measured: ties go to quality
+    assert router.select(AUTO_ENGINE) == ('kokoro', 'fastest')
+
+    router.succeeded('kokoro', 1.0, 1.0, 10)
+    router.succeeded('coqui', 0.5, 1.0, 10)
+    router.succeeded('pyttsx3', 0.2, 1.0, 10)
+    assert router.select(AUTO_ENGINE, text_length=10) == ('pyttsx3', 'fastest')
+    assert router.select(AUTO_ENGINE, text_length=10, min_quality=2) == ('coqui', 'fastest')
+
+    trip(router, 'coqui')
+    assert router.select('coqui', text_length=10, min_quality=2) == ('kokoro', 'circuit_open')
+    trip(router, 'kokoro')
+    with pytest.raises(RequestRejected):
+        router.select('coqui', text_length=10, min_quality=2)
+    assert router.select('coqui', text_length=10) == ('pyttsx3', 'circuit_open')
+
+
+def test_injected_faults_trip_and_recover_a_streamer_engine():
+    streamer = OptimizedTTSStreamer(
+        engines=['kokoro'],
+        engine_faults={'kokoro': FaultSpec(failure_rate=1.0)},
+        breaker_failure_threshold=2,
+        breaker_cooldown_s=0.05
+    )
+
+    async def synthesize(text):
+        return [chunk async for chunk in streamer.synthesize_stream(text, engine='kokoro')]
+
+    async def run():
+        try:
+            for index in range(2):
+                with pytest.raises(EngineFault):
+                    await synthesize(f"Failing request {index}.")
+            assert streamer.router.health['kokoro'].state == OPEN
+            with pytest.raises(RequestRejected):
+                await synthesize("Rejected while open.")
+
+            streamer.fault_injector.clear('kokoro')
+            await asyncio.sleep(0.06)
+            assert await synthesize("The half-open probe.")
+            assert streamer.router.health['kokoro'].state == CLOSED
+            assert await synthesize("Closed again.")
+        finally:
+            await streamer.shutdown()
+
+    asyncio.run(run())
+    assert streamer.router.reasons['probe'] == 1
@@ -0,0 +1,21 @@
+import pytest
+
+from optimized_tts_streamer import OptimizedTTSStreamer
+from tts_server import TTSServer
+
+
+@pytest.fixture
+def server():
+    return TTSServer(OptimizedTTSStreamer())
+
+
+def test_synthesis_params_defaults(server):
+    params = server._synthesis_params({'text': 'Hello'})
+    assert (params['rate'], params['pitch']) == (1.0, 1.0)
+
+
+@pytest.mark.parametrize('name', ['rate', 'pitch'])
+@pytest.mark.parametrize('value', ['0', '-1', 'nan', 'inf'])
+def test_synthesis_params_reject_bad_rate_and_pitch(server, name, value):
+    with pytest.raises(ValueError, match=name.capitalize()):
+        server._synthesis_params({'text': 'Hello', name: value})
@@ -0,0 +1,51 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from optimized_tts_streamer import AudioOptimizer, OptimizedTTSStreamer
+
+
+def test_synthesize_to_file_rejects_codecs_wav_cannot_hold(tmp_path):
+    streamer = OptimizedTTSStreamer()
+    path = tmp_path / 'out.wav'
+
+    async def run():
+        try:
+            await streamer.synthesize_to_file('Hello there.', str(path), codec='ima_adpcm')
+        finally:
+            await streamer.shutdown()
+
+    with pytest.raises(ValueError, match='ima_adpcm'):
+        asyncio.run(run())
+    assert not path.exists()
+
+
+def test_prepare_stream_buffer_fades_only_the_requested_edges():
+    audio = np.full(1000, 10000, dtype='<i2').tobytes()
+    buffer, _ = AudioOptimizer.prepare_stream_buffer(audio, fade_in=False, fade_out=True)
+    samples = np.frombuffer(buffer, dtype='<i2')
+    assert samples[0] == 10000
+    assert samples[-1] < 10000
+
+
+def test_incremental_stream_fades_only_its_outer_edges():
+    streamer = OptimizedTTSStreamer(incremental=True)
+    edges = []
+    prepare = streamer.audio_optimizer.prepare_stream_buffer
+
+    def recording_prepare(*args, fade_in=True, fade_out=True, **kwargs):
+        edges.append((fade_in, fade_out))
+        return prepare(*args, fade_in=fade_in, fade_out=fade_out, **kwargs)
+
+    streamer.audio_optimizer.prepare_stream_buffer = recording_prepare
+
+    async def run():
+        try:
+            async for _ in streamer.synthesize_stream("First sentence. Second sentence. Third sentence."):
+                pass
+        finally:
+            await streamer.shutdown()
+
+    asyncio.run(run())
+    assert edges == [(True, False), (False, False), (False, True)]
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Bulk TTS synthesis
+Runs many requests concurrently with deduplication and bounded per-engine
+concurrency, for batch jobs such as notification backfills and prompt
+regeneration; includes a JSON lines job runner that writes one file per job
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+from tts_codecs import CODEC_BITS, WAV_FORMAT_TAGS, WavStreamWriter
+from tts_routing import AUTO_ENGINE
+
+
+@dataclass(frozen=True)
+class SynthesisRequest:
+    """One bulk request; None fields take the streamer's defaults"""
+    text: str
+    voice: str = 'default'
+    rate: float = 1.0
+    pitch: float = 1.0
+    engine: Optional[str] = None
+    codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, entry: Dict) -> 'SynthesisRequest':
+        return cls(
+            entry['text'],
+            entry.get('voice', 'default'),
+            float(entry.get('rate', 1.0)),
+            float(entry.get('pitch', 1.0)),
+            entry.get('engine'),
+            entry.get('codec'),
+            int(entry['sample_rate']) if entry.get('sample_rate') is not None else None
+        )
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one unique request
+
+    ``indices`` are the input positions of every identical request it
+    serves. Buffered results carry ``audio``; streamed ones carry
+    ``chunks``, an async iterator of ``AudioChunk`` that raises if the
+    synthesis fails part-way. ``error`` is set when the request failed before
+    producing audio. ``elapsed_s`` runs from dispatch to the finished buffer,
+    or to the first chunk of a stream.
+    """
+    request: SynthesisRequest
+    indices: List[int]
+    audio: Optional[bytes] = None
+    chunks: Optional[AsyncIterator] = None
+    error: Optional[BaseException] = None
+    codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+    elapsed_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _as_request(request: Union[SynthesisRequest, Dict, str]) -> SynthesisRequest:
+    if isinstance(request, SynthesisRequest):
+        return request
+    if isinstance(request, str):
+        return SynthesisRequest(request)
+    return SynthesisRequest.from_dict(request)
+
+
+@dataclass
+class _Job:
+    request: SynthesisRequest
+    indices: List[int]
+    ready: asyncio.Future
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+
+async def _relay(job: _Job) -> AsyncGenerator:
+    while True:
+        kind, payload = await job.queue.get()
+        if kind == 'end':
+            return
+        if kind == 'error':
+            raise payload
+        yield payload
+
+
+async def synthesize_many(
+    streamer,
+    requests: Iterable[Union[SynthesisRequest, Dict, str]],
+    concurrency: int = 8,
+    ordered: bool = True,
+    stream: bool = False,
+    priority: int = 0,
+    engine_concurrency: Optional[Dict[str, int]] = None
+) -> AsyncGenerator[BatchResult, None]:
+    """Synthesize many requests concurrently
+
+    Identical requests are synthesized once and reported as one result
+    listing all their input positions. At most ``concurrency`` requests are
+    in flight overall and, per engine, no more than the engine can run at
+    once (its admission capacity, or ``engine_concurrency``), so a batch
+    never fills the admission queues live traffic relies on. Routed
+    (``'auto'``) requests can land on any engine and share one limit, the
+    largest engine's unless ``engine_concurrency`` sets ``'auto'``.
+
+    Results are yielded in input order (``ordered``, by each unique request's
+    first position) or as they become ready. With ``stream`` a result is
+    ready at its first chunk and its audio follows through ``chunks``. A
+    stream keeps running whether or not it is read, so chunks not yet read
+    are held in memory, up to a request's whole encoded audio; read each
+    stream as it is yielded, or use buffered results when holding many.
+    Otherwise a result is ready with its whole audio. Failures are reported
+    on the result, not raised.
+    Closing the generator early cancels the outstanding work; streams
+    already yielded then raise ``asyncio.CancelledError`` where they stop.
+
+    Works with ``OptimizedTTSStreamer`` and ``tts_workers.WorkerPool``.
+    """
+    loop = asyncio.get_running_loop()
+    unique: Dict[SynthesisRequest, List[int]] = {}
+    for index, request in enumerate(requests):
+        unique.setdefault(_as_request(request), []).append(index)
+    jobs = [_Job(request, indices, loop.create_future()) for request, indices in unique.items()]
+
+    # Per-engine limits default to what each engine runs at once
+    admission = getattr(streamer, 'admission', {})
+    capacities = {name: controller.max_concurrency for name, controller in admission.items()}
+    capacities.update(engine_concurrency or {})
+    if capacities and AUTO_ENGINE not in capacities:
+        capacities[AUTO_ENGINE] = max(capacities.values())
+    engine_limits = {name: asyncio.Semaphore(max(1, limit)) for name, limit in capacities.items()}
+    pending = iter(jobs)
+
+    async def run(job: _Job):
+        request = job.request
+        engine = request.engine or streamer.default_engine
+        limit = engine_limits.get(engine)
+        if limit is not None:
+            await limit.acquire()
+        started = time.perf_counter()
+        result = BatchResult(request, job.indices)
+        audio = bytearray()
+        try:
+            async for chunk in streamer.synthesize_stream(
+                request.text, request.voice, request.rate, request.pitch, request.engine,
+                codec=request.codec, priority=priority, sample_rate=request.sample_rate
+            ):
+                if stream:
+                    job.queue.put_nowait(('chunk', chunk))
+                    if not job.ready.done():
+                        result.codec, result.sample_rate = chunk.codec, chunk.sample_rate
+                        result.elapsed_s = time.perf_counter() - started
+                        result.chunks = _relay(job)
+                        job.ready.set_result(result)
+                else:
+                    audio += chunk.data
+                    result.codec, result.sample_rate = chunk.codec, chunk.sample_rate
+        except asyncio.CancelledError:
+            # A stream already handed out has to end for whoever is reading it
+            if job.ready.done():
+                job.queue.put_nowait(('error', asyncio.CancelledError()))
+            raise
+        except Exception as e:
+            if job.ready.done():
+                job.queue.put_nowait(('error', e))
+                return
+            result.error = e
+        finally:
+            if limit is not None:
+                limit.release()
+
+        if stream:
+            job.queue.put_nowait(('end', None))
+            if job.ready.done():
+                return
+            result.chunks = _relay(job)  # empty stream, or failed before audio
+        elif result.error is None:
+            result.audio = bytes(audio)
+        result.elapsed_s = time.perf_counter() - started
+        job.ready.set_result(result)
+
+    async def worker():
+        for job in pending:
+            await run(job)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(jobs))))]
+    try:
+        if ordered:
+            for job in jobs:
+                yield await job.ready
+        else:
+            for ready in asyncio.as_completed([job.ready for job in jobs]):
+                yield await ready
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+# ----------------------------------------------------------------------
+# JSON lines job runner
+# ----------------------------------------------------------------------
+
+def load_jobs(path: str) -> List[Dict]:
+    """Read a job file: one JSON object per line with ``text`` and optional
+    ``id``, ``voice``, ``rate``, ``pitch``, ``engine``, ``codec`` and
+    ``sample_rate``. Jobs without an id are numbered by line."""
+    jobs = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                entry = json.loads(line)
+                request = SynthesisRequest.from_dict(entry)
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid job: {e}")
+            jobs.append({'id': str(entry.get('id', line_number)), 'request': request})
+    return jobs
+
+
+def _output_path(output_dir: str, job_id: str, codec: str) -> str:
+    name = re.sub(r'[^\w.-]', '_', job_id)
+    extension = 'wav' if codec in WAV_FORMAT_TAGS else codec
+    return os.path.join(output_dir, f"{name}.{extension}")
+
+
+async def run_jobs(
+    streamer,
+    jobs_path: str,
+    output_dir: str,
+    concurrency: int = 8,
+    priority: int = 0
+) -> Dict:
+    """Synthesize every job in ``jobs_path`` into ``output_dir``
+
+    Each job is written to ``<id>.wav`` (``<id>.<codec>`` for codecs WAV
+    cannot describe) as its audio streams in. Returns aggregate throughput;
+    failed jobs are listed under ``errors``.
+    """
+    jobs = load_jobs(jobs_path)
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    counts = {'succeeded': 0, 'failed': 0}
+    errors = []
+    total_bytes = 0
+    audio_seconds = 0.0
+    synthesized_chars = 0
+
+    results = synthesize_many(
+        streamer, (job['request'] for job in jobs),
+        concurrency=concurrency, ordered=False, stream=True, priority=priority
+    )
+    async for result in results:
+        job_ids = [jobs[index]['id'] for index in result.indices]
+        written = 0
+        try:
+            if result.error is not None:
+                raise result.error
+            codec = result.codec or streamer.codec
+            sample_rate = result.sample_rate or streamer.sample_rate
+            paths = [_output_path(output_dir, job_id, codec) for job_id in job_ids]
+            if codec in WAV_FORMAT_TAGS:
+                outputs = [WavStreamWriter(path, sample_rate, codec) for path in paths]
+            else:
+                outputs = [open(path, 'wb') for path in paths]
+            try:
+                async for chunk in result.chunks:
+                    for output in outputs:
+                        output.write(chunk.data)
+                    written += len(chunk.data)
+            finally:
+                for output in outputs:
+                    output.close()
+        except Exception as e:
+            counts['failed'] += len(job_ids)
+            errors.extend({'id': job_id, 'error': f"{type(e).__name__}: {e}"} for job_id in job_ids)
+            logging.warning(f"Job {job_ids[0]} failed: {e}")
+            continue
+
+        counts['succeeded'] += len(job_ids)
+        total_bytes += written * len(job_ids)
+        audio_seconds += written * 8 / (CODEC_BITS[codec] * sample_rate) * len(job_ids)
+        synthesized_chars += len(result.request.text)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'jobs': len(jobs),
+        'unique': len(set(job['request'] for job in jobs)),
+        **counts,
+        'elapsed_s': elapsed,
+        'jobs_per_sec': len(jobs) / elapsed if elapsed > 0 else 0.0,
+        'chars_per_sec': synthesized_chars / elapsed if elapsed > 0 else 0.0,
+        'audio_seconds': audio_seconds,
+        'realtime_factor': audio_seconds / elapsed if elapsed > 0 else 0.0,
+        'output_bytes': total_bytes,
+        'concurrency': concurrency,
+        'output_dir': output_dir,
+        'errors': errors[:100]
+    }
+    logging.info(
+        f"Jobs complete: {counts['succeeded']}/{len(jobs)} in {elapsed:.1f}s "
+        f"({report['jobs_per_sec']:.1f} jobs/s, {report['realtime_factor']:.1f}x real time)"
+    )
+    return report
+
+
+def add_batch_arguments(parser):
+    """Add the --jobs options to an argparse parser"""
+    group = parser.add_argument_group('bulk jobs')
+    group.add_argument("--jobs", type=str, metavar="FILE", help="Synthesize a JSON lines job file instead of --text")
+    group.add_argument("--output-dir", type=str, default="tts-output", help="Directory for job outputs")
+    group.add_argument("--jobs-concurrency", type=int, default=8, help="Jobs in flight at once")
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+TTS load benchmark
+Drives OptimizedTTSStreamer with closed-loop (fixed concurrency) and
+open-loop (fixed arrival rate) load, in cold- and warm-cache phases, and
+compares results against a saved baseline
+"""
+
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from tts_codecs import CODEC_BITS
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+DEFAULT_TEXTS = [
+    "Short test.",
+    "This is a medium length test sentence for TTS performance evaluation.",
+    "This is a much longer test sentence that will help us evaluate the performance of the TTS system when processing larger amounts of text, including various punctuation marks, and different sentence structures to ensure comprehensive testing coverage.",
+    "Please hold while we connect your call.",
+    "The quick brown fox jumps over the lazy dog. It was not amused, and said so at length."
+]
+
+# Metrics where a higher value is better; every other compared metric is a
+# latency, ratio or size where lower is better
+HIGHER_IS_BETTER = ('throughput_rps', 'audio_seconds_per_second')
+
+# Smallest absolute change that counts, by metric key fragment; keeps jitter
+# on sub-millisecond cache hits from being reported as a regression
+NOISE_FLOORS = {'_ms/': 2.0, '/rtf/': 0.01, 'max_rss_mb': 5.0}
+
+
+@dataclass
+class BenchmarkConfig:
+    """Load shape of a benchmark run"""
+    modes: List[str] = field(default_factory=lambda: ['closed', 'open'])
+    phases: List[str] = field(default_factory=lambda: ['cold', 'warm'])
+    requests: int = 50  # per mode and phase
+    concurrency: int = 8  # closed loop: clients issuing back-to-back requests
+    arrival_rate: float = 20.0  # open loop: mean requests per second (Poisson)
+    engine: Optional[str] = None
+    codec: Optional[str] = None
+    incremental: Optional[bool] = None
+    seed: int = 1234
+    clear_disk_cache: bool = False  # the cold phase also wipes the persistent cache
+    texts: List[str] = field(default_factory=lambda: list(DEFAULT_TEXTS))
+
+
+def _request_texts(config: BenchmarkConfig, mode: str) -> List[str]:
+    """Deterministic request texts for one mode
+
+    Every request gets a distinct text so the cold phase never hits the
+    cache; the warm phase replays the same list.
+    """
+    rng = random.Random(f"{config.seed}-{mode}")
+    return [
+        f"{rng.choice(config.texts)} Request {mode} {i}."
+        for i in range(config.requests)
+    ]
+
+
+def _max_rss_mb() -> Optional[float]:
+    """Process RSS high-water mark (ru_maxrss is in KB on Linux)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _distribution(values: List[float]) -> Dict:
+    if not values:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    array = np.asarray(values)
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {
+        'mean': float(array.mean()),
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'max': float(array.max())
+    }
+
+
+async def _timed_request(streamer, text: str, config: BenchmarkConfig) -> Dict:
+    """One streamed request: time to first chunk, total latency and RTF"""
+    started = time.perf_counter()
+    first_chunk = None
+    audio_bytes = 0
+    codec = config.codec or streamer.codec
+    sample_rate = streamer.sample_rate
+
+    async for chunk in streamer.synthesize_stream(
+        text, engine=config.engine, incremental=config.incremental, codec=config.codec
+    ):
+        if first_chunk is None:
+            first_chunk = time.perf_counter()
+        audio_bytes += len(chunk.data)
+        sample_rate = chunk.sample_rate
+
+    finished = time.perf_counter()
+    audio_seconds = audio_bytes * 8 / CODEC_BITS[codec] / sample_rate
+    latency = finished - started
+    return {
+        'ttfc_ms': ((first_chunk or finished) - started) * 1000,
+        'latency_ms': latency * 1000,
+        'audio_seconds': audio_seconds,
+        'rtf': latency / audio_seconds if audio_seconds else 0.0
+    }
+
+
+async def _run_closed_loop(streamer, texts: List[str], config: BenchmarkConfig) -> Dict:
+    """``concurrency`` clients, each sending its next request when the last one finishes"""
+    queue = list(reversed(texts))
+    results, errors = [], []
+
+    async def client():
+        while queue:
+            text = queue.pop()
+            try:
+                results.append(await _timed_request(streamer, text, config))
+            except Exception as e:
+                errors.append(str(e))
+
+    await asyncio.gather(*(client() for _ in range(config.concurrency)))
+    return {'results': results, 'errors': errors, 'concurrency': config.concurrency}
+
+
+async def _run_open_loop(streamer, texts: List[str], config: BenchmarkConfig) -> Dict:
+    """Requests arrive on a seeded Poisson schedule regardless of completions"""
+    rng = random.Random(config.seed)
+    results, errors = [], []
+    in_flight = 0
+    max_in_flight = 0
+
+    async def send(text: str):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            results.append(await _timed_request(streamer, text, config))
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            in_flight -= 1
+
+    tasks = []
+    start = time.perf_counter()
+    arrival = 0.0
+    for text in texts:
+        delay = start + arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(send(text)))
+        arrival += rng.expovariate(config.arrival_rate)
+    await asyncio.gather(*tasks)
+
+    return {
+        'results': results,
+        'errors': errors,
+        'offered_rate_rps': config.arrival_rate,
+        'max_in_flight': max_in_flight
+    }
+
+
+async def _run_phase(streamer, mode: str, phase: str, texts: List[str], config: BenchmarkConfig) -> Dict:
+    if phase == 'cold':
+        # The disk cache is the user's persistent tier; only wiped on request
+        streamer.clear_cache(disk=config.clear_disk_cache)
+        if streamer.disk_cache is not None and not config.clear_disk_cache:
+            logging.warning(
+                "Cold phase with the disk cache kept: texts from earlier runs are disk hits "
+                "(--bench-clear-disk-cache wipes it)"
+            )
+    cache_before = streamer.cache.stats()
+
+    started = time.perf_counter()
+    runner = _run_closed_loop if mode == 'closed' else _run_open_loop
+    outcome = await runner(streamer, texts, config)
+    wall = time.perf_counter() - started
+
+    results = outcome.pop('results')
+    errors = outcome.pop('errors')
+    cache_after = streamer.cache.stats()
+    lookups = cache_after['requests'] - cache_before['requests']
+    audio_seconds = sum(r['audio_seconds'] for r in results)
+
+    return {
+        'mode': mode,
+        'phase': phase,
+        'requests': len(texts),
+        'completed': len(results),
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        **outcome,
+        'wall_s': wall,
+        'throughput_rps': len(results) / wall if wall else 0.0,
+        'audio_seconds_per_second': audio_seconds / wall if wall else 0.0,
+        'cache_hit_rate': (cache_after['hits'] - cache_before['hits']) / lookups if lookups else 0.0,
+        'ttfc_ms': _distribution([r['ttfc_ms'] for r in results]),
+        'latency_ms': _distribution([r['latency_ms'] for r in results]),
+        'rtf': _distribution([r['rtf'] for r in results]),
+        'max_rss_mb': _max_rss_mb()
+    }
+
+
+async def run_benchmark(streamer, config: Optional[BenchmarkConfig] = None) -> Dict:
+    """Run every configured mode and phase against ``streamer``"""
+    config = config or BenchmarkConfig()
+    rss_at_start = _max_rss_mb()
+    phases = []
+
+    for mode in config.modes:
+        if mode not in ('closed', 'open'):
+            raise ValueError(f"Unknown load mode: {mode}")
+        texts = _request_texts(config, mode)
+        for phase in config.phases:
+            if phase not in ('cold', 'warm'):
+                raise ValueError(f"Unknown phase: {phase}")
+            result = await _run_phase(streamer, mode, phase, texts, config)
+            logging.info(
+                f"Benchmark {mode}/{phase}: {result['throughput_rps']:.1f} req/s, "
+                f"TTFC p95 {result['ttfc_ms']['p95']:.1f}ms, "
+                f"latency p95 {result['latency_ms']['p95']:.1f}ms, errors={result['errors']}"
+            )
+            phases.append(result)
+
+    return {
+        'config': asdict(config),
+        'streamer': {
+            'engines': list(streamer.engines.keys()),
+            'default_engine': streamer.default_engine,
+            'chunk_size_ms': streamer.chunk_size_ms,
+            'adaptive_chunking': streamer.adaptive_chunking,
+            'compression_enabled': streamer.enable_compression,
+            'codec': streamer.codec
+        },
+        'timestamp': time.time(),
+        'max_rss_mb_at_start': rss_at_start,
+        'max_rss_mb': _max_rss_mb(),
+        'phases': phases
+    }
+
+
+def _flatten(report: Dict) -> Dict[str, float]:
+    """Comparable metrics keyed ``mode/phase/metric[/statistic]``"""
+    flat = {}
+    for phase in report.get('phases', []):
+        prefix = f"{phase['mode']}/{phase['phase']}"
+        for name in ('throughput_rps', 'audio_seconds_per_second'):
+            flat[f"{prefix}/{name}"] = phase[name]
+        for name in ('ttfc_ms', 'latency_ms', 'rtf'):
+            for stat in ('p50', 'p95', 'p99'):
+                flat[f"{prefix}/{name}/{stat}"] = phase[name][stat]
+    if report.get('max_rss_mb') is not None:
+        flat['max_rss_mb'] = report['max_rss_mb']
+    return flat
+
+
+def compare_reports(baseline: Dict, current: Dict, tolerance: float = 0.10) -> Dict:
+    """Flag metrics that got worse than the baseline by more than ``tolerance``
+
+    A change must also exceed the metric's ``NOISE_FLOORS`` entry to count.
+    """
+    before, after = _flatten(baseline), _flatten(current)
+    regressions, improvements = [], []
+
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        if not old:
+            continue
+        change = (new - old) / old
+        if key.endswith(HIGHER_IS_BETTER):
+            change = -change
+        if any(fragment in key and abs(new - old) < floor for fragment, floor in NOISE_FLOORS.items()):
+            continue
+
+        entry = {'metric': key, 'baseline': old, 'current': new, 'change': (new - old) / old}
+        if change > tolerance:
+            regressions.append(entry)
+        elif change < -tolerance:
+            improvements.append(entry)
+
+    return {
+        'tolerance': tolerance,
+        'compared_metrics': len(before.keys() & after.keys()),
+        'regressions': regressions,
+        'improvements': improvements,
+        'passed': not regressions
+    }
+
+
+def add_benchmark_arguments(parser):
+    """Benchmark options, shared with the streamer CLI"""
+    parser.add_argument("--bench-modes", type=str, default="closed,open", help="Load modes: closed, open")
+    parser.add_argument("--bench-phases", type=str, default="cold,warm", help="Cache phases: cold, warm")
+    parser.add_argument("--bench-requests", type=int, default=50, help="Requests per mode and phase")
+    parser.add_argument("--bench-concurrency", type=int, default=8, help="Closed-loop concurrent clients")
+    parser.add_argument("--bench-rate", type=float, default=20.0, help="Open-loop arrival rate (req/s)")
+    parser.add_argument("--bench-seed", type=int, default=1234, help="Seed for texts and arrivals")
+    parser.add_argument("--bench-clear-disk-cache", action="store_true",
+                        help="Wipe the disk cache before the cold phase (it is kept by default)")
+    parser.add_argument("--bench-output", type=str, metavar="FILE", help="Write the JSON report to FILE")
+    parser.add_argument("--bench-baseline", type=str, metavar="FILE", help="Compare against a saved report")
+    parser.add_argument("--bench-tolerance", type=float, default=0.10, help="Allowed relative regression")
+
+
+def config_from_args(args) -> BenchmarkConfig:
+    return BenchmarkConfig(
+        modes=[m for m in args.bench_modes.split(',') if m],
+        phases=[p for p in args.bench_phases.split(',') if p],
+        requests=args.bench_requests,
+        concurrency=args.bench_concurrency,
+        arrival_rate=args.bench_rate,
+        engine=getattr(args, 'engine', None),
+        codec=getattr(args, 'codec', None),
+        incremental=getattr(args, 'incremental', None) or None,
+        seed=args.bench_seed,
+        clear_disk_cache=args.bench_clear_disk_cache
+    )
+
+
+async def run_from_args(streamer, args) -> int:
+    """Run, write and compare as requested on the command line; returns an exit code"""
+    report = await run_benchmark(streamer, config_from_args(args))
+
+    exit_code = 0
+    if args.bench_baseline:
+        with open(args.bench_baseline) as f:
+            baseline = json.load(f)
+        report['comparison'] = compare_reports(baseline, report, args.bench_tolerance)
+        if not report['comparison']['passed']:
+            exit_code = 1
+            for entry in report['comparison']['regressions']:
+                logging.warning(
+                    f"Regression {entry['metric']}: {entry['baseline']:.2f} -> "
+                    f"{entry['current']:.2f} ({entry['change']:+.1%})"
+                )
+
+    output = json.dumps(report, indent=2)
+    if args.bench_output:
+        with open(args.bench_output, 'w') as f:
+            f.write(output)
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from optimized_tts_streamer import OptimizedTTSStreamer
+
+    parser = argparse.ArgumentParser(description="TTS load benchmark")
+    parser.add_argument("--engine", type=str, help="TTS engine to use (default: streamer default)")
+    parser.add_argument("--engines", type=str, help="Comma-separated engines to load (default: all available)")
+    parser.add_argument("--codec", type=str, default="pcm16", choices=sorted(CODEC_BITS), help="Output codec")
+    parser.add_argument("--incremental", action="store_true", help="Stream sentence by sentence")
+    parser.add_argument("--skip-warmup", action="store_true", help="Do not warm up engines first")
+    add_benchmark_arguments(parser)
+    args = parser.parse_args()
+
+    # Per-request log lines would dominate the run
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    async def main() -> int:
+        streamer = OptimizedTTSStreamer(
+            engines=args.engines.split(',') if args.engines else None,
+            codec=args.codec
+        )
+        try:
+            if not args.skip_warmup:
+                await streamer.warmup()
+            return await run_from_args(streamer, args)
+        finally:
+            await streamer.shutdown()
+
+    sys.exit(asyncio.run(main()))
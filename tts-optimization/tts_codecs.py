@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Streaming audio codecs
+G.711 mu-law/A-law and IMA-ADPCM encoders/decoders for 16-bit mono PCM
+"""
+
+import struct
+import zlib
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+# Bits per encoded sample; also the negotiation names clients use
+CODEC_BITS: Dict[str, int] = {
+    'pcm16': 16,
+    'mulaw': 8,
+    'alaw': 8,
+    'ima_adpcm': 4
+}
+
+# Stable numeric ids for serialized cache entries
+CODEC_IDS: Dict[str, int] = {'pcm16': 0, 'mulaw': 1, 'alaw': 2, 'ima_adpcm': 3}
+CODEC_NAMES: Dict[int, str] = {v: k for k, v in CODEC_IDS.items()}
+
+
+def codec_bitrate(codec: str, sample_rate: int) -> int:
+    """Bitrate in bits per second of a mono stream"""
+    return CODEC_BITS[codec] * sample_rate
+
+
+def codec_for_bitrate(target_bitrate: int, sample_rate: int) -> str:
+    """Highest-fidelity codec whose bitrate does not exceed ``target_bitrate``"""
+    for codec in ('pcm16', 'mulaw', 'ima_adpcm'):
+        if codec_bitrate(codec, sample_rate) <= target_bitrate:
+            return codec
+    return 'ima_adpcm'
+
+
+# ----------------------------------------------------------------------
+# G.711 (vectorized; encoding is a single table lookup per sample)
+# ----------------------------------------------------------------------
+
+_SEG_UEND = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+_SEG_AEND = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+_ULAW_BIAS = 0x84
+
+
+def _linear_to_ulaw(pcm: np.ndarray) -> np.ndarray:
+    x = pcm.astype(np.int32) >> 2
+    mask = np.where(x < 0, 0x7F, 0xFF)
+    x = np.minimum(np.abs(x), 8159) + (_ULAW_BIAS >> 2)
+    seg = np.searchsorted(_SEG_UEND, x)
+    uval = (seg << 4) | ((x >> np.minimum(seg + 1, 31)) & 0x0F)
+    return (np.where(seg >= 8, 0x7F, uval) ^ mask).astype(np.uint8)
+
+
+def _ulaw_to_linear(codes: np.ndarray) -> np.ndarray:
+    u = ~codes.astype(np.int32) & 0xFF
+    t = (((u & 0x0F) << 3) + _ULAW_BIAS) << ((u & 0x70) >> 4)
+    return np.where(u & 0x80, _ULAW_BIAS - t, t - _ULAW_BIAS).astype(np.int16)
+
+
+def _linear_to_alaw(pcm: np.ndarray) -> np.ndarray:
+    x = pcm.astype(np.int32) >> 3
+    negative = x < 0
+    mask = np.where(negative, 0x55, 0xD5)
+    x = np.where(negative, -x - 1, x)
+    seg = np.searchsorted(_SEG_AEND, x)
+    shift = np.where(seg < 2, 1, np.minimum(seg, 31))
+    aval = (np.minimum(seg, 7) << 4) | ((x >> shift) & 0x0F)
+    return (np.where(seg >= 8, 0x7F, aval) ^ mask).astype(np.uint8)
+
+
+def _alaw_to_linear(codes: np.ndarray) -> np.ndarray:
+    a = codes.astype(np.int32) ^ 0x55
+    t = (a & 0x0F) << 4
+    seg = (a & 0x70) >> 4
+    t = np.where(seg == 0, t + 8, t + 0x108)
+    t = np.where(seg > 1, t << np.maximum(seg - 1, 0), t)
+    return np.where(a & 0x80, t, -t).astype(np.int16)
+
+
+@lru_cache(maxsize=None)
+def _g711_tables(codec: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Full encode table indexed by the uint16 view of a sample, and the decode table"""
+    every_sample = np.arange(-32768, 32768, dtype=np.int32).astype(np.int16)
+    every_code = np.arange(256, dtype=np.uint8)
+    if codec == 'mulaw':
+        encoded, decoded = _linear_to_ulaw(every_sample), _ulaw_to_linear(every_code)
+    else:
+        encoded, decoded = _linear_to_alaw(every_sample), _alaw_to_linear(every_code)
+
+    # Reorder so that table[sample.view(uint16)] is the code for ``sample``
+    encode_table = np.empty(65536, dtype=np.uint8)
+    encode_table[every_sample.view(np.uint16)] = encoded
+    encode_table.flags.writeable = False
+    decoded.flags.writeable = False
+    return encode_table, decoded
+
+
+# ----------------------------------------------------------------------
+# IMA-ADPCM
+# ----------------------------------------------------------------------
+
+_IMA_INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8] * 2
+_IMA_STEP_TABLE = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767
+]
+
+
+# ----------------------------------------------------------------------
+# Stream encoders/decoders
+# ----------------------------------------------------------------------
+
+class StreamEncoder:
+    """Stateful encoder for a single 16-bit mono PCM stream
+
+    ``encode`` may be called with arbitrarily sized pieces; any state needed
+    to continue seamlessly (predictor, odd trailing sample) is carried to
+    the next call. Call ``flush`` once at the end of the stream.
+    """
+
+    codec = 'pcm16'
+
+    def __init__(self):
+        self.pending_samples = 0
+
+    @property
+    def bits_per_sample(self) -> int:
+        return CODEC_BITS[self.codec]
+
+    def encode(self, pcm: bytes) -> bytes:
+        return bytes(pcm)
+
+    def flush(self) -> bytes:
+        return b""
+
+    def encode_segment(self, pcm: bytes, pcm_offsets: np.ndarray, final: bool) -> Tuple[bytes, np.ndarray]:
+        """Encode one stream segment and map its PCM chunk offsets into the encoded bytes"""
+        carried = self.pending_samples
+        data = self.encode(pcm)
+        if final:
+            data += self.flush()
+
+        sample_offsets = np.asarray(pcm_offsets, dtype=np.int64) // 2
+        offsets = ((carried + sample_offsets) * self.bits_per_sample) // 8
+        offsets = np.minimum(offsets, len(data))
+        offsets[0] = 0
+        offsets[-1] = len(data)
+        return data, offsets
+
+
+class G711Encoder(StreamEncoder):
+    """G.711 mu-law or A-law encoder (stateless, one table lookup per sample)"""
+
+    def __init__(self, codec: str = 'mulaw'):
+        super().__init__()
+        if codec not in ('mulaw', 'alaw'):
+            raise ValueError(f"Not a G.711 codec: {codec}")
+        self.codec = codec
+        self._table = _g711_tables(codec)[0]
+
+    def encode(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype='<i2')
+        return self._table[samples.view(np.uint16)].tobytes()
+
+
+class ImaAdpcmEncoder(StreamEncoder):
+    """IMA-ADPCM encoder, two samples per byte (first sample in the low nibble)
+
+    ADPCM is a sample-by-sample recurrence on the predictor and step index,
+    so unlike G.711 it cannot be vectorized; the loop works on plain ints
+    with table lookups. The predictor, step index and an odd trailing
+    sample carry across calls.
+    """
+
+    codec = 'ima_adpcm'
+
+    def __init__(self):
+        super().__init__()
+        self.predictor = 0
+        self.index = 0
+        self._pending_nibble = None
+
+    def _encode_nibbles(self, samples) -> list:
+        predictor = self.predictor
+        index = self.index
+        steps = _IMA_STEP_TABLE
+        index_table = _IMA_INDEX_TABLE
+        nibbles = []
+        append = nibbles.append
+
+        for sample in samples:
+            step = steps[index]
+            diff = sample - predictor
+            nibble = 0
+            if diff < 0:
+                nibble = 8
+                diff = -diff
+            vpdiff = step >> 3
+            if diff >= step:
+                nibble |= 4
+                diff -= step
+                vpdiff += step
+            step >>= 1
+            if diff >= step:
+                nibble |= 2
+                diff -= step
+                vpdiff += step
+            step >>= 1
+            if diff >= step:
+                nibble |= 1
+                vpdiff += step
+
+            if nibble & 8:
+                predictor -= vpdiff
+                if predictor < -32768:
+                    predictor = -32768
+            else:
+                predictor += vpdiff
+                if predictor > 32767:
+                    predictor = 32767
+
+            index += index_table[nibble]
+            if index < 0:
+                index = 0
+            elif index > 88:
+                index = 88
+            append(nibble)
+
+        self.predictor = predictor
+        self.index = index
+        return nibbles
+
+    def encode(self, pcm: bytes) -> bytes:
+        nibbles = self._encode_nibbles(np.frombuffer(pcm, dtype='<i2').tolist())
+        if self._pending_nibble is not None:
+            nibbles.insert(0, self._pending_nibble)
+            self._pending_nibble = None
+        if len(nibbles) % 2:
+            self._pending_nibble = nibbles.pop()
+        self.pending_samples = 1 if self._pending_nibble is not None else 0
+
+        packed = np.array(nibbles, dtype=np.uint8).reshape(-1, 2)
+        return (packed[:, 0] | (packed[:, 1] << 4)).tobytes()
+
+    def flush(self) -> bytes:
+        """Emit a trailing odd sample, padded with a zero nibble"""
+        if self._pending_nibble is None:
+            return b""
+        data = bytes([self._pending_nibble])
+        self._pending_nibble = None
+        self.pending_samples = 0
+        return data
+
+
+class StreamDecoder:
+    """Stateful decoder back to 16-bit PCM (for clients and verification)"""
+
+    codec = 'pcm16'
+
+    def decode(self, data: bytes) -> bytes:
+        return bytes(data)
+
+
+class G711Decoder(StreamDecoder):
+    def __init__(self, codec: str = 'mulaw'):
+        self.codec = codec
+        self._table = _g711_tables(codec)[1]
+
+    def decode(self, data: bytes) -> bytes:
+        return self._table[np.frombuffer(data, dtype=np.uint8)].astype('<i2').tobytes()
+
+
+class ImaAdpcmDecoder(StreamDecoder):
+    codec = 'ima_adpcm'
+
+    def __init__(self):
+        self.predictor = 0
+        self.index = 0
+
+    def decode(self, data: bytes) -> bytes:
+        codes = np.frombuffer(data, dtype=np.uint8)
+        nibbles = np.empty(len(codes) * 2, dtype=np.uint8)
+        nibbles[0::2] = codes & 0x0F
+        nibbles[1::2] = codes >> 4
+
+        predictor = self.predictor
+        index = self.index
+        steps = _IMA_STEP_TABLE
+        index_table = _IMA_INDEX_TABLE
+        samples = []
+        append = samples.append
+
+        for nibble in nibbles.tolist():
+            step = steps[index]
+            vpdiff = step >> 3
+            if nibble & 4:
+                vpdiff += step
+            if nibble & 2:
+                vpdiff += step >> 1
+            if nibble & 1:
+                vpdiff += step >> 2
+            if nibble & 8:
+                predictor = max(predictor - vpdiff, -32768)
+            else:
+                predictor = min(predictor + vpdiff, 32767)
+            index = min(max(index + index_table[nibble], 0), 88)
+            append(predictor)
+
+        self.predictor = predictor
+        self.index = index
+        return np.array(samples, dtype='<i2').tobytes()
+
+
+def create_encoder(codec: str) -> StreamEncoder:
+    """New encoder for one stream"""
+    if codec == 'pcm16':
+        return StreamEncoder()
+    if codec in ('mulaw', 'alaw'):
+        return G711Encoder(codec)
+    if codec == 'ima_adpcm':
+        return ImaAdpcmEncoder()
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def create_decoder(codec: str) -> StreamDecoder:
+    """New decoder for one stream"""
+    if codec == 'pcm16':
+        return StreamDecoder()
+    if codec in ('mulaw', 'alaw'):
+        return G711Decoder(codec)
+    if codec == 'ima_adpcm':
+        return ImaAdpcmDecoder()
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+# ----------------------------------------------------------------------
+# Lossless block compression (cache storage)
+# ----------------------------------------------------------------------
+
+_BLOCK_PLAIN = b"\x00"
+_BLOCK_DELTA = b"\x01"
+
+
+def pack_block(data: bytes, codec: str = 'pcm16', level: int = 1) -> bytes:
+    """Losslessly compress one block of a stream
+
+    16-bit PCM is first turned into sample deltas, wrapping at 16 bits, and
+    its low and high bytes are split into separate planes; speech changes
+    slowly between samples, so the high-byte plane is nearly constant and
+    deflate does much better on it. Already-encoded codecs are deflated as
+    is. Each block is self-contained.
+    """
+    if codec == 'pcm16' and len(data) % 2 == 0:
+        samples = np.frombuffer(data, dtype='<i2')
+        deltas = np.diff(samples, prepend=np.int16(0))
+        planes = deltas.view(np.uint8).reshape(-1, 2).T
+        return _BLOCK_DELTA + zlib.compress(planes.tobytes(), level)
+    return _BLOCK_PLAIN + zlib.compress(bytes(data), level)
+
+
+def unpack_block(blob: bytes) -> bytes:
+    """Inverse of ``pack_block``"""
+    raw = zlib.decompress(memoryview(blob)[1:])
+    if blob[:1] == _BLOCK_PLAIN:
+        return raw
+    planes = np.frombuffer(raw, dtype=np.uint8).reshape(2, -1)
+    deltas = np.ascontiguousarray(planes.T).view('<i2').ravel()
+    return np.cumsum(deltas, dtype=np.int16).astype('<i2').tobytes()
+
+
+# ----------------------------------------------------------------------
+# WAV output
+# ----------------------------------------------------------------------
+
+# WAVE format tags of the codecs a plain RIFF header can describe. Our
+# IMA-ADPCM stream has no block headers, so it is not a valid WAV format 0x11.
+WAV_FORMAT_TAGS: Dict[str, int] = {'pcm16': 1, 'alaw': 6, 'mulaw': 7}
+
+
+class WavStreamWriter:
+    """Write a mono WAV file incrementally
+
+    The header is written up front with placeholder sizes, audio is appended
+    as it arrives and ``close`` seeks back to fill in the real sizes, so a
+    file of any length is written in constant memory. A file that is never
+    closed keeps 0xFFFFFFFF sizes, which most readers treat as "read to end
+    of file".
+    """
+
+    _UNKNOWN = 0xFFFFFFFF
+
+    def __init__(self, path: str, sample_rate: int, codec: str = 'pcm16'):
+        if codec not in WAV_FORMAT_TAGS:
+            raise ValueError(f"Codec {codec} cannot be written to a WAV file")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.codec = codec
+        self.bytes_written = 0
+        self._file = open(path, 'wb')
+        self._file.write(self._header(self._UNKNOWN))
+
+    def _header(self, data_size: int) -> bytes:
+        bits = CODEC_BITS[self.codec]
+        block_align = bits // 8
+        byte_rate = self.sample_rate * block_align
+        fmt_tag = WAV_FORMAT_TAGS[self.codec]
+        known = data_size != self._UNKNOWN
+        padded = data_size + (data_size & 1) if known else 0
+
+        if fmt_tag == 1:
+            fmt = struct.pack('<HHIIHH', fmt_tag, 1, self.sample_rate, byte_rate, block_align, bits)
+            extra = b""
+        else:
+            # Non-PCM formats carry cbSize and a fact chunk with the sample count
+            fmt = struct.pack('<HHIIHHH', fmt_tag, 1, self.sample_rate, byte_rate, block_align, bits, 0)
+            samples = data_size // block_align if known else self._UNKNOWN
+            extra = b"fact" + struct.pack('<II', 4, samples)
+
+        chunks = b"fmt " + struct.pack('<I', len(fmt)) + fmt + extra
+        riff_size = 4 + len(chunks) + 8 + padded if known else self._UNKNOWN
+        return b"RIFF" + struct.pack('<I', riff_size) + b"WAVE" + chunks + b"data" + struct.pack('<I', data_size)
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.bytes_written & 1:
+            self._file.write(b"\x00")
+        self._file.seek(0)
+        self._file.write(self._header(self.bytes_written))
+        self._file.close()
+
+    def __enter__(self) -> 'WavStreamWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Persistent disk-backed L2 audio cache
+Append-only segment files with an on-disk index, served through mmap
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+# Record layout: magic, key digest, created timestamp, payload length, payload crc32
+RECORD_HEADER = struct.Struct('<4s16sdQI')
+RECORD_MAGIC = b'TTSA'
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+
+
+@dataclass
+class _IndexEntry:
+    """Location of a cached payload inside a segment"""
+    segment_id: int
+    offset: int  # offset of the payload, not the record header
+    length: int
+    created: float
+
+
+class _Segment:
+    """One append-only segment file and its (lazily created) read mapping"""
+
+    def __init__(self, segment_id: int, path: str, size: int = 0):
+        self.segment_id = segment_id
+        self.path = path
+        self.size = size
+        self.live_bytes = 0
+        self._map: Optional[mmap.mmap] = None
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """Return a zero-copy view of ``length`` bytes at ``offset``"""
+        if self._map is None or len(self._map) < offset + length:
+            # The active segment grows after it was first mapped; remap it.
+            # Views handed out earlier keep the previous mapping alive.
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._map)[offset:offset + length]
+
+    def release(self):
+        """Drop the mapping; outstanding views keep it alive until released"""
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Still exported to a caller; the GC closes it later
+                pass
+            self._map = None
+
+
+class DiskAudioCache:
+    """Persistent L2 cache for synthesized audio
+
+    Payloads are appended to fixed-size segment files and located through an
+    in-memory index that is persisted to ``index.json``. Hits are returned as
+    ``memoryview`` slices of a read-only ``mmap``, so cached audio is never
+    copied onto the Python heap. The index records the size of every segment;
+    if it is missing or does not match the files on disk (e.g. after a crash)
+    the index is rebuilt by scanning and checksumming the segments, and any
+    torn record at the tail is truncated away.
+
+    When the total size exceeds ``max_bytes`` the oldest segment is evicted
+    wholesale. Sealed segments whose live ratio drops below
+    ``compact_threshold`` are compacted by rewriting their live records into
+    the active segment.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 1024 * 1024 * 1024,
+        segment_bytes: int = 64 * 1024 * 1024,
+        compact_threshold: float = 0.5,
+        index_flush_interval: int = 64
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = min(segment_bytes, max_bytes)
+        self.compact_threshold = compact_threshold
+        self.index_flush_interval = index_flush_interval
+
+        self.index: Dict[str, _IndexEntry] = {}
+        self.segments: Dict[int, _Segment] = {}
+        self.lock = threading.RLock()
+        self._active: Optional[_Segment] = None
+        self._active_file = None
+        self._puts_since_flush = 0
+        self._compacting: Optional[int] = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.compactions = 0
+        self.rebuilds = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    # ------------------------------------------------------------------
+    # Opening and index persistence
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment_id:08d}.seg")
+
+    def _list_segment_ids(self) -> List[int]:
+        ids = []
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.endswith('.seg'):
+                try:
+                    ids.append(int(name[len('segment-'):-len('.seg')]))
+                except ValueError:
+                    continue
+        return sorted(ids)
+
+    def _open(self):
+        """Load the persisted index, rebuilding it if it is stale or missing"""
+        segment_ids = self._list_segment_ids()
+        for segment_id in segment_ids:
+            path = self._segment_path(segment_id)
+            self.segments[segment_id] = _Segment(segment_id, path, os.path.getsize(path))
+
+        if self.segments and not self._load_index():
+            logging.info(f"Rebuilding disk cache index in {self.directory}")
+            self._rebuild_index()
+
+        self._open_active_segment()
+        self._enforce_budget()
+
+    def _load_index(self) -> bool:
+        """Load ``index.json``; returns False if it cannot be trusted"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if data.get('version') != INDEX_VERSION:
+            return False
+
+        # Every segment must have exactly the size recorded at flush time
+        recorded = {int(k): v for k, v in data.get('segments', {}).items()}
+        actual = {sid: seg.size for sid, seg in self.segments.items()}
+        if recorded != actual:
+            return False
+
+        for key, (segment_id, offset, length, created) in data.get('entries', {}).items():
+            segment = self.segments.get(segment_id)
+            if segment is None or offset + length > segment.size:
+                return False
+            self.index[key] = _IndexEntry(segment_id, offset, length, created)
+            segment.live_bytes += length
+
+        return True
+
+    def _rebuild_index(self):
+        """Scan all segments in order, validating records and dropping torn tails"""
+        self.index.clear()
+        for segment in self.segments.values():
+            segment.live_bytes = 0
+
+        for segment_id in sorted(self.segments):
+            segment = self.segments[segment_id]
+            valid_size = 0
+
+            with open(segment.path, 'rb') as f:
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    magic, digest, created, length, crc = RECORD_HEADER.unpack(header)
+                    if magic != RECORD_MAGIC:
+                        break
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        break
+
+                    key = digest.hex()
+                    self._drop_index_entry(key)
+                    offset = valid_size + RECORD_HEADER.size
+                    self.index[key] = _IndexEntry(segment_id, offset, length, created)
+                    segment.live_bytes += length
+                    valid_size = offset + length
+
+            if valid_size < segment.size:
+                logging.warning(
+                    f"Truncating {segment.size - valid_size} corrupt bytes from {segment.path}"
+                )
+                with open(segment.path, 'r+b') as f:
+                    f.truncate(valid_size)
+                segment.size = valid_size
+
+        self.rebuilds += 1
+        self._flush_index()
+
+    def _flush_index(self):
+        """Atomically persist the index"""
+        data = {
+            'version': INDEX_VERSION,
+            'segments': {str(sid): seg.size for sid, seg in self.segments.items()},
+            'entries': {
+                key: [e.segment_id, e.offset, e.length, e.created]
+                for key, e in self.index.items()
+            }
+        }
+        path = os.path.join(self.directory, INDEX_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._puts_since_flush = 0
+
+    def _open_active_segment(self):
+        """Continue appending to the newest segment, or start a new one"""
+        if self.segments:
+            newest = self.segments[max(self.segments)]
+            if newest.size < self.segment_bytes:
+                self._active = newest
+                self._active_file = open(newest.path, 'ab')
+                return
+        self._roll_segment()
+
+    def _roll_segment(self):
+        """Seal the active segment and start a new one"""
+        if self._active_file is not None:
+            self._active_file.close()
+        segment_id = max(self.segments) + 1 if self.segments else 0
+        segment = _Segment(segment_id, self._segment_path(segment_id))
+        self._active_file = open(segment.path, 'ab')
+        self.segments[segment_id] = segment
+        self._active = segment
+
+    # ------------------------------------------------------------------
+    # Cache operations
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[memoryview]:
+        """Get cached audio as a zero-copy view; ``key`` is an LRUCache key digest"""
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return self.segments[entry.segment_id].view(entry.offset, entry.length)
+
+    def put(self, key: str, audio_data: bytes):
+        """Append audio to the active segment"""
+        length = len(audio_data)
+        if RECORD_HEADER.size + length > self.max_bytes:
+            return
+
+        with self.lock:
+            self._append(key, audio_data, time.time())
+            self.writes += 1
+            self._enforce_budget()
+
+            self._puts_since_flush += 1
+            if self._puts_since_flush >= self.index_flush_interval:
+                self._flush_index()
+
+    def _append(self, key: str, audio_data, created: float):
+        if self._active.size >= self.segment_bytes:
+            self._roll_segment()
+
+        length = len(audio_data)
+        header = RECORD_HEADER.pack(
+            RECORD_MAGIC, bytes.fromhex(key), created, length, zlib.crc32(audio_data)
+        )
+        self._active_file.write(header)
+        self._active_file.write(audio_data)
+        self._active_file.flush()
+
+        segment = self._active
+        offset = segment.size + RECORD_HEADER.size
+        segment.size = offset + length
+
+        stale_segment_id = self._drop_index_entry(key)
+        self.index[key] = _IndexEntry(segment.segment_id, offset, length, created)
+        segment.live_bytes += length
+
+        if stale_segment_id is not None:
+            self._maybe_compact(stale_segment_id)
+
+    def _drop_index_entry(self, key: str) -> Optional[int]:
+        """Forget ``key``; returns the segment that held it, if any"""
+        entry = self.index.pop(key, None)
+        if entry is None:
+            return None
+        segment = self.segments.get(entry.segment_id)
+        if segment is not None:
+            segment.live_bytes -= entry.length
+        return entry.segment_id
+
+    def total_bytes(self) -> int:
+        return sum(seg.size for seg in self.segments.values())
+
+    def _enforce_budget(self):
+        """Evict whole segments, oldest first, until under ``max_bytes``"""
+        while self.total_bytes() > self.max_bytes and len(self.segments) > 1:
+            oldest_id = min(self.segments)
+            if self.segments[oldest_id] is self._active:
+                break
+            evicted = [key for key, e in self.index.items() if e.segment_id == oldest_id]
+            for key in evicted:
+                del self.index[key]
+            self.evictions += len(evicted)
+            self._delete_segment(oldest_id)
+
+    def _maybe_compact(self, segment_id: int):
+        segment = self.segments.get(segment_id)
+        if segment is None or segment is self._active or segment.size == 0:
+            return
+        if self._compacting is not None:
+            return
+        if segment.live_bytes / segment.size < self.compact_threshold:
+            self._compact_segment(segment_id)
+
+    def _compact_segment(self, segment_id: int):
+        """Move a segment's live records into the active segment and delete it"""
+        segment = self.segments[segment_id]
+        live = [(key, e) for key, e in self.index.items() if e.segment_id == segment_id]
+
+        self._compacting = segment_id
+        try:
+            with open(segment.path, 'rb') as f:
+                for key, entry in live:
+                    f.seek(entry.offset)
+                    self._append(key, f.read(entry.length), entry.created)
+        finally:
+            self._compacting = None
+
+        self._delete_segment(segment_id)
+        self.compactions += 1
+
+    def compact(self):
+        """Compact every sealed segment below the live-ratio threshold"""
+        with self.lock:
+            for segment_id in sorted(self.segments):
+                self._maybe_compact(segment_id)
+            self._flush_index()
+
+    def _delete_segment(self, segment_id: int):
+        segment = self.segments.pop(segment_id)
+        segment.release()
+        try:
+            os.remove(segment.path)
+        except OSError as e:
+            # e.g. still mapped on Windows; a later rebuild overrides its records
+            logging.debug(f"Could not remove disk cache segment {segment.path}: {e}")
+
+    def clear(self):
+        """Remove all cached entries and segment files"""
+        with self.lock:
+            self._active_file.close()
+            self._active_file = None
+            for segment_id in list(self.segments):
+                self._delete_segment(segment_id)
+            self.index.clear()
+            self._roll_segment()
+            self._flush_index()
+
+    def close(self):
+        """Flush the index and close the active segment"""
+        with self.lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+            self._flush_index()
+
+    def stats(self) -> Dict:
+        """Get cache statistics"""
+        with self.lock:
+            total_requests = self.hits + self.misses
+            total_bytes = self.total_bytes()
+            live_bytes = sum(seg.live_bytes for seg in self.segments.values())
+            return {
+                'directory': self.directory,
+                'entries': len(self.index),
+                'segments': len(self.segments),
+                'bytes': total_bytes,
+                'live_bytes': live_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total_requests if total_requests else 0.0,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'compactions': self.compactions,
+                'index_rebuilds': self.rebuilds
+            }
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Streaming DSP
+Block-wise, stateful processing stages for 16-bit mono speech: polyphase
+resampling, WSOLA time-stretching, pitch shifting and a dynamic range
+compressor with attack and release
+"""
+
+import math
+from fractions import Fraction
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Rate the bundled engines render at, and the default output rate
+DEFAULT_SAMPLE_RATE = 22050
+
+# Pitch factors are approximated by fractions with at most this denominator,
+# which bounds the resampler's polyphase filter bank
+PITCH_MAX_DENOMINATOR = 32
+
+_EMPTY = np.zeros(0, dtype=np.float32)
+
+
+class DSPStage:
+    """One stateful processing stage over float32 samples (int16 scale)
+
+    ``process`` may be called with arbitrarily sized blocks; whatever a
+    stage needs to continue seamlessly (filter history, overlap tails,
+    envelope) is carried to the next call, so output does not depend on how
+    the input was split. Call ``flush`` once at the end of the stream to
+    get any samples still held back.
+    """
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        return samples
+
+    def flush(self) -> np.ndarray:
+        return _EMPTY
+
+
+# ----------------------------------------------------------------------
+# Polyphase resampling
+# ----------------------------------------------------------------------
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int, taps_per_phase: int) -> np.ndarray:
+    """Kaiser-windowed sinc low-pass split into ``up`` phases of ``taps_per_phase`` taps
+
+    Row ``p`` holds taps ``p, p + up, p + 2*up, ...`` of the prototype,
+    which runs at ``up`` times the input rate and cuts off just below the
+    lower of the input and output Nyquist frequencies.
+    """
+    length = up * taps_per_phase
+    cutoff = 0.5 / max(up, down) * 0.94  # cycles per upsampled sample
+    m = np.arange(length) - (length - 1) / 2
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * m) * np.kaiser(length, 8.0) * up
+    phases = prototype.reshape(taps_per_phase, up).T.astype(np.float32)
+    phases.flags.writeable = False
+    return phases
+
+
+class PolyphaseResampler(DSPStage):
+    """Rational-ratio resampler (``up / down``) with a polyphase FIR
+
+    Each output sample is a dot product of the last ``taps_per_phase``
+    input samples with one filter phase, computed in vectorized batches.
+    The filter delay is compensated, so output sample ``n`` is aligned with
+    input time ``n * down / up``, and the total output length is
+    ``ceil(len(input) * up / down)``.
+    """
+
+    BATCH = 8192  # outputs computed per vectorized step
+
+    def __init__(self, up: int, down: int, taps: int = 16):
+        divisor = math.gcd(up, down)
+        self.up = up // divisor
+        self.down = down // divisor
+        # Widen the filter when decimating so the transition band keeps its width
+        self.taps_per_phase = int(math.ceil(taps * max(1.0, self.down / self.up)))
+        self.phases = _polyphase_filter(self.up, self.down, self.taps_per_phase)
+        self.delay = (self.up * self.taps_per_phase - 1) // 2  # in upsampled samples
+
+        # Input history, starting at global input index ``self._start``
+        self._buffer = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._start = -(self.taps_per_phase - 1)
+        self._received = 0
+        self._next_output = 0
+
+    @classmethod
+    def for_rates(cls, input_rate: int, output_rate: int, taps: int = 16) -> 'PolyphaseResampler':
+        return cls(output_rate, input_rate, taps)
+
+    def _produce(self, end: int) -> np.ndarray:
+        """Outputs ``self._next_output`` up to (not including) ``end``"""
+        if end <= self._next_output:
+            return _EMPTY
+        taps = np.arange(self.taps_per_phase)
+        pieces = []
+        for first in range(self._next_output, end, self.BATCH):
+            n = np.arange(first, min(first + self.BATCH, end), dtype=np.int64)
+            position = n * self.down + self.delay
+            newest = position // self.up - self._start
+            window = self._buffer[newest[:, None] - taps[None, :]]
+            pieces.append(np.einsum('ij,ij->i', window, self.phases[position % self.up]))
+        self._next_output = end
+
+        # Drop input no later output can reach
+        keep_from = (self._next_output * self.down + self.delay) // self.up - (self.taps_per_phase - 1)
+        if keep_from > self._start:
+            self._buffer = self._buffer[keep_from - self._start:]
+            self._start = keep_from
+        return np.concatenate(pieces) if len(pieces) > 1 else pieces[0]
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if len(samples):
+            self._buffer = np.concatenate((self._buffer, samples.astype(np.float32, copy=False)))
+            self._received += len(samples)
+        # Output n needs input up to (n * down + delay) // up
+        end = -(-(self._received * self.up - self.delay) // self.down)
+        return self._produce(max(end, self._next_output))
+
+    def flush(self) -> np.ndarray:
+        # Zero-pad past the end so the filter tail of the last inputs is emitted
+        self._buffer = np.concatenate((self._buffer, np.zeros(self.taps_per_phase, dtype=np.float32)))
+        return self._produce(-(-self._received * self.up // self.down))
+
+
+def resample(samples: np.ndarray, input_rate: int, output_rate: int) -> np.ndarray:
+    """Resample a whole signal; returns float32"""
+    if input_rate == output_rate:
+        return samples.astype(np.float32)
+    resampler = PolyphaseResampler.for_rates(input_rate, output_rate)
+    return np.concatenate((resampler.process(samples), resampler.flush()))
+
+
+# ----------------------------------------------------------------------
+# Time-stretching
+# ----------------------------------------------------------------------
+
+class TimeStretcher(DSPStage):
+    """WSOLA time-scale modification: change duration, keep pitch
+
+    Frames of ``frame_ms`` are overlap-added with a Hann window every half
+    frame of output while the read position advances ``speed`` times as
+    fast; each frame is shifted by up to ``tolerance_ms`` to the offset
+    best correlated with the natural continuation of the previous frame,
+    so pitch periods line up across joins. ``speed`` > 1 is faster speech.
+    """
+
+    def __init__(self, speed: float, sample_rate: int, frame_ms: float = 30.0, tolerance_ms: float = 10.0):
+        self.speed = speed
+        self.hop = max(int(sample_rate * frame_ms / 2000), 8)  # output hop: half a frame
+        self.frame = 2 * self.hop
+        self.analysis_hop = self.hop * speed
+        self.tolerance = int(sample_rate * tolerance_ms / 1000)
+
+        # Periodic Hann windows sum to one at half-frame overlap; the first
+        # frame has nothing to overlap on its leading half, so it rises instantly
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame) / self.frame)).astype(np.float32)
+        self.first_window = self.window.copy()
+        self.first_window[:self.hop] = 1.0
+
+        self._buffer = _EMPTY  # input, starting at global index ``self._start``
+        self._start = 0
+        self._received = 0
+        self._frame_index = 0
+        self._previous = 0  # input position of the last frame
+        self._overlap = np.zeros(self.frame, dtype=np.float32)
+        self._emitted = 0
+
+    def _run(self, final: bool) -> np.ndarray:
+        output = []
+        available = self._start + len(self._buffer)
+        while True:
+            nominal = int(round(self._frame_index * self.analysis_hop))
+            if final and nominal >= self._received:
+                break
+            if self._frame_index == 0:
+                if self.frame > available:
+                    break
+                position = 0
+                window = self.first_window
+            else:
+                continuation = self._previous + self.hop
+                if max(nominal + self.tolerance, continuation) + self.frame > available:
+                    break
+                template = self._buffer[continuation - self._start:continuation - self._start + self.frame]
+                low = max(nominal - self.tolerance, self._start)
+                region = self._buffer[low - self._start:nominal + self.tolerance + self.frame - self._start]
+                position = low + int(np.argmax(np.correlate(region, template, 'valid')))
+                window = self.window
+
+            offset = position - self._start
+            self._overlap += self._buffer[offset:offset + self.frame] * window
+            output.append(self._overlap[:self.hop].copy())
+            self._overlap[:self.hop] = self._overlap[self.hop:]
+            self._overlap[self.hop:] = 0.0
+            self._previous = position
+            self._frame_index += 1
+
+        # Keep what the next frame's search and continuation can still read
+        nominal = int(round(self._frame_index * self.analysis_hop))
+        keep_from = min(max(nominal - self.tolerance, 0), self._previous + self.hop) if self._frame_index else 0
+        if keep_from > self._start:
+            self._buffer = self._buffer[keep_from - self._start:]
+            self._start = keep_from
+
+        result = np.concatenate(output) if output else _EMPTY
+        self._emitted += len(result)
+        return result
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if len(samples):
+            self._buffer = np.concatenate((self._buffer, samples.astype(np.float32, copy=False)))
+            self._received += len(samples)
+        return self._run(final=False)
+
+    def flush(self) -> np.ndarray:
+        padding = self.frame + self.tolerance + int(math.ceil(self.analysis_hop))
+        self._buffer = np.concatenate((self._buffer, np.zeros(padding, dtype=np.float32)))
+        emitted = self._emitted
+        tail = np.concatenate((self._run(final=True), self._overlap[:self.hop]))
+
+        # Trim (or pad) to the exact stretched length
+        remaining = int(round(self._received / self.speed)) - emitted
+        self._emitted = emitted + max(remaining, 0)
+        if remaining <= len(tail):
+            return tail[:max(remaining, 0)]
+        return np.concatenate((tail, np.zeros(remaining - len(tail), dtype=np.float32)))
+
+
+# ----------------------------------------------------------------------
+# Dynamics
+# ----------------------------------------------------------------------
+
+class Compressor(DSPStage):
+    """Feed-forward peak compressor with attack and release
+
+    The gain is computed at a control rate of one value per ``control_ms``
+    from the block peak, smoothed with separate attack (gain falling) and
+    release (gain rising) time constants, and interpolated linearly
+    between control points, so gain changes are click-free. Control periods
+    run on a grid from the start of the stream: the samples of a period not
+    yet complete are held back until the next call (or ``flush``), and the
+    smoothed gain carries across calls.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        threshold_db: float = -20.0,
+        ratio: float = 4.0,
+        attack_ms: float = 5.0,
+        release_ms: float = 80.0,
+        makeup_db: float = 0.0,
+        control_ms: float = 1.0
+    ):
+        self.threshold_db = threshold_db
+        self.slope = 1.0 - 1.0 / ratio
+        self.attack_samples = max(sample_rate * attack_ms / 1000, 1e-6)
+        self.release_samples = max(sample_rate * release_ms / 1000, 1e-6)
+        self.makeup_db = makeup_db
+        self.control = max(int(sample_rate * control_ms / 1000), 1)
+        self._gain_db = 0.0
+        self._pending = _EMPTY  # the unfinished control period
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = samples.astype(np.float32, copy=False)
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        complete = len(samples) - len(samples) % self.control
+        self._pending = samples[complete:].copy()
+        return self._apply(samples[:complete])
+
+    def flush(self) -> np.ndarray:
+        pending, self._pending = self._pending, _EMPTY
+        return self._apply(pending)
+
+    def _apply(self, samples: np.ndarray) -> np.ndarray:
+        if not len(samples):
+            return _EMPTY
+        # Control points at the end of each period; only a flushed one is partial
+        ends = np.append(np.arange(self.control, len(samples), self.control), len(samples))
+        starts = np.concatenate(([0], ends[:-1]))
+        peaks = np.maximum.reduceat(np.abs(samples), starts)
+        level_db = 20 * np.log10(np.maximum(peaks, 1.0) / 32768.0)
+        target_db = np.minimum(0.0, (self.threshold_db - level_db) * self.slope)
+
+        lengths = (ends - starts).tolist()
+        gains = np.empty(len(ends))
+        gain = self._gain_db
+        for i, target in enumerate(target_db.tolist()):
+            constant = self.attack_samples if target < gain else self.release_samples
+            coefficient = math.exp(-lengths[i] / constant)
+            gain = coefficient * gain + (1 - coefficient) * target
+            gains[i] = gain
+
+        gain_curve = np.interp(
+            np.arange(1, len(samples) + 1),
+            np.concatenate(([0], ends)),
+            np.concatenate(([self._gain_db], gains))
+        )
+        self._gain_db = gain
+        return (samples * np.power(10.0, (gain_curve + self.makeup_db) / 20)).astype(np.float32)
+
+
+# ----------------------------------------------------------------------
+# Chains
+# ----------------------------------------------------------------------
+
+class DSPChain:
+    """Stages applied in order to one PCM16 stream, segment by segment"""
+
+    def __init__(self, stages: List[DSPStage], input_rate: int, output_rate: int):
+        self.stages = stages
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+
+    @classmethod
+    def build(
+        cls,
+        input_rate: int,
+        output_rate: int,
+        rate: float = 1.0,
+        pitch: float = 1.0,
+        compressor: Optional[dict] = None
+    ) -> Optional['DSPChain']:
+        """Chain for a stream's settings, or None when there is nothing to do
+
+        ``compressor`` holds ``Compressor`` settings (an empty dict for the
+        defaults). Pitch shifting is a time-stretch by ``rate / pitch``
+        followed by resampling by ``1 / pitch``; that resampling is folded
+        into the output rate conversion, so rate, pitch and output rate take
+        one stretcher and one resampler at most.
+        """
+        stages: List[DSPStage] = []
+        if compressor is not None:
+            stages.append(Compressor(input_rate, **compressor))
+
+        pitch_ratio = Fraction(pitch).limit_denominator(PITCH_MAX_DENOMINATOR)
+        speed = rate / float(pitch_ratio)
+        if abs(speed - 1.0) > 1e-3:
+            stages.append(TimeStretcher(speed, input_rate))
+
+        ratio = Fraction(output_rate, input_rate) / pitch_ratio
+        if ratio != 1:
+            stages.append(PolyphaseResampler(ratio.numerator, ratio.denominator))
+
+        return cls(stages, input_rate, output_rate) if stages else None
+
+    @staticmethod
+    def _to_pcm16(samples: np.ndarray) -> bytes:
+        return np.clip(np.round(samples), -32768, 32767).astype('<i2').tobytes()
+
+    def process(self, pcm: bytes, final: bool = False) -> bytes:
+        """Process one PCM16 block; ``final`` also flushes every stage"""
+        samples = np.frombuffer(pcm, dtype='<i2', count=len(pcm) // 2).astype(np.float32)
+        for stage in self.stages:
+            samples = stage.process(samples)
+            if final:
+                samples = np.concatenate((samples, stage.flush()))
+        return self._to_pcm16(samples)
+
+    def describe(self) -> Tuple[str, ...]:
+        return tuple(type(stage).__name__ for stage in self.stages)
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+TTS engine execution layer
+Runs blocking engine calls in worker pools so the event loop stays responsive
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tts_metrics import Trace, current_trace
+
+
+def _run_timed(fn: Callable, args: Tuple) -> Tuple[Any, float, float]:
+    """Worker-side wrapper recording when the call actually started and ended"""
+    started_at = time.time()
+    result = fn(*args)
+    return result, started_at, time.time()
+
+
+class EngineExecutor:
+    """Run one engine's blocking calls in a dedicated worker pool
+
+    The pool size is the engine's concurrency limit; extra calls queue inside
+    the pool. ``kind`` selects a thread pool (engines that release the GIL or
+    wrap native libraries, e.g. pyttsx3 or Torch) or a process pool (pure
+    Python engines). Functions submitted to a process pool must be picklable
+    module-level callables. ``initializer(*initargs)`` runs once in every
+    pool thread or process, e.g. to set up per-process model state. Queue
+    wait and run time are added to the calling task's trace as
+    ``engine_queue_wait`` and ``synthesis``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 1,
+        kind: str = 'thread',
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = ()
+    ):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.name = name
+        self.kind = kind
+        self.max_concurrency = max_concurrency
+        self.pool: Executor = (
+            ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"tts-{name}",
+                               initializer=initializer, initargs=initargs)
+            if kind == 'thread'
+            else ProcessPoolExecutor(max_workers=max_concurrency, initializer=initializer, initargs=initargs)
+        )
+        self.lock = threading.Lock()
+
+        # Counters
+        self.pending = 0  # submitted and not yet finished (queued + running)
+        self.max_pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run ``fn(*args)`` in the pool and await its result
+
+        A call whose caller is cancelled keeps its slot until the pool has
+        actually finished (or dropped) it, so the load figures count every
+        busy worker.
+        """
+        submitted_at = time.time()
+
+        with self.lock:
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+
+        future = self.pool.submit(_run_timed, fn, args)
+        future.add_done_callback(self._call_done)
+        result, started_at, finished_at = await asyncio.wrap_future(future)
+
+        queue_wait = max(started_at - submitted_at, 0.0)
+        with self.lock:
+            self.completed += 1
+            self.total_queue_wait += queue_wait
+            self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add('engine_queue_wait', queue_wait)
+            trace.add('synthesis', max(finished_at - started_at, 0.0))
+
+        return result
+
+    def _call_done(self, future: Future):
+        # Runs in a pool thread (or the process pool's manager thread)
+        with self.lock:
+            self.pending -= 1
+            if not future.cancelled() and future.exception() is not None:
+                self.failed += 1
+
+    def stats(self) -> Dict:
+        """Get executor statistics"""
+        with self.lock:
+            return {
+                'kind': self.kind,
+                'max_concurrency': self.max_concurrency,
+                'queue_depth': max(self.pending - self.max_concurrency, 0),
+                'in_progress': min(self.pending, self.max_concurrency),
+                'max_queue_depth': max(self.max_pending - self.max_concurrency, 0),
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_queue_wait_ms': self.total_queue_wait / self.completed * 1000 if self.completed else 0.0,
+                'max_queue_wait_ms': self.max_queue_wait * 1000
+            }
+
+    def shutdown(self, wait: bool = False):
+        self.pool.shutdown(wait=wait)
+
+
+class MicroBatcher:
+    """Dynamic micro-batching in front of a model-backed engine
+
+    Requests are queued and dispatched as one ``batch_fn(items)`` call when
+    ``max_batch_size`` requests are waiting or the oldest has waited
+    ``max_wait_ms``. At most ``executor.max_concurrency`` batches run at
+    once, so under load requests keep accumulating while the engine is busy
+    and batches grow; at low load a request waits at most ``max_wait_ms``.
+    ``batch_fn`` receives a list of argument tuples and must return one
+    result per item, in order. Results and errors are fanned back out to the
+    individual callers; callers that were cancelled are dropped from the
+    batch before it runs. Each caller's trace gets its own batching wait plus
+    the batch's engine queue wait and synthesis time.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Tuple]], List[Any]],
+        executor: EngineExecutor,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        # (args, future, enqueued_at, trace)
+        self._pending: deque = deque()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # Counters
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes: Counter = Counter()
+        self.recent_waits: deque = deque(maxlen=1000)
+        self.max_queue_wait = 0.0
+
+    async def submit(self, *args) -> Any:
+        """Queue one request and await its individual result"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((args, future, time.time(), current_trace.get()))
+        self._dispatch()
+        return await future
+
+    def _dispatch(self):
+        """Start every batch that is due and that the engine has capacity for"""
+        now = time.time()
+        while self._pending and self._in_flight < self.executor.max_concurrency:
+            # Drop requests whose callers have gone away
+            while self._pending and self._pending[0][1].done():
+                self._pending.popleft()
+            if not self._pending:
+                break
+
+            oldest_wait_ms = (now - self._pending[0][2]) * 1000
+            if len(self._pending) < self.max_batch_size and oldest_wait_ms < self.max_wait_ms:
+                break
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                entry = self._pending.popleft()
+                if not entry[1].done():
+                    batch.append(entry)
+            if batch:
+                self._in_flight += 1
+                asyncio.ensure_future(self._run_batch(batch))
+
+        self._arm_timer()
+
+    def _arm_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending and self._in_flight < self.executor.max_concurrency:
+            delay = self.max_wait_ms / 1000 - (time.time() - self._pending[0][2])
+            self._timer = asyncio.get_running_loop().call_later(max(delay, 0.0), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    async def _run_batch(self, batch: List[Tuple]):
+        # This task inherited the context of whichever caller triggered the
+        # dispatch; collect the batch's timings separately and hand them to
+        # every caller's trace below
+        batch_trace = Trace(f"{self.name}-batch")
+        current_trace.set(batch_trace)
+
+        started_at = time.time()
+        for _, _, enqueued_at, _ in batch:
+            wait = started_at - enqueued_at
+            self.recent_waits.append(wait)
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_sizes[len(batch)] += 1
+
+        try:
+            results = await self.executor.run(self.batch_fn, [args for args, _, _, _ in batch])
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            for _, _, enqueued_at, trace in batch:
+                if trace is not None:
+                    trace.add('engine_queue_wait', started_at - enqueued_at)
+                    trace.merge(batch_trace)
+            self._in_flight -= 1
+            self._dispatch()
+
+    def stats(self) -> Dict:
+        """Get batching statistics"""
+        waits_ms = np.array(self.recent_waits) * 1000
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'queued': len(self._pending),
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+            'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            'avg_queue_wait_ms': float(waits_ms.mean()) if len(waits_ms) else 0.0,
+            'p95_queue_wait_ms': float(np.percentile(waits_ms, 95)) if len(waits_ms) else 0.0,
+            'max_queue_wait_ms': self.max_queue_wait * 1000
+        }
+
+
+@dataclass(frozen=True)
+class RequestQoS:
+    """Scheduling class of a request
+
+    Higher ``priority`` is served first. ``deadline`` is a
+    ``time.monotonic()`` instant by which the engine call must finish, or
+    None for no deadline.
+    """
+    priority: int = 0
+    deadline: Optional[float] = None
+
+
+class SharedQoS:
+    """Scheduling class of work shared by several requests (a coalesced render)
+
+    Starts as the first request's. Each request that joins raises it to the
+    highest priority among them, and to the latest of their deadlines (None
+    once any has none): the shared work is still wanted until every
+    request's deadline has passed. Work waiting in an ``AdmissionController``
+    queue moves up when its priority rises.
+    """
+
+    def __init__(self, qos: RequestQoS):
+        self.priority = qos.priority
+        self.deadline = qos.deadline
+        self._requeue: Optional[Callable[[], None]] = None
+
+    def join(self, qos: RequestQoS) -> bool:
+        """Add a request's QoS; returns True if the shared QoS was raised"""
+        priority = max(self.priority, qos.priority)
+        deadline = None if self.deadline is None or qos.deadline is None else max(self.deadline, qos.deadline)
+        if priority == self.priority and deadline == self.deadline:
+            return False
+        self.priority, self.deadline = priority, deadline
+        if self._requeue is not None:
+            self._requeue()
+        return True
+
+
+# QoS of the request (or shared work) the current task is rendering for; set
+# per render task like ``current_trace``
+current_qos: ContextVar[RequestQoS] = ContextVar('current_qos', default=RequestQoS())
+
+
+class RequestRejected(RuntimeError):
+    """Raised when a request is shed instead of served
+
+    ``reason`` is ``'queue_full'``, ``'deadline'`` (predicted to miss its
+    deadline at arrival), ``'expired'`` (deadline passed while queued) or
+    ``'unavailable'`` (no engine fit to serve it, see ``tts_routing``).
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Priority admission queue with deadline-based load shedding for one engine
+
+    At most ``max_concurrency`` calls run at once; the rest wait in a
+    priority queue of at most ``max_queue`` entries (FIFO within a
+    priority). A request is rejected up front when the queue is full or when
+    its predicted completion - queue position over concurrency, times the
+    moving average service time - lies beyond its deadline, and dropped if
+    its deadline passes while it waits, instead of occupying the engine for
+    an answer nobody will use. Waiting work with a ``SharedQoS`` is
+    re-queued when its QoS is raised.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int = 256, ewma_alpha: float = 0.2):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.ewma_alpha = ewma_alpha
+        self.service_ewma: Optional[float] = None  # seconds per call
+
+        # (-priority, seq, deadline, future, enqueued_at); an entry is live
+        # while its seq is its future's latest (re-queueing leaves stale ones)
+        self._heap: List[Tuple] = []
+        self._entries: Dict[asyncio.Future, int] = {}
+        self._seq = itertools.count()
+        self.in_flight = 0
+        self.queued = 0
+
+        # Counters
+        self.admitted = 0
+        self.max_queue_depth = 0
+        self.shed: Counter = Counter()
+        self.recent_waits: deque = deque(maxlen=1000)
+
+    def predicted_wait(self, priority: int = 0) -> float:
+        """Expected queueing delay for a new request of ``priority``"""
+        free = self.max_concurrency - self.in_flight
+        ahead = sum(1 for entry in self._heap if -entry[0] >= priority and self._entries.get(entry[3]) == entry[1])
+        if free > ahead or not self.service_ewma:
+            return 0.0
+        return (ahead - free + 1) / self.max_concurrency * self.service_ewma
+
+    def predicted_latency(self, priority: int = 0) -> float:
+        """Expected queueing delay plus service time"""
+        return self.predicted_wait(priority) + (self.service_ewma or 0.0)
+
+    def _reject(self, reason: str, message: str):
+        self.shed[reason] += 1
+        raise RequestRejected(reason, f"{self.name}: {message}")
+
+    async def acquire(
+        self,
+        priority: int = 0,
+        deadline: Optional[float] = None,
+        shared: Optional[SharedQoS] = None
+    ) -> float:
+        """Wait for an engine slot; returns the time spent queued in seconds
+
+        With ``shared``, a wait is re-queued at the shared QoS whenever it
+        is raised.
+        """
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            self._reject('expired', "deadline already passed")
+
+        if self.in_flight < self.max_concurrency and not self.queued:
+            self.in_flight += 1
+            self.admitted += 1
+            self.recent_waits.append(0.0)
+            return 0.0
+
+        if self.queued >= self.max_queue:
+            self._reject('queue_full', f"admission queue full ({self.max_queue})")
+        if deadline is not None and now + self.predicted_latency(priority) > deadline:
+            self._reject(
+                'deadline',
+                f"predicted latency {self.predicted_latency(priority) * 1000:.0f}ms "
+                f"exceeds deadline in {(deadline - now) * 1000:.0f}ms"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._push(future, priority, deadline, now)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        if shared is not None:
+            shared._requeue = lambda: self._push(future, shared.priority, shared.deadline, now)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as the caller went away
+                self.release()
+            else:
+                future.cancel()
+                self._entries.pop(future, None)
+                self.queued -= 1
+            raise
+        finally:
+            if shared is not None:
+                shared._requeue = None
+
+        wait = time.monotonic() - now
+        self.recent_waits.append(wait)
+        return wait
+
+    def _push(self, future: asyncio.Future, priority: int, deadline: Optional[float], enqueued_at: float):
+        if future.done():
+            return
+        seq = next(self._seq)
+        self._entries[future] = seq
+        heapq.heappush(self._heap, (-priority, seq, deadline, future, enqueued_at))
+
+    def release(self, service_time: Optional[float] = None):
+        """Free a slot; ``service_time`` of a successful call updates the estimate"""
+        if service_time is not None:
+            self.service_ewma = (
+                service_time if self.service_ewma is None
+                else self.ewma_alpha * service_time + (1 - self.ewma_alpha) * self.service_ewma
+            )
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        now = time.monotonic()
+        while self._heap and self.in_flight < self.max_concurrency:
+            _, seq, deadline, future, _ = heapq.heappop(self._heap)
+            if future.done() or self._entries.get(future) != seq:
+                continue  # cancelled waiter (already uncounted) or re-queued
+            del self._entries[future]
+            self.queued -= 1
+            if deadline is not None and now >= deadline:
+                self.shed['expired'] += 1
+                future.set_exception(RequestRejected('expired', f"{self.name}: deadline passed while queued"))
+                continue
+            self.in_flight += 1
+            self.admitted += 1
+            future.set_result(None)
+
+    def stats(self) -> Dict:
+        """Get admission statistics"""
+        waits_ms = np.array(self.recent_waits) * 1000
+        p50, p95, p99 = np.percentile(waits_ms, [50, 95, 99]) if len(waits_ms) else (0.0, 0.0, 0.0)
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queued,
+            'max_queue_depth': self.max_queue_depth,
+            'admitted': self.admitted,
+            'shed': dict(self.shed),
+            'shed_total': sum(self.shed.values()),
+            'p50_queue_wait_ms': float(p50),
+            'p95_queue_wait_ms': float(p95),
+            'p99_queue_wait_ms': float(p99),
+            'service_ewma_ms': (self.service_ewma or 0.0) * 1000,
+            'predicted_wait_ms': self.predicted_wait() * 1000
+        }
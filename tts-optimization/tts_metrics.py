@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Streaming metric primitives
+Fixed-memory quantile sketches, per-request stage tracing and a
+background process resource sampler
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class WindowedQuantileSketch:
+    """Relative-error quantile sketch over a sliding time window
+
+    Values are counted in logarithmic buckets (as in DDSketch): bucket ``i``
+    covers ``(gamma^(i-1), gamma^i]`` with ``gamma = (1 + a) / (1 - a)``, so
+    any reported quantile is within relative error ``a`` of a true sample.
+    Counts are kept per time slice in a fixed ``(num_slices, buckets)``
+    array; a slice is reset when the ring wraps around to it. Recording is
+    O(1) and a windowed query sums at most ``num_slices`` rows, regardless
+    of request rate. Windows are resolved to whole slices.
+
+    Sketches with the same configuration merge by adding their counts, which
+    is how per-engine and per-cache-outcome series are combined.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        min_value: float = 0.01,
+        max_value: float = 1e7,
+        slice_seconds: float = 60.0,
+        num_slices: int = 60
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        self.num_buckets = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+        self.slice_seconds = slice_seconds
+        self.num_slices = num_slices
+
+        self.counts = np.zeros((num_slices, self.num_buckets), dtype=np.int64)
+        self.slice_ids = np.full(num_slices, -1, dtype=np.int64)
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        index = math.ceil(math.log(value) / self._log_gamma) - self._offset
+        return min(index, self.num_buckets - 1)
+
+    def add(self, value: float, timestamp: Optional[float] = None):
+        """Record one value"""
+        slice_id = int((timestamp if timestamp is not None else time.time()) // self.slice_seconds)
+        row = slice_id % self.num_slices
+        if self.slice_ids[row] != slice_id:
+            if slice_id < self.slice_ids[row]:
+                return  # older than the retained window
+            self.counts[row] = 0
+            self.slice_ids[row] = slice_id
+        self.counts[row, self._bucket(value)] += 1
+
+    def window_counts(self, window_seconds: float, now: Optional[float] = None) -> np.ndarray:
+        """Bucket counts merged over the slices inside the window"""
+        now = now if now is not None else time.time()
+        newest = int(now // self.slice_seconds)
+        oldest = int((now - window_seconds) // self.slice_seconds)
+        rows = (self.slice_ids >= oldest) & (self.slice_ids <= newest)
+        return self.counts[rows].sum(axis=0)
+
+    def bucket_value(self, index: np.ndarray) -> np.ndarray:
+        """Representative value of a bucket (relative error <= accuracy)"""
+        upper = self.gamma ** (np.asarray(index) + self._offset)
+        return 2 * upper / (self.gamma + 1)
+
+    def quantiles_from_counts(self, counts: np.ndarray, quantiles: Iterable[float]) -> List[float]:
+        """Quantile estimates from (possibly merged) bucket counts"""
+        quantiles = list(quantiles)
+        total = int(counts.sum())
+        if total == 0:
+            return [0.0] * len(quantiles)
+        cumulative = np.cumsum(counts)
+        ranks = np.array([q * (total - 1) for q in quantiles])
+        indexes = np.searchsorted(cumulative, ranks, side='right')
+        return [float(v) for v in self.bucket_value(indexes)]
+
+    def quantiles(self, quantiles: Iterable[float], window_seconds: float, now: Optional[float] = None) -> List[float]:
+        return self.quantiles_from_counts(self.window_counts(window_seconds, now), quantiles)
+
+
+class SketchFamily:
+    """A set of identically configured sketches keyed by labels"""
+
+    def __init__(self, **sketch_kwargs):
+        self.sketch_kwargs = sketch_kwargs
+        self.series: Dict[tuple, WindowedQuantileSketch] = {}
+        self._template = WindowedQuantileSketch(**sketch_kwargs)
+
+    def add(self, labels: tuple, value: float, timestamp: Optional[float] = None):
+        sketch = self.series.get(labels)
+        if sketch is None:
+            sketch = self.series[labels] = WindowedQuantileSketch(**self.sketch_kwargs)
+        sketch.add(value, timestamp)
+
+    def window_counts(self, window_seconds: float, now: Optional[float] = None, match=None) -> np.ndarray:
+        """Merged counts of every series whose labels satisfy ``match``"""
+        counts = np.zeros(self._template.num_buckets, dtype=np.int64)
+        for labels, sketch in self.series.items():
+            if match is None or match(labels):
+                counts += sketch.window_counts(window_seconds, now)
+        return counts
+
+    def quantiles_from_counts(self, counts: np.ndarray, quantiles: Iterable[float]) -> List[float]:
+        return self._template.quantiles_from_counts(counts, quantiles)
+
+
+# ----------------------------------------------------------------------
+# Per-request stage tracing
+# ----------------------------------------------------------------------
+
+# The trace of the request the current task is working for. Set inside the
+# per-segment render tasks, so it never leaks into the consumer's context.
+current_trace: ContextVar[Optional['Trace']] = ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """Stage timings of one request
+
+    Stages accumulate, so a stage that runs once per segment (synthesis,
+    compression, ...) reports its total time across the request. Counters
+    record per-request event counts (e.g. fragment cache hits).
+    """
+
+    __slots__ = ('request_id', 'started_at', 'stages', 'counters', 'attributes')
+
+    def __init__(self, request_id: str, **attributes):
+        self.request_id = request_id
+        self.started_at = time.time()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.attributes = attributes
+
+    def add(self, stage: str, seconds: float):
+        """Add ``seconds`` to a stage"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds * 1000
+
+    def incr(self, counter: str, n: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def merge(self, other: 'Trace'):
+        """Add another trace's stage timings to this one"""
+        for stage, ms in other.stages.items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage ``name``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def to_dict(self) -> Dict:
+        return {
+            'request_id': self.request_id,
+            'timestamp': self.started_at,
+            **self.attributes,
+            'stages_ms': dict(self.stages),
+            'counters': dict(self.counters)
+        }
+
+
+class LogSink:
+    """Write finished traces to the log"""
+
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+
+    def emit(self, record: Dict):
+        stages = ', '.join(f"{name}={ms:.1f}ms" for name, ms in record['stages_ms'].items())
+        logging.log(self.level, f"Trace {record['request_id']}: {stages}")
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """Append finished traces to a JSON lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self._file = open(path, 'a')
+
+    def emit(self, record: Dict):
+        line = json.dumps(record)
+        with self.lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self.lock:
+            self._file.close()
+
+
+class InMemorySink:
+    """Keep the most recent finished traces"""
+
+    def __init__(self, maxlen: int = 1000):
+        self.records: deque = deque(maxlen=maxlen)
+
+    def emit(self, record: Dict):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class Tracer:
+    """Create traces, fan them out to sinks and keep per-stage quantiles"""
+
+    STAGE_QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, sinks: Optional[List] = None, max_window_minutes: int = 60):
+        self.sinks = list(sinks or [])
+        self.stage_sketches = SketchFamily(slice_seconds=60.0, num_slices=max_window_minutes + 1)
+
+    def start(self, request_id: str, **attributes) -> Trace:
+        return Trace(request_id, **attributes)
+
+    def finish(self, trace: Trace):
+        now = time.time()
+        for stage, ms in trace.stages.items():
+            self.stage_sketches.add((stage,), ms, now)
+
+        if self.sinks:
+            record = trace.to_dict()
+            for sink in self.sinks:
+                try:
+                    sink.emit(record)
+                except Exception as e:
+                    logging.warning(f"Trace sink {type(sink).__name__} failed: {e}")
+
+    def stage_stats(self, window_minutes: int = 10) -> Dict:
+        """Per-stage count and latency quantiles over the window"""
+        stats = {}
+        for (stage,), sketch in self.stage_sketches.series.items():
+            counts = sketch.window_counts(window_minutes * 60)
+            if not counts.sum():
+                continue
+            p50, p95, p99 = sketch.quantiles_from_counts(counts, self.STAGE_QUANTILES)
+            stats[stage] = {'count': int(counts.sum()), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+        return stats
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+# ----------------------------------------------------------------------
+# Process resource sampling
+# ----------------------------------------------------------------------
+
+class ResourceSampler:
+    """Sample process CPU and RSS on a background thread at a fixed interval
+
+    Replaces per-request ``psutil`` calls on the hot path; requests read the
+    latest sample instead.
+    """
+
+    def __init__(self, interval: float = 1.0, history: int = 600):
+        import psutil
+        self.process = psutil.Process()
+        self.interval = interval
+        self.samples: deque = deque(maxlen=history)  # (timestamp, cpu_percent, rss_mb)
+        self.cpu_percent = 0.0
+        self.rss_mb = self.process.memory_info().rss / 1024 / 1024
+        self.process.cpu_percent()  # prime the CPU counter
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='tts-resource-sampler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logging.debug(f"Resource sampling failed: {e}")
+
+    def sample(self):
+        """Take one sample now"""
+        self.cpu_percent = self.process.cpu_percent()
+        self.rss_mb = self.process.memory_info().rss / 1024 / 1024
+        self.samples.append((time.time(), self.cpu_percent, self.rss_mb))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def stats(self, window_minutes: int = 10) -> Dict:
+        cutoff = time.time() - window_minutes * 60
+        window = [s for s in list(self.samples) if s[0] >= cutoff]
+        if not window:
+            return {'cpu_percent': self.cpu_percent, 'rss_mb': self.rss_mb}
+        cpu = [s[1] for s in window]
+        rss = [s[2] for s in window]
+        return {
+            'cpu_percent': self.cpu_percent,
+            'rss_mb': self.rss_mb,
+            'avg_cpu_percent': sum(cpu) / len(cpu),
+            'max_cpu_percent': max(cpu),
+            'max_rss_mb': max(rss),
+            'sample_interval_s': self.interval
+        }
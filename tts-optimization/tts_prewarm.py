@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+TTS cache pre-warming
+Synthesizes a known phrase corpus ahead of traffic so first requests after a
+deploy are cache hits, without starving live requests of engine time
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Admission priority of pre-warm renders; live requests (priority 0 and up)
+# are always served first when an engine is saturated
+PREWARM_PRIORITY = -100
+
+
+@dataclass(frozen=True)
+class Phrase:
+    """One pre-warm entry; ``engine`` None means the streamer's default"""
+    text: str
+    voice: str = 'default'
+    rate: float = 1.0
+    pitch: float = 1.0
+    engine: Optional[str] = None
+
+
+def load_phrases(path: str) -> List[Phrase]:
+    """Read a phrase list
+
+    Each non-empty line is either a JSON object with ``text`` and optional
+    ``voice``, ``rate``, ``pitch`` and ``engine``, or plain text synthesized
+    with the defaults. Lines starting with ``#`` are comments.
+    """
+    phrases = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if not line.startswith('{'):
+                phrases.append(Phrase(line))
+                continue
+            try:
+                entry = json.loads(line)
+                phrases.append(Phrase(
+                    entry['text'],
+                    entry.get('voice', 'default'),
+                    float(entry.get('rate', 1.0)),
+                    float(entry.get('pitch', 1.0)),
+                    entry.get('engine')
+                ))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid phrase entry: {e}")
+    return phrases
+
+
+class _Throttle:
+    """Hold pre-warm dispatch while the streamer is over its CPU budget or
+    live requests are queued for an engine
+
+    A streamer is read directly; a ``WorkerPool`` is polled for its workers'
+    summed load, at most once per ``poll_interval``.
+    """
+
+    def __init__(self, streamer, cpu_budget: Optional[float], poll_interval: float):
+        self.streamer = streamer
+        self.sampler = getattr(streamer, 'resource_sampler', None)
+        self.admission = getattr(streamer, 'admission', {})
+        self.get_load = getattr(streamer, 'get_load', None)
+        # Budget is a fraction of all cores; psutil reports 100% per core
+        self.cpu_limit = cpu_budget * 100 * (os.cpu_count() or 1) if cpu_budget else None
+        self.poll_interval = poll_interval
+        self.throttled_time = 0.0
+        self._load: Optional[Dict] = None
+        self._load_at = 0.0
+        if self.get_load is None and not self.admission and self.sampler is None:
+            logging.warning(f"Pre-warm cannot see the load of {type(streamer).__name__}; it will not be throttled")
+
+    async def _current_load(self, engine: str) -> Tuple[int, Optional[float]]:
+        """Live requests queued for ``engine`` and CPU percent, if known"""
+        if self.get_load is not None:
+            now = time.monotonic()
+            if self._load is None or now - self._load_at >= self.poll_interval:
+                self._load, self._load_at = await self.get_load(), now
+            return self._load['queued'].get(engine, 0), self._load['cpu_percent']
+        controller = self.admission.get(engine)
+        return (
+            controller.queued if controller is not None else 0,
+            self.sampler.cpu_percent if self.sampler is not None else None
+        )
+
+    async def _busy(self, engine: str) -> bool:
+        queued, cpu_percent = await self._current_load(engine)
+        if queued > 0:
+            return True
+        return self.cpu_limit is not None and cpu_percent is not None and cpu_percent > self.cpu_limit
+
+    async def wait(self, engine: str):
+        if not await self._busy(engine):
+            return
+        started = time.perf_counter()
+        while await self._busy(engine):
+            await asyncio.sleep(self.poll_interval)
+        self.throttled_time += time.perf_counter() - started
+
+
+async def run_prewarm(
+    streamer,
+    phrases: Iterable[Phrase],
+    concurrency: int = 2,
+    cpu_budget: Optional[float] = 0.5,
+    codec: Optional[str] = None,
+    incremental: Optional[bool] = None,
+    progress_interval: float = 5.0
+) -> Dict:
+    """Synthesize every phrase not yet cached into the streamer's cache tiers
+
+    Phrases are rendered by ``concurrency`` parallel workers at
+    ``PREWARM_PRIORITY``. A worker waits before each phrase while live
+    requests are queued for its engine, or while process CPU is above
+    ``cpu_budget`` (a fraction of all cores, None for no limit). Phrases
+    already cached in memory or on disk are skipped, so re-running an
+    interrupted pre-warm resumes where it stopped as long as a persistent
+    tier is configured. Duplicates are rendered once and failures are
+    logged and counted rather than aborting the run.
+
+    Works with ``OptimizedTTSStreamer`` and ``tts_workers.WorkerPool``; the
+    pool has no local cache view, so its already-cached phrases are simply
+    fast hits, and its load is polled from the workers.
+    """
+    default_engine = streamer.default_engine
+    unique = list(dict.fromkeys(
+        phrase if phrase.engine else Phrase(phrase.text, phrase.voice, phrase.rate, phrase.pitch, default_engine)
+        for phrase in phrases
+    ))
+    pending = iter(unique)
+    is_cached = getattr(streamer, 'is_cached', None)
+    throttle = _Throttle(streamer, cpu_budget, poll_interval=0.05)
+    counts = {'synthesized': 0, 'skipped': 0, 'failed': 0}
+    synthesized_chars = 0
+    audio_bytes = 0
+    started = time.perf_counter()
+
+    def report() -> Dict:
+        elapsed = time.perf_counter() - started
+        return {
+            'phrases': len(unique),
+            **counts,
+            'remaining': len(unique) - sum(counts.values()),
+            'elapsed_s': elapsed,
+            'phrases_per_sec': counts['synthesized'] / elapsed if elapsed > 0 else 0.0,
+            'chars_per_sec': synthesized_chars / elapsed if elapsed > 0 else 0.0,
+            'audio_bytes': audio_bytes,
+            'throttled_s': throttle.throttled_time,
+            'concurrency': concurrency,
+            'cpu_budget': cpu_budget
+        }
+
+    async def worker():
+        nonlocal synthesized_chars, audio_bytes
+        for phrase in pending:
+            if is_cached is not None and is_cached(
+                phrase.text, phrase.voice, phrase.rate, phrase.pitch, phrase.engine, incremental, codec
+            ):
+                counts['skipped'] += 1
+                continue
+
+            await throttle.wait(phrase.engine)
+            try:
+                async for chunk in streamer.synthesize_stream(
+                    phrase.text, phrase.voice, phrase.rate, phrase.pitch, phrase.engine,
+                    incremental=incremental, codec=codec, priority=PREWARM_PRIORITY
+                ):
+                    audio_bytes += len(chunk.data)
+            except Exception as e:
+                counts['failed'] += 1
+                logging.warning(f"Pre-warm failed for {phrase.text[:40]!r}: {e}")
+                continue
+            counts['synthesized'] += 1
+            synthesized_chars += len(phrase.text)
+
+    async def log_progress():
+        while True:
+            await asyncio.sleep(progress_interval)
+            stats = report()
+            logging.info(
+                f"Pre-warm: {stats['phrases'] - stats['remaining']}/{stats['phrases']} "
+                f"({stats['synthesized']} synthesized, {stats['skipped']} cached, {stats['failed']} failed), "
+                f"{stats['phrases_per_sec']:.1f} phrases/s, throttled {stats['throttled_s']:.1f}s"
+            )
+
+    logging.info(f"Pre-warming {len(unique)} phrases with {concurrency} workers")
+    progress = asyncio.ensure_future(log_progress())
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        progress.cancel()
+
+    stats = report()
+    logging.info(
+        f"Pre-warm complete: {stats['synthesized']} synthesized, {stats['skipped']} already cached, "
+        f"{stats['failed']} failed in {stats['elapsed_s']:.1f}s ({stats['chars_per_sec']:.0f} chars/s)"
+    )
+    return stats
+
+
+def add_prewarm_arguments(parser):
+    """Add the --prewarm options to an argparse parser"""
+    group = parser.add_argument_group('pre-warm')
+    group.add_argument("--prewarm", type=str, metavar="FILE", help="Pre-warm the cache from a phrase list (text or JSON lines)")
+    group.add_argument("--prewarm-concurrency", type=int, default=2, help="Parallel pre-warm renders")
+    group.add_argument("--prewarm-cpu-budget", type=float, default=0.5, help="Pause pre-warming above this fraction of all cores (0 for no limit)")
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+TTS engine routing
+Scores engines by their recent latency and error rate, keeps failing engines
+out of rotation with circuit breakers, and injects faults into engines so
+the routing can be exercised without real outages
+"""
+
+import asyncio
+import random
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from tts_engines import RequestRejected
+
+# Engine name that asks the router for the fastest healthy engine
+AUTO_ENGINE = 'auto'
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class EngineHealth:
+    """Moving averages and circuit breaker state of one engine
+
+    ``latency`` is the EWMA of a call's duration, ``seconds_per_char`` the
+    same normalized by text length (what routing predicts with), ``rtf`` the
+    real-time factor (render time over audio duration) and ``error_rate``
+    the EWMA of failures over calls.
+    """
+
+    def __init__(self, name: str, ewma_alpha: float):
+        self.name = name
+        self.ewma_alpha = ewma_alpha
+        self.latency: Optional[float] = None
+        self.seconds_per_char: Optional[float] = None
+        self.rtf: Optional[float] = None
+        self.error_rate = 0.0
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False  # a probe is reserved, its outcome pending
+        self.probe_started = False  # the probe's engine call has begun
+
+        # Counters
+        self.calls = 0
+        self.failures = 0
+        self.trips = 0
+        self.probes = 0
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return self.ewma_alpha * sample + (1 - self.ewma_alpha) * current
+
+    def record_success(self, seconds: float, audio_seconds: float, chars: int):
+        self.calls += 1
+        self.latency = self._ewma(self.latency, seconds)
+        self.seconds_per_char = self._ewma(self.seconds_per_char, seconds / max(chars, 1))
+        if audio_seconds > 0:
+            self.rtf = self._ewma(self.rtf, seconds / audio_seconds)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.calls += 1
+        self.failures += 1
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+        self.consecutive_failures += 1
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'ewma_latency_ms': self.latency * 1000 if self.latency is not None else None,
+            'ewma_ms_per_char': self.seconds_per_char * 1000 if self.seconds_per_char is not None else None,
+            'ewma_rtf': self.rtf,
+            'error_rate': self.error_rate,
+            'consecutive_failures': self.consecutive_failures,
+            'calls': self.calls,
+            'failures': self.failures,
+            'trips': self.trips,
+            'probes': self.probes
+        }
+
+
+class EngineRouter:
+    """Pick an engine per request and track every engine's health
+
+    ``select`` honours an explicitly requested engine while it is loaded,
+    meets the request's ``min_quality`` and its breaker is closed. Otherwise,
+    and for ``AUTO_ENGINE``, it picks the engine with the lowest expected
+    time to a successful render - the admission queue's predicted wait plus
+    the per-character latency EWMA times the text length, divided by the
+    success rate - among loaded engines of sufficient quality whose breaker
+    admits calls. Engines without measurements score zero, so they are tried.
+
+    After ``failure_threshold`` consecutive failures an engine's breaker
+    opens and it gets no traffic for ``cooldown_s``. Then a single request
+    is let through as a half-open probe: ``select`` reserves the probe for
+    it, so concurrent requests pass over the engine instead of being
+    rejected, and its first engine call decides - success closes the
+    breaker, failure opens it for another cooldown. The probing request's
+    other calls (e.g. look-ahead segments) run alongside. A request that
+    reserved the probe and never called the engine (a cache hit) must
+    ``release_probe``.
+
+    ``begin``/``succeeded``/``failed``/``abandoned`` bracket each engine call.
+    """
+
+    def __init__(
+        self,
+        engines: Iterable[str],
+        quality: Dict[str, int],
+        admission: Optional[Dict] = None,
+        failure_threshold: int = 5,
+        cooldown_s: float = 10.0,
+        ewma_alpha: float = 0.2,
+        history: int = 100
+    ):
+        self.engines = list(engines)
+        self.quality = quality
+        self.admission = admission or {}
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.health = {name: EngineHealth(name, ewma_alpha) for name in self.engines}
+
+        # Routing decisions
+        self.routed: Counter = Counter()
+        self.reasons: Counter = Counter()
+        self.recent: deque = deque(maxlen=history)
+
+    def _admits(self, health: EngineHealth, now: float) -> bool:
+        """Whether a call may start now (possibly as the half-open probe)"""
+        if health.state == CLOSED:
+            return True
+        if health.probing:
+            return False
+        return health.state == HALF_OPEN or now - health.opened_at >= self.cooldown_s
+
+    def _score(self, name: str, text_length: int, priority: int) -> float:
+        """Expected seconds to a successful render"""
+        health = self.health[name]
+        controller = self.admission.get(name)
+        wait = controller.predicted_wait(priority) if controller is not None else 0.0
+        service = (health.seconds_per_char or 0.0) * text_length
+        return (wait + service) / max(1.0 - health.error_rate, 0.05)
+
+    def select(
+        self,
+        requested: Optional[str],
+        text_length: int = 0,
+        min_quality: Optional[int] = None,
+        priority: int = 0
+    ) -> Tuple[str, str]:
+        """Engine for a request and the reason it was chosen
+
+        The reason is ``'probe'`` whenever the pick reserved the engine's
+        half-open probe.
+
+        Raises:
+            RequestRejected: ``'unavailable'`` when no loaded engine of
+                sufficient quality admits calls
+        """
+        now = time.monotonic()
+        min_quality = min_quality or 0
+        health = self.health.get(requested)
+
+        if health is not None and self.quality.get(requested, 0) >= min_quality and self._admits(health, now):
+            if health.state == CLOSED:
+                return self._decide(requested, requested, 'requested', None)
+            self._reserve_probe(health)
+            return self._decide(requested, requested, 'probe', None)
+
+        if requested == AUTO_ENGINE:
+            reason = 'fastest'
+        elif health is None:
+            reason = 'unavailable'
+        elif self.quality.get(requested, 0) < min_quality:
+            reason = 'quality'
+        else:
+            reason = 'circuit_open'
+
+        scores = {
+            name: self._score(name, text_length, priority)
+            for name, candidate in self.health.items()
+            if self.quality.get(name, 0) >= min_quality and self._admits(candidate, now)
+        }
+        if not scores:
+            self.reasons['rejected'] += 1
+            raise RequestRejected(
+                'unavailable',
+                f"No healthy engine with quality >= {min_quality} (requested {requested})"
+            )
+
+        # Ties (e.g. nothing measured yet) go to the higher-quality engine
+        engine = min(scores, key=lambda name: (scores[name], -self.quality.get(name, 0)))
+        if self.health[engine].state != CLOSED:
+            self._reserve_probe(self.health[engine])
+            reason = 'probe'
+        return self._decide(requested, engine, reason, scores)
+
+    def _reserve_probe(self, health: EngineHealth):
+        health.state = HALF_OPEN
+        health.probing = True
+        health.probe_started = False
+        health.probes += 1
+
+    def _decide(self, requested: Optional[str], engine: str, reason: str, scores: Optional[Dict]) -> Tuple[str, str]:
+        self.routed[engine] += 1
+        self.reasons[reason] += 1
+        if reason != 'requested':
+            self.recent.append({
+                'time': time.time(),
+                'requested': requested,
+                'engine': engine,
+                'reason': reason,
+                'scores_ms': {name: score * 1000 for name, score in scores.items()} if scores else None
+            })
+        return engine, reason
+
+    def is_available(self, engine: str) -> bool:
+        health = self.health.get(engine)
+        return health is not None and self._admits(health, time.monotonic())
+
+    def begin(self, engine: str) -> bool:
+        """Admit a call to ``engine``; returns True if it is the half-open probe
+
+        The first call after ``select`` reserved the probe is the probe;
+        calls begun while it runs go ahead without deciding the breaker.
+        A call that was not routed by ``select`` (e.g. a warm-up) takes the
+        probe itself once the cooldown has passed.
+
+        Raises:
+            RequestRejected: ``'unavailable'`` while the breaker is open
+        """
+        health = self.health[engine]
+        if health.state == CLOSED:
+            return False
+        if health.probing:
+            if health.probe_started:
+                return False
+            health.probe_started = True
+            return True
+        if not self._admits(health, time.monotonic()):
+            raise RequestRejected('unavailable', f"{engine}: circuit breaker {health.state}")
+        self._reserve_probe(health)
+        health.probe_started = True
+        return True
+
+    def release_probe(self, engine: str):
+        """Give back a probe reserved by ``select`` whose call never began"""
+        health = self.health.get(engine)
+        if health is not None and health.probing and not health.probe_started:
+            health.probing = False
+
+    def succeeded(self, engine: str, seconds: float, audio_seconds: float, chars: int, probe: bool = False):
+        health = self.health[engine]
+        health.record_success(seconds, audio_seconds, chars)
+        if probe:
+            health.probing = health.probe_started = False
+            health.state = CLOSED
+
+    def failed(self, engine: str, probe: bool = False):
+        health = self.health[engine]
+        health.record_failure()
+        if probe:
+            health.probing = health.probe_started = False
+            self._trip(health)
+        elif health.state == CLOSED and health.consecutive_failures >= self.failure_threshold:
+            self._trip(health)
+
+    def abandoned(self, engine: str, probe: bool = False):
+        """The call ended without an engine outcome (cancelled or shed)"""
+        if probe:
+            health = self.health[engine]
+            health.probing = health.probe_started = False
+
+    def _trip(self, health: EngineHealth):
+        health.state = OPEN
+        health.opened_at = time.monotonic()
+        health.trips += 1
+
+    def stats(self) -> Dict:
+        return {
+            'engines': {
+                name: {**health.stats(), 'quality': self.quality.get(name, 0), 'routed': self.routed[name]}
+                for name, health in self.health.items()
+            },
+            'reasons': dict(self.reasons),
+            'recent_decisions': list(self.recent)[-20:],
+            'failure_threshold': self.failure_threshold,
+            'cooldown_s': self.cooldown_s
+        }
+
+
+class EngineFault(RuntimeError):
+    """A failure injected by ``FaultInjector``"""
+
+
+@dataclass
+class FaultSpec:
+    """Simulated misbehaviour of one engine
+
+    ``failure_rate`` is the probability that a call fails, ``delay_ms`` is
+    added to every call and ``slowdown`` multiplies the engine's own time.
+    """
+    failure_rate: float = 0.0
+    delay_ms: float = 0.0
+    slowdown: float = 1.0
+
+
+class FaultInjector:
+    """Wraps engine calls with configured failures and slowdowns
+
+    Meant for the placeholder engines: routing, breakers and fallbacks can
+    be exercised by setting faults at start-up (``--inject-fault``) or at
+    run time with ``set``/``clear``.
+    """
+
+    def __init__(self, faults: Optional[Dict[str, FaultSpec]] = None, seed: Optional[int] = None):
+        self.faults: Dict[str, FaultSpec] = dict(faults or {})
+        self.injected: Counter = Counter()
+        self._random = random.Random(seed)
+
+    def set(self, engine: str, failure_rate: float = 0.0, delay_ms: float = 0.0, slowdown: float = 1.0):
+        self.faults[engine] = FaultSpec(failure_rate, delay_ms, slowdown)
+
+    def clear(self, engine: Optional[str] = None):
+        if engine is None:
+            self.faults.clear()
+        else:
+            self.faults.pop(engine, None)
+
+    async def run(self, engine: str, call: Callable[[], Awaitable]):
+        fault = self.faults.get(engine)
+        if fault is None:
+            return await call()
+
+        if fault.delay_ms > 0:
+            await asyncio.sleep(fault.delay_ms / 1000)
+        if self._random.random() < fault.failure_rate:
+            self.injected[engine] += 1
+            raise EngineFault(f"{engine}: injected failure")
+
+        started = time.monotonic()
+        result = await call()
+        if fault.slowdown > 1:
+            await asyncio.sleep((fault.slowdown - 1) * (time.monotonic() - started))
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'faults': {name: asdict(fault) for name, fault in self.faults.items()},
+            'injected_failures': dict(self.injected)
+        }
+
+
+def parse_fault_spec(spec: str) -> Tuple[str, FaultSpec]:
+    """Parse ``ENGINE:fail=0.5,delay_ms=200,slowdown=2`` (all settings optional)"""
+    engine, _, settings = spec.partition(':')
+    if not engine:
+        raise ValueError(f"Invalid fault spec: {spec}")
+    names = {'fail': 'failure_rate', 'failure_rate': 'failure_rate', 'delay_ms': 'delay_ms', 'slowdown': 'slowdown'}
+    values = {}
+    for setting in filter(None, settings.split(',')):
+        key, _, value = setting.partition('=')
+        if key not in names:
+            raise ValueError(f"Unknown fault setting {key!r} in {spec}")
+        values[names[key]] = float(value)
+    return engine, FaultSpec(**values)
@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+"""
+TTS streaming server
+Serves OptimizedTTSStreamer over WebSocket and HTTP chunked transfer using
+only asyncio streams, with flow control from transport write-buffer limits
+"""
+
+import asyncio
+import base64
+import hashlib
+import inspect
+import json
+import logging
+import math
+import struct
+import time
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from optimized_tts_streamer import OptimizedTTSStreamer
+from tts_codecs import CODEC_BITS
+from tts_dsp import DEFAULT_SAMPLE_RATE
+from tts_engines import RequestRejected
+from tts_routing import AUTO_ENGINE, parse_fault_spec
+from tts_prewarm import add_prewarm_arguments, load_phrases, run_prewarm
+from tts_torch import add_torch_arguments, profile_from_args
+from tts_workers import WorkerPool
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# WebSocket opcodes
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Content types per output codec for HTTP streams
+CONTENT_TYPES = {
+    'pcm16': 'audio/L16',
+    'mulaw': 'audio/basic',
+    'alaw': 'audio/x-alaw-basic',
+    'ima_adpcm': 'audio/x-ima-adpcm'
+}
+
+# Output sample rates clients may request
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+HTTP_REASONS = {
+    101: 'Switching Protocols', 200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 500: 'Internal Server Error', 503: 'Service Unavailable'
+}
+
+
+class ClientDisconnected(Exception):
+    """The peer closed the connection while a stream was in progress"""
+
+
+def _unmask(payload: bytes, mask: bytes) -> bytes:
+    """Apply a WebSocket masking key"""
+    if not payload:
+        return payload
+    data = np.frombuffer(payload, dtype=np.uint8)
+    key = np.resize(np.frombuffer(mask, dtype=np.uint8), len(data))
+    return (data ^ key).tobytes()
+
+
+def _frame_header(opcode: int, length: int) -> bytes:
+    """Header of an unmasked, final server frame"""
+    first = 0x80 | opcode
+    if length < 126:
+        return struct.pack('!BB', first, length)
+    if length < 1 << 16:
+        return struct.pack('!BBH', first, 126, length)
+    return struct.pack('!BBQ', first, 127, length)
+
+
+def _parse_request_params(query: str, body: bytes) -> Dict:
+    """Synthesis parameters from the query string and an optional JSON body"""
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    if body:
+        params.update(json.loads(body))
+    return params
+
+
+def _parse_flag(value) -> Optional[bool]:
+    """Boolean request parameter; None (unset) keeps the streamer default"""
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return value
+
+
+class TTSServer:
+    """Asyncio WebSocket + HTTP chunked streaming front end
+
+    Endpoints:
+        GET/POST /synthesize  HTTP chunked audio stream. Parameters (query
+                              string or JSON body): text, voice, rate, pitch,
+                              engine, codec, sample_rate, incremental,
+                              long_form, priority, deadline_ms,
+                              min_quality. Requests shed by admission
+                              control or with no engine available get 503
+        GET /ws               WebSocket. Each text message is a JSON request
+                              with the same fields; audio is sent as binary
+                              messages followed by a ``{"type": "end"}`` text
+                              message
+        GET /metrics          JSON performance metrics
+        GET /health           Liveness check
+
+    Every connection's transport has a bounded write buffer; after each chunk
+    the handler awaits ``drain()``, which only suspends once the buffer is
+    above ``write_buffer_high``, so a slow reader pauses its own synthesis
+    stream and nobody else's. A client that disconnects mid-stream cancels
+    its stream, which cancels look-ahead renders it no longer needs.
+    """
+
+    def __init__(
+        self,
+        streamer: Union[OptimizedTTSStreamer, 'WorkerPool'],
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        write_buffer_high: int = 64 * 1024,
+        write_buffer_low: int = 16 * 1024,
+        max_body_bytes: int = 1024 * 1024
+    ):
+        self.streamer = streamer
+        self.host = host
+        self.port = port
+        self.write_buffer_high = write_buffer_high
+        self.write_buffer_low = write_buffer_low
+        self.max_body_bytes = max_body_bytes
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.connections = set()
+
+        # Counters
+        self.active_streams = 0
+        self.total_streams = 0
+        self.completed_streams = 0
+        self.cancelled_streams = 0
+        self.failed_streams = 0
+        self.rejected_streams = 0
+        self.bytes_sent = 0
+        self.drain_waits = 0
+        self.drain_wait_time = 0.0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        sockets = self.server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        logging.info(f"TTS server listening on {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in list(self.connections):
+            task.cancel()
+        if self.connections:
+            await asyncio.gather(*self.connections, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        """Get server statistics"""
+        return {
+            'connections': len(self.connections),
+            'active_streams': self.active_streams,
+            'total_streams': self.total_streams,
+            'completed_streams': self.completed_streams,
+            'cancelled_streams': self.cancelled_streams,
+            'failed_streams': self.failed_streams,
+            'rejected_streams': self.rejected_streams,
+            'bytes_sent': self.bytes_sent,
+            'drain_waits': self.drain_waits,
+            'avg_drain_wait_ms': self.drain_wait_time / self.drain_waits * 1000 if self.drain_waits else 0.0,
+            'write_buffer_high': self.write_buffer_high,
+            'write_buffer_low': self.write_buffer_low
+        }
+
+    # ------------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        writer.transport.set_write_buffer_limits(high=self.write_buffer_high, low=self.write_buffer_low)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+
+                if headers.get('upgrade', '').lower() == 'websocket':
+                    if path != '/ws':
+                        await self._send_response(writer, 404, b'Not Found\n')
+                        break
+                    await self._serve_websocket(reader, writer, headers)
+                    break
+
+                keep_alive = await self._route_http(reader, writer, method, path, query, headers, body)
+                if not keep_alive or headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ClientDisconnected):
+            pass
+        except asyncio.CancelledError:
+            pass
+        except ValueError as e:
+            # Malformed or oversized request
+            try:
+                await self._send_response(writer, 400, f"{e}\n".encode())
+            except ConnectionError:
+                pass
+        except Exception as e:
+            logging.error(f"Connection handler failed: {e}")
+        finally:
+            self.connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+        """Read one HTTP/1.1 request; None when the client closed the connection"""
+        try:
+            request_line = await reader.readline()
+        except ConnectionError:
+            return None
+        if not request_line:
+            return None
+
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0) or 0)
+        if length > self.max_body_bytes:
+            raise ValueError(f"Request body too large: {length} bytes")
+        body = await reader.readexactly(length) if length else b''
+
+        url = urlsplit(target)
+        return method.upper(), url.path, url.query, headers, body
+
+    async def _route_http(self, reader, writer, method, path, query, headers, body) -> bool:
+        """Serve one HTTP request; returns whether the connection may be reused"""
+        if path == '/health':
+            await self._send_response(writer, 200, b'{"status": "ok"}', 'application/json')
+            return True
+
+        if path == '/metrics':
+            metrics = self.streamer.get_performance_metrics()
+            if inspect.isawaitable(metrics):
+                # A WorkerPool collects metrics from its worker processes
+                metrics = await metrics
+            metrics = {'server': self.stats(), **metrics}
+            await self._send_response(writer, 200, json.dumps(metrics, default=str).encode(), 'application/json')
+            return True
+
+        if path == '/synthesize':
+            if method not in ('GET', 'POST'):
+                await self._send_response(writer, 405, b'Method Not Allowed\n')
+                return True
+            try:
+                params = self._synthesis_params(_parse_request_params(query, body))
+            except (ValueError, TypeError, KeyError) as e:
+                await self._send_response(writer, 400, f"{e}\n".encode())
+                return True
+            return await self._serve_http_stream(reader, writer, params)
+
+        await self._send_response(writer, 404, b'Not Found\n')
+        return True
+
+    async def _send_response(self, writer, status: int, body: bytes, content_type: str = 'text/plain'):
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1')
+        )
+        writer.write(body)
+        await writer.drain()
+
+    def _synthesis_params(self, params: Dict) -> Dict:
+        """Validate and convert request parameters for ``synthesize_stream``"""
+        text = params.get('text')
+        if not text:
+            raise ValueError("Missing 'text'")
+        codec = params.get('codec') or self.streamer.codec
+        if codec not in CODEC_BITS:
+            raise ValueError(f"Unknown codec: {codec}")
+        engine = params.get('engine') or self.streamer.default_engine
+        # Known engines that are not loaded are rerouted by the streamer
+        if engine != AUTO_ENGINE and engine not in OptimizedTTSStreamer.ENGINE_QUALITY:
+            raise ValueError(f"Unknown engine: {engine}")
+        incremental = _parse_flag(params.get('incremental'))
+        long_form = _parse_flag(params.get('long_form'))
+        sample_rate = int(params.get('sample_rate') or self.streamer.sample_rate)
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"Sample rate out of range: {sample_rate}")
+        rate = float(params.get('rate', 1.0))
+        pitch = float(params.get('pitch', 1.0))
+        for name, value in (('rate', rate), ('pitch', pitch)):
+            if not (math.isfinite(value) and value > 0):
+                raise ValueError(f"{name.capitalize()} must be a positive number: {value}")
+        return {
+            'text': str(text),
+            'voice': str(params.get('voice', 'default')),
+            'rate': rate,
+            'pitch': pitch,
+            'engine': engine,
+            'codec': codec,
+            'incremental': incremental,
+            'long_form': long_form,
+            'priority': int(params.get('priority', 0)),
+            'deadline_ms': float(params['deadline_ms']) if params.get('deadline_ms') is not None else None,
+            'min_quality': int(params['min_quality']) if params.get('min_quality') is not None else None,
+            'sample_rate': sample_rate
+        }
+
+    # ------------------------------------------------------------------
+    # Streaming
+    # ------------------------------------------------------------------
+
+    async def _drain(self, writer: asyncio.StreamWriter):
+        """Wait for the client to catch up if the write buffer is over its limit"""
+        if writer.transport.get_write_buffer_size() <= self.write_buffer_high:
+            await writer.drain()  # only raises if the connection was lost
+            return
+        started = time.perf_counter()
+        await writer.drain()
+        self.drain_waits += 1
+        self.drain_wait_time += time.perf_counter() - started
+
+    async def _stream(self, params: Dict, send_chunk, watch_disconnect) -> int:
+        """Run one synthesis stream, cancelling it if the client goes away
+
+        ``send_chunk`` writes one chunk and applies backpressure;
+        ``watch_disconnect`` completes when the client disconnects (or, for
+        WebSocket, asks to close). Returns the number of chunks sent.
+        """
+        self.active_streams += 1
+        self.total_streams += 1
+        chunks_sent = 0
+
+        async def pump():
+            nonlocal chunks_sent
+            stream = self.streamer.synthesize_stream(**params)
+            try:
+                async for chunk in stream:
+                    await send_chunk(chunk)
+                    chunks_sent += 1
+            finally:
+                # Closes the generator, which cancels its outstanding renders
+                await stream.aclose()
+
+        pump_task = asyncio.ensure_future(pump())
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await asyncio.wait({pump_task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not pump_task.done():
+                pump_task.cancel()
+                self.cancelled_streams += 1
+                await asyncio.gather(pump_task, return_exceptions=True)
+                logging.info(f"Client disconnected after {chunks_sent} chunks; stream cancelled")
+                raise ClientDisconnected()
+            try:
+                pump_task.result()
+            except (ConnectionError, ClientDisconnected):
+                self.cancelled_streams += 1
+                raise ClientDisconnected()
+            except RequestRejected:
+                self.rejected_streams += 1
+                raise
+            except Exception:
+                self.failed_streams += 1
+                raise
+            self.completed_streams += 1
+            return chunks_sent
+        finally:
+            self.active_streams -= 1
+            if not watcher.done():
+                watcher.cancel()
+                await asyncio.gather(watcher, return_exceptions=True)
+            if not pump_task.done():
+                pump_task.cancel()
+                await asyncio.gather(pump_task, return_exceptions=True)
+
+    async def _serve_http_stream(self, reader, writer, params: Dict) -> bool:
+        sample_rate = params['sample_rate']
+        headers_sent = False
+
+        def send_headers():
+            # Deferred to the first chunk so a request shed before producing
+            # audio can still be answered with a 503
+            nonlocal headers_sent
+            headers_sent = True
+            writer.write(
+                "HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {CONTENT_TYPES[params['codec']]};rate={sample_rate};channels=1\r\n"
+                f"X-Codec: {params['codec']}\r\n"
+                f"X-Sample-Rate: {sample_rate}\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                "Cache-Control: no-store\r\n\r\n".encode('latin-1')
+            )
+
+        async def send_chunk(chunk):
+            if not headers_sent:
+                send_headers()
+            size = len(chunk.data)
+            if not size:
+                return
+            writer.write(f"{size:X}\r\n".encode('latin-1'))
+            writer.write(chunk.data)
+            writer.write(b'\r\n')
+            self.bytes_sent += size
+            await self._drain(writer)
+
+        async def watch_disconnect():
+            # An HTTP client sends nothing while it receives the response, so
+            # EOF (or a reset) here means it went away
+            try:
+                while await reader.read(4096):
+                    pass
+            except ConnectionError:
+                pass
+
+        try:
+            await self._stream(params, send_chunk, watch_disconnect)
+        except ClientDisconnected:
+            return False
+        except Exception as e:
+            if not headers_sent:
+                status = 503 if isinstance(e, RequestRejected) else 500
+                await self._send_response(writer, status, f"{e}\n".encode())
+                return False
+            # Headers are already sent; end the response without the
+            # terminating chunk so the client sees a truncated body
+            logging.error(f"HTTP stream failed: {e}")
+            return False
+
+        if not headers_sent:
+            send_headers()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        # The disconnect watcher may have consumed bytes of a pipelined
+        # request, so connections are not reused after a stream
+        return False
+
+    # ------------------------------------------------------------------
+    # WebSocket
+    # ------------------------------------------------------------------
+
+    async def _serve_websocket(self, reader, writer, headers: Dict[str, str]):
+        key = headers.get('sec-websocket-key')
+        if not key:
+            await self._send_response(writer, 400, b'Missing Sec-WebSocket-Key\n')
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode('latin-1')
+        )
+        await writer.drain()
+
+        messages: asyncio.Queue = asyncio.Queue()
+        closed = asyncio.Event()
+
+        async def read_loop():
+            # Reads frames for the whole connection so control frames and
+            # disconnects are seen while a stream is being sent
+            try:
+                while True:
+                    opcode, payload = await self._read_message(reader)
+                    if opcode == OP_CLOSE:
+                        if not writer.is_closing():
+                            self._write_frame(writer, OP_CLOSE, payload[:2])
+                        break
+                    if opcode == OP_PING:
+                        self._write_frame(writer, OP_PONG, payload)
+                    elif opcode in (OP_TEXT, OP_BINARY):
+                        await messages.put(payload)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                closed.set()
+
+        reader_task = asyncio.ensure_future(read_loop())
+        try:
+            while not closed.is_set():
+                get_message = asyncio.ensure_future(messages.get())
+                close_wait = asyncio.ensure_future(closed.wait())
+                await asyncio.wait({get_message, close_wait}, return_when=asyncio.FIRST_COMPLETED)
+                close_wait.cancel()
+                if not get_message.done():
+                    get_message.cancel()
+                    break
+
+                try:
+                    params = self._synthesis_params(json.loads(get_message.result()))
+                except (ValueError, TypeError, KeyError) as e:
+                    await self._send_json(writer, {'type': 'error', 'error': str(e)})
+                    continue
+
+                await self._send_json(writer, {
+                    'type': 'start', 'codec': params['codec'], 'sample_rate': params['sample_rate']
+                })
+
+                async def send_chunk(chunk):
+                    self._write_frame(writer, OP_BINARY, chunk.data)
+                    self.bytes_sent += len(chunk.data)
+                    await self._drain(writer)
+
+                try:
+                    chunks = await self._stream(params, send_chunk, closed.wait)
+                except ClientDisconnected:
+                    break
+                except RequestRejected as e:
+                    await self._send_json(writer, {'type': 'error', 'error': str(e), 'rejected': e.reason})
+                    continue
+                except Exception as e:
+                    await self._send_json(writer, {'type': 'error', 'error': str(e)})
+                    continue
+                await self._send_json(writer, {'type': 'end', 'chunks': chunks})
+        finally:
+            reader_task.cancel()
+            await asyncio.gather(reader_task, return_exceptions=True)
+
+    async def _read_message(self, reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+        """Read one complete (reassembled) client message"""
+        opcode = None
+        parts = []
+        while True:
+            first, second = await reader.readexactly(2)
+            fin = first & 0x80
+            frame_opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length, = struct.unpack('!H', await reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack('!Q', await reader.readexactly(8))
+            if length > self.max_body_bytes:
+                raise ConnectionError(f"WebSocket frame too large: {length} bytes")
+            mask = await reader.readexactly(4) if second & 0x80 else None
+            payload = await reader.readexactly(length)
+            if mask is not None:
+                payload = _unmask(payload, mask)
+
+            if frame_opcode >= OP_CLOSE:
+                # Control frames may be interleaved with fragments
+                return frame_opcode, payload
+            if frame_opcode != OP_CONTINUATION:
+                opcode = frame_opcode
+            parts.append(payload)
+            if fin:
+                return opcode, b''.join(parts)
+
+    def _write_frame(self, writer: asyncio.StreamWriter, opcode: int, payload) -> None:
+        writer.write(_frame_header(opcode, len(payload)))
+        if len(payload):
+            writer.write(payload)
+
+    async def _send_json(self, writer: asyncio.StreamWriter, message: Dict):
+        self._write_frame(writer, OP_TEXT, json.dumps(message).encode())
+        await writer.drain()
+
+
+# CLI
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="TTS streaming server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Listen address")
+    parser.add_argument("--port", type=int, default=8765, help="Listen port")
+    parser.add_argument("--engines", type=str, help="Comma-separated engines to load (default: all available)")
+    parser.add_argument("--skip-warmup", action="store_true", help="Do not warm up engines before serving")
+    parser.add_argument("--cache-size", type=int, default=500, help="Cache size")
+    parser.add_argument("--cache-max-mb", type=float, default=256, help="Cache memory budget in MB (0 to disable)")
+    parser.add_argument("--disk-cache", type=str, metavar="DIR", help="Enable the persistent disk cache in DIR")
+    parser.add_argument("--incremental", action="store_true", help="Stream sentence by sentence by default")
+    parser.add_argument("--codec", type=str, default="pcm16", choices=sorted(CODEC_BITS), help="Default output codec")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE, help="Default output sample rate")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="Initial (adaptive) or fixed chunk duration")
+    parser.add_argument("--fixed-chunks", action="store_true", help="Disable adaptive chunk sizing")
+    parser.add_argument("--inject-fault", type=str, action="append", default=[], metavar="ENGINE:fail=P,delay_ms=MS,slowdown=X",
+                        help="Simulate engine failures or slowdowns (repeatable)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, requests routed by cache key")
+    parser.add_argument("--write-buffer-kb", type=int, default=64, help="Per-connection write buffer high-water mark")
+    add_prewarm_arguments(parser)
+    add_torch_arguments(parser)
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    async def main():
+        streamer_kwargs = dict(
+            cache_size=args.cache_size,
+            cache_max_mb=args.cache_max_mb,
+            disk_cache_dir=args.disk_cache,
+            incremental=args.incremental,
+            engines=args.engines.split(',') if args.engines else None,
+            codec=args.codec,
+            sample_rate=args.sample_rate,
+            chunk_size_ms=args.chunk_ms,
+            adaptive_chunking=not args.fixed_chunks,
+            engine_faults=dict(parse_fault_spec(spec) for spec in args.inject_fault),
+            torch_profile=profile_from_args(args)
+        )
+        if args.workers > 1:
+            streamer = WorkerPool(args.workers, warmup=not args.skip_warmup, **streamer_kwargs)
+            await streamer.start()
+        else:
+            streamer = OptimizedTTSStreamer(**streamer_kwargs)
+            if not args.skip_warmup:
+                await streamer.warmup()
+
+        server = TTSServer(
+            streamer, args.host, args.port,
+            write_buffer_high=args.write_buffer_kb * 1024,
+            write_buffer_low=args.write_buffer_kb * 1024 // 4
+        )
+        await server.start()
+        # Pre-warm alongside live traffic; it yields to queued requests
+        prewarm = None
+        if args.prewarm:
+            prewarm = asyncio.ensure_future(run_prewarm(
+                streamer,
+                load_phrases(args.prewarm),
+                concurrency=args.prewarm_concurrency,
+                cpu_budget=args.prewarm_cpu_budget or None
+            ))
+        try:
+            await server.serve_forever()
+        finally:
+            if prewarm is not None:
+                prewarm.cancel()
+            await server.close()
+            await streamer.shutdown()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
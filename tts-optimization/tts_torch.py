@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Torch CPU inference profile
+Thread layout, one-time model loading with optional dynamic int8
+quantization, warm-up and inference-mode execution for Torch-backed engines
+on hosts without a GPU. Torch is imported on first use.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Callable, Dict, Optional
+
+# Layer types replaced by dynamic int8 quantization
+QUANTIZED_LAYERS = ('Linear', 'LSTM', 'GRU')
+
+# Per-process state: the profile in force and the models loaded under it
+_lock = threading.RLock()
+_profile: Optional['TorchCPUProfile'] = None
+_threads: Dict[str, int] = {}
+_models: Dict[str, 'LoadedModel'] = {}
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (its affinity mask, e.g. a container's
+    cpuset, rather than every core of the host)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class TorchCPUProfile:
+    """How a process runs Torch models on CPU
+
+    ``intra_op_threads`` is the thread count of one operator (a matmul, an
+    LSTM step) and ``inter_op_threads`` the number of operators run side by
+    side; None leaves Torch's default of one thread per core, which
+    oversubscribes the CPU as soon as several processes or concurrent calls
+    each use it. ``quantize_int8`` swaps Linear, LSTM and GRU layers for
+    dynamically quantized int8 ones, ``inference_mode`` runs every call under
+    ``torch.inference_mode`` and ``warmup_runs`` calls are made at load time.
+    """
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+    quantize_int8: bool = False
+    inference_mode: bool = True
+    warmup_runs: int = 2
+
+    def for_workers(
+        self,
+        process_workers: int = 1,
+        concurrent_calls: int = 1,
+        cpus: Optional[int] = None
+    ) -> 'TorchCPUProfile':
+        """This profile with unset thread counts sized so that
+        ``process_workers`` processes, each running ``concurrent_calls``
+        inferences at once, share the CPUs without oversubscribing them"""
+        cpus = cpus or available_cpus()
+        intra = self.intra_op_threads or max(1, cpus // max(1, process_workers * concurrent_calls))
+        # Concurrent calls already keep the cores busy side by side
+        inter = self.inter_op_threads or 1
+        return replace(self, intra_op_threads=intra, inter_op_threads=inter)
+
+
+@dataclass
+class LoadedModel:
+    """A model loaded by ``load_model`` and what loading it cost"""
+    name: str
+    model: Any
+    quantized: bool
+    load_s: float
+    warmup_s: float
+    size_mb: Optional[float]
+
+
+def configure(profile: TorchCPUProfile) -> Dict[str, int]:
+    """Apply ``profile`` to this process and return the thread counts in force
+
+    Torch's thread pools are per process and the inter-op pool can only be
+    sized before it first runs, so the first profile applied wins; later
+    calls with a different one are logged and ignored. Call it before any
+    Torch work, e.g. as a process pool initializer.
+    """
+    global _profile
+    import torch
+
+    with _lock:
+        if _profile is not None:
+            if profile != _profile:
+                logging.warning(f"Torch CPU profile already configured as {_profile}; ignoring {profile}")
+            return dict(_threads)
+
+        if profile.intra_op_threads:
+            torch.set_num_threads(profile.intra_op_threads)
+        if profile.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(profile.inter_op_threads)
+            except RuntimeError as e:
+                logging.warning(f"Torch inter-op threads already fixed: {e}")
+        _profile = profile
+        _threads.update(
+            intra_op_threads=torch.get_num_threads(),
+            inter_op_threads=torch.get_num_interop_threads()
+        )
+        logging.info(
+            f"Torch CPU profile: {_threads['intra_op_threads']} intra-op / "
+            f"{_threads['inter_op_threads']} inter-op threads, "
+            f"{'int8' if profile.quantize_int8 else 'fp32'}"
+        )
+        return dict(_threads)
+
+
+def quantize_int8(model: Any) -> Any:
+    """``model`` with its Linear, LSTM and GRU layers dynamically quantized:
+    weights are stored as int8 and activations quantized per call, which
+    roughly quarters those layers' memory traffic on CPU"""
+    import torch
+    from torch import nn
+
+    quantization = torch.ao.quantization if hasattr(torch, 'ao') else torch.quantization
+    layers = {getattr(nn, name) for name in QUANTIZED_LAYERS}
+    return quantization.quantize_dynamic(model, layers, dtype=torch.qint8)
+
+
+def _model_size_mb(model: Any) -> Optional[float]:
+    # Serialized state, which includes quantized layers' packed weights
+    import torch
+
+    if not hasattr(model, 'state_dict'):
+        return None
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def load_model(
+    name: str,
+    factory: Callable[[], Any],
+    warmup: Optional[Callable[[Any], Any]] = None
+) -> Any:
+    """Load model ``name`` once per process and return it
+
+    ``factory`` builds the model; it is switched to eval mode, quantized to
+    int8 when the configured profile asks for it and exercised with the
+    profile's ``warmup_runs`` calls of ``warmup(model)``, so one-time costs
+    (lazy initialization, kernel selection, allocator growth) are paid here
+    rather than by the first requests. Later calls return the same model.
+    """
+    with _lock:
+        loaded = _models.get(name)
+        if loaded is not None:
+            return loaded.model
+
+        profile = _profile
+        if profile is None:
+            profile = TorchCPUProfile().for_workers()
+            configure(profile)
+
+        started = time.perf_counter()
+        model = factory()
+        if hasattr(model, 'eval'):
+            model.eval()
+        quantized = profile.quantize_int8 and hasattr(model, 'modules')
+        if quantized:
+            model = quantize_int8(model)
+        loaded_at = time.perf_counter()
+
+        if warmup is not None:
+            for _ in range(profile.warmup_runs):
+                run_inference(warmup, model)
+        warmed_at = time.perf_counter()
+
+        loaded = LoadedModel(
+            name, model, quantized, loaded_at - started, warmed_at - loaded_at, _model_size_mb(model)
+        )
+        _models[name] = loaded
+        logging.info(
+            f"Torch model {name} loaded in {loaded.load_s * 1000:.0f}ms, "
+            f"warmed up in {loaded.warmup_s * 1000:.0f}ms"
+        )
+        return model
+
+
+def get_model(name: str) -> Any:
+    """A model loaded by ``load_model`` in this process"""
+    return _models[name].model
+
+
+def run_inference(fn: Callable, *args) -> Any:
+    """Call ``fn(*args)`` under ``torch.inference_mode`` (unless the profile
+    turns it off)
+
+    Inference mode skips autograd bookkeeping and version counting for every
+    tensor the call creates. It is thread-local, so the call has to be made
+    on the thread that runs the model - submit this function, not ``fn``, to
+    an engine's executor.
+    """
+    import torch
+
+    if _profile is not None and not _profile.inference_mode:
+        with torch.no_grad():
+            return fn(*args)
+    with torch.inference_mode():
+        return fn(*args)
+
+
+def stats() -> Dict:
+    """Profile, thread counts and loaded models of this process"""
+    with _lock:
+        return {
+            'profile': asdict(_profile) if _profile is not None else None,
+            'threads': dict(_threads),
+            'cpus': available_cpus(),
+            'models': {
+                name: {
+                    'quantized': loaded.quantized,
+                    'load_ms': loaded.load_s * 1000,
+                    'warmup_ms': loaded.warmup_s * 1000,
+                    'size_mb': loaded.size_mb
+                }
+                for name, loaded in _models.items()
+            }
+        }
+
+
+def add_torch_arguments(parser):
+    """Add the --torch-* options to an argparse parser"""
+    group = parser.add_argument_group('torch CPU inference')
+    group.add_argument("--torch-threads", type=int, help="Intra-op threads per process (default: CPUs split across workers and concurrent calls)")
+    group.add_argument("--torch-interop-threads", type=int, help="Inter-op threads per process (default: 1)")
+    group.add_argument("--torch-int8", action="store_true", help="Dynamically quantize Torch models to int8")
+    group.add_argument("--torch-warmup-runs", type=int, default=2, help="Warm-up calls when a Torch model is loaded")
+
+
+def profile_from_args(args) -> TorchCPUProfile:
+    """The profile selected by ``add_torch_arguments`` options; unset thread
+    counts are sized by the streamer"""
+    return TorchCPUProfile(
+        intra_op_threads=args.torch_threads,
+        inter_op_threads=args.torch_interop_threads,
+        quantize_int8=args.torch_int8,
+        warmup_runs=args.torch_warmup_runs
+    )
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Multi-process TTS workers
+Runs one OptimizedTTSStreamer per worker process and routes each request to
+a worker by the hash of its synthesis key, so every cached entry lives in
+exactly one worker and throughput scales with cores
+"""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncGenerator, Dict, List, Optional
+
+from optimized_tts_streamer import AudioChunk, OptimizedTTSStreamer
+from tts_dsp import DEFAULT_SAMPLE_RATE
+from tts_engines import RequestRejected
+
+# Messages are (kind, request_id, payload) tuples in both directions.
+# Parent -> worker: synthesize, credit, cancel, metrics, load, clear_cache, stop
+# Worker -> parent: ready, chunk, end, error, metrics, load
+
+# Chunks a worker may stream ahead of the parent's consumer. The parent
+# returns a credit for every chunk its caller takes, so a slow client stalls
+# the stream in its worker (and its adaptive chunker sees the slow consumer)
+# instead of audio piling up in the parent.
+STREAM_WINDOW = 8
+
+
+def _worker_main(index: int, conn, streamer_kwargs: Dict, warmup: bool, log_level: int):
+    """Worker process entry point"""
+    logging.basicConfig(
+        level=log_level,
+        format=f'%(asctime)s - worker {index} - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(_serve_worker(index, conn, streamer_kwargs, warmup))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _serve_worker(index: int, conn, streamer_kwargs: Dict, warmup: bool):
+    streamer = OptimizedTTSStreamer(**streamer_kwargs)
+    if warmup:
+        await streamer.warmup()
+
+    loop = asyncio.get_running_loop()
+    inbox: asyncio.Queue = asyncio.Queue()
+    tasks: Dict[int, asyncio.Task] = {}
+    windows: Dict[int, asyncio.Semaphore] = {}
+
+    # Sends run on one thread, in order, so a full pipe never blocks the loop
+    sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"tts-worker-{index}-send")
+
+    async def send(message):
+        await loop.run_in_executor(sender, conn.send, message)
+
+    def on_readable():
+        try:
+            while conn.poll():
+                inbox.put_nowait(conn.recv())
+        except (EOFError, OSError):
+            # The parent went away
+            loop.remove_reader(conn.fileno())
+            inbox.put_nowait(('stop', None, None))
+
+    async def stream(request_id: int, params: Dict):
+        window = windows[request_id] = asyncio.Semaphore(STREAM_WINDOW)
+        try:
+            async for chunk in streamer.synthesize_stream(**params):
+                await window.acquire()
+                await send(('chunk', request_id, (
+                    bytes(chunk.data), chunk.sample_rate, chunk.chunk_id,
+                    chunk.total_chunks, chunk.is_final, chunk.codec
+                )))
+            await send(('end', request_id, None))
+        except asyncio.CancelledError:
+            raise
+        except RequestRejected as e:
+            await send(('error', request_id, (e.reason, str(e))))
+        except Exception as e:
+            await send(('error', request_id, (None, str(e))))
+        finally:
+            tasks.pop(request_id, None)
+            windows.pop(request_id, None)
+
+    await send(('ready', None, {
+        'pid': os.getpid(),
+        'engines': list(streamer.engines.keys()),
+        'default_engine': streamer.default_engine,
+        'codec': streamer.codec,
+        'sample_rate': streamer.sample_rate
+    }))
+    loop.add_reader(conn.fileno(), on_readable)
+
+    try:
+        while True:
+            kind, request_id, payload = await inbox.get()
+            if kind == 'synthesize':
+                tasks[request_id] = asyncio.ensure_future(stream(request_id, payload))
+            elif kind == 'credit':
+                window = windows.get(request_id)
+                if window is not None:
+                    window.release()
+            elif kind == 'cancel':
+                task = tasks.get(request_id)
+                if task is not None:
+                    task.cancel()
+            elif kind == 'metrics':
+                await send(('metrics', request_id, streamer.get_performance_metrics(payload)))
+            elif kind == 'load':
+                await send(('load', request_id, {
+                    'cpu_percent': streamer.resource_sampler.cpu_percent,
+                    'queued': {name: controller.queued for name, controller in streamer.admission.items()}
+                }))
+            elif kind == 'clear_cache':
+                streamer.clear_cache()
+            elif kind == 'stop':
+                break
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        await streamer.shutdown()
+        sender.shutdown(wait=True)
+        conn.close()
+
+
+class _Worker:
+    """Parent-side handle of one worker process"""
+
+    def __init__(self, index: int, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.info: Dict = {}
+        self.ready: Optional[asyncio.Future] = None
+        self.streams: Dict[int, asyncio.Queue] = {}
+        self.replies: Dict[int, asyncio.Future] = {}
+        self.alive = True
+        self.routed = 0
+        # Sends run on one thread, in order, so a full pipe never blocks the loop
+        self.sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"tts-worker-{index}-parent-send")
+
+    def send(self, message):
+        """Queue ``message`` for the worker without waiting for the pipe"""
+        if self.alive:
+            self.sender.submit(self._send, message)
+
+    def _send(self, message):
+        try:
+            self.conn.send(message)
+        except (OSError, ValueError) as e:
+            # The pipe is gone; the reader reports the lost worker
+            logging.debug(f"TTS worker {self.index}: dropped {message[0]} message: {e}")
+
+
+class WorkerPool:
+    """Route TTS requests over N worker processes by synthesis-key hash
+
+    Each worker runs its own event loop, engines and caches. A request's
+    worker is chosen from a stable hash of ``(text, voice, engine)`` - the
+    single-flight key - so repeats of a text, at any rate, pitch, codec or
+    sample rate, always reach the worker that has it cached or in flight,
+    and no audio is cached twice. Disk caches get one subdirectory per worker; routing is
+    stable across restarts as long as the worker count is unchanged.
+
+    ``synthesize_stream`` mirrors ``OptimizedTTSStreamer.synthesize_stream``,
+    so a pool can be served by ``tts_server.TTSServer``. Streams are flow
+    controlled: a worker runs at most ``STREAM_WINDOW`` chunks ahead of the
+    caller, so backpressure from a slow client reaches the worker. Abandoning
+    a stream cancels it in its worker.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, warmup: bool = True, **streamer_kwargs):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.warmup = warmup
+        self.streamer_kwargs = streamer_kwargs
+        self.workers: List[_Worker] = []
+        self._request_ids = itertools.count()
+        self._closing = False
+
+        # Filled in from the first worker's ready message
+        self.engines: List[str] = []
+        self.default_engine = 'kokoro'
+        self.codec = streamer_kwargs.get('codec', 'pcm16')
+        self.sample_rate = streamer_kwargs.get('sample_rate', DEFAULT_SAMPLE_RATE)
+
+    async def start(self):
+        """Start the workers and wait until all of them are ready"""
+        loop = asyncio.get_running_loop()
+        # Spawn rather than fork: the parent may already run threads
+        context = multiprocessing.get_context('spawn')
+        disk_cache_dir = self.streamer_kwargs.get('disk_cache_dir')
+
+        for index in range(self.num_workers):
+            kwargs = dict(self.streamer_kwargs)
+            # Torch thread counts are split across the workers
+            kwargs.setdefault('process_workers', self.num_workers)
+            if disk_cache_dir:
+                kwargs['disk_cache_dir'] = os.path.join(disk_cache_dir, f"worker-{index}")
+
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(index, child_conn, kwargs, self.warmup, logging.getLogger().getEffectiveLevel()),
+                name=f"tts-worker-{index}",
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+
+            worker = _Worker(index, process, parent_conn)
+            worker.ready = loop.create_future()
+            loop.add_reader(parent_conn.fileno(), self._on_readable, worker)
+            self.workers.append(worker)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker.ready for worker in self.workers))
+        info = self.workers[0].info
+        self.engines = info['engines']
+        self.default_engine = info['default_engine']
+        self.codec = info['codec']
+        self.sample_rate = info['sample_rate']
+        logging.info(f"{self.num_workers} TTS workers ready in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def _on_readable(self, worker: _Worker):
+        try:
+            while worker.conn.poll():
+                kind, request_id, payload = worker.conn.recv()
+                if kind in ('chunk', 'end', 'error'):
+                    queue = worker.streams.get(request_id)
+                    if queue is not None:
+                        queue.put_nowait((kind, payload))
+                elif kind in ('metrics', 'load'):
+                    reply = worker.replies.pop(request_id, None)
+                    if reply is not None and not reply.done():
+                        reply.set_result(payload)
+                elif kind == 'ready':
+                    worker.info = payload
+                    worker.ready.set_result(payload)
+        except (EOFError, OSError):
+            self._worker_lost(worker)
+
+    def _worker_lost(self, worker: _Worker):
+        if not worker.alive:
+            return
+        worker.alive = False
+        worker.sender.shutdown(wait=False)
+        asyncio.get_running_loop().remove_reader(worker.conn.fileno())
+        if not self._closing:
+            logging.error(f"TTS worker {worker.index} exited unexpectedly")
+
+        error = RuntimeError(f"TTS worker {worker.index} exited")
+        if not worker.ready.done():
+            worker.ready.set_exception(error)
+        for queue in worker.streams.values():
+            queue.put_nowait(('error', (None, str(error))))
+        for reply in worker.replies.values():
+            if not reply.done():
+                reply.set_exception(error)
+        worker.replies.clear()
+
+    def worker_for(self, text: str, voice: str, engine: str) -> int:
+        """Index of the worker that owns this synthesis key"""
+        digest = hashlib.md5(f"{text}|{voice}|{engine}".encode()).digest()
+        return int.from_bytes(digest[:8], 'little') % self.num_workers
+
+    async def synthesize_stream(
+        self,
+        text: str,
+        voice: str = 'default',
+        rate: float = 1.0,
+        pitch: float = 1.0,
+        engine: Optional[str] = None,
+        incremental: Optional[bool] = None,
+        codec: Optional[str] = None,
+        priority: int = 0,
+        deadline_ms: Optional[float] = None,
+        sample_rate: Optional[int] = None,
+        long_form: Optional[bool] = None,
+        min_quality: Optional[int] = None
+    ) -> AsyncGenerator[AudioChunk, None]:
+        """Synthesize on the owning worker and relay its chunks"""
+        engine = engine or self.default_engine
+        worker = self.workers[self.worker_for(text, voice, engine)]
+        if not worker.alive:
+            raise RuntimeError(f"TTS worker {worker.index} is not running")
+
+        request_id = next(self._request_ids)
+        # Room for a full window plus the end (or error) and a lost-worker error
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_WINDOW + 2)
+        worker.streams[request_id] = queue
+        worker.routed += 1
+        worker.send(('synthesize', request_id, {
+            'text': text, 'voice': voice, 'rate': rate, 'pitch': pitch,
+            'engine': engine, 'incremental': incremental, 'codec': codec,
+            'priority': priority, 'deadline_ms': deadline_ms, 'sample_rate': sample_rate,
+            'long_form': long_form, 'min_quality': min_quality
+        }))
+
+        finished = False
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == 'chunk':
+                    data, sample_rate, chunk_id, total_chunks, is_final, chunk_codec = payload
+                    yield AudioChunk(data, sample_rate, chunk_id, total_chunks, time.time(), is_final, chunk_codec)
+                    # Taken by the caller: the worker may send another
+                    worker.send(('credit', request_id, None))
+                elif kind == 'end':
+                    finished = True
+                    return
+                else:
+                    finished = True
+                    reason, message = payload
+                    if reason is not None:
+                        raise RequestRejected(reason, message)
+                    raise RuntimeError(f"TTS worker {worker.index}: {message}")
+        finally:
+            worker.streams.pop(request_id, None)
+            if not finished:
+                worker.send(('cancel', request_id, None))
+
+    async def get_performance_metrics(self, window_minutes: int = 10) -> Dict:
+        """Per-worker metrics plus routing counts"""
+        loop = asyncio.get_running_loop()
+        replies = []
+        for worker in self.workers:
+            reply = loop.create_future()
+            if worker.alive:
+                request_id = next(self._request_ids)
+                worker.replies[request_id] = reply
+                worker.send(('metrics', request_id, window_minutes))
+            else:
+                reply.set_result(None)
+            replies.append(reply)
+
+        results = await asyncio.gather(*replies, return_exceptions=True)
+        return {
+            'workers': [
+                {
+                    'index': worker.index,
+                    'pid': worker.info.get('pid'),
+                    'alive': worker.alive,
+                    'routed_requests': worker.routed,
+                    'active_streams': len(worker.streams),
+                    'metrics': result if not isinstance(result, BaseException) else None
+                }
+                for worker, result in zip(self.workers, results)
+            ],
+            'engines': self.engines,
+            'default_engine': self.default_engine,
+            'codec': self.codec
+        }
+
+    async def get_load(self) -> Dict:
+        """Live load summed over the running workers: process CPU percent
+        and requests waiting for admission per engine"""
+        loop = asyncio.get_running_loop()
+        replies = []
+        for worker in self.workers:
+            if worker.alive:
+                request_id = next(self._request_ids)
+                reply = worker.replies[request_id] = loop.create_future()
+                worker.send(('load', request_id, None))
+                replies.append(reply)
+
+        load = {'cpu_percent': 0.0, 'queued': {}}
+        for result in await asyncio.gather(*replies, return_exceptions=True):
+            if isinstance(result, BaseException):
+                continue
+            load['cpu_percent'] += result['cpu_percent']
+            for engine, queued in result['queued'].items():
+                load['queued'][engine] = load['queued'].get(engine, 0) + queued
+        return load
+
+    def clear_cache(self):
+        for worker in self.workers:
+            worker.send(('clear_cache', None, None))
+
+    async def shutdown(self, timeout: float = 5.0):
+        """Stop every worker, terminating those that do not exit in time"""
+        loop = asyncio.get_running_loop()
+        self._closing = True
+        for worker in self.workers:
+            if worker.alive:
+                worker.send(('stop', None, None))
+
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            await loop.run_in_executor(None, worker.process.join, max(deadline - time.monotonic(), 0.0))
+            if worker.process.is_alive():
+                worker.process.terminate()
+            if worker.alive:
+                worker.alive = False
+                loop.remove_reader(worker.conn.fileno())
+            await loop.run_in_executor(None, worker.sender.shutdown)
+            worker.conn.close()